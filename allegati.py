@@ -0,0 +1,208 @@
+"""Deposito su disco delle immagini caricate (foto e timbro), indirizzato per contenuto.
+
+Ogni immagine è salvata una volta sola con il suo sha256 come nome
+(``allegati/ab/abcd...``), qualunque sia il progetto o la sessione che la
+carica: lo stesso timbro usato in cento relazioni occupa un file. Accanto
+all'originale stanno le varianti derivate (``<hash>.mini400``, la miniatura
+per l'anteprima dell'app; ``<hash>.stampa630``, la foto ricampionata per la
+griglia della relazione), create alla prima richiesta e poi lette dal disco
+da qualsiasi processo, così i worker del pool non ricampionano ognuno la
+stessa foto.
+
+Nel payload viaggia un Allegato (l'hash) al posto dei byte; i renderer lo
+risolvono con deposito() nel processo che genera il documento.
+
+Il deposito è limitato a ``max_bytes``: superato il limite vengono eliminati
+gli allegati usati meno di recente (originale e varianti insieme; ogni
+lettura aggiorna la data di modifica dei file). Un riferimento rimasto in
+una sessione può quindi non trovare più il suo originale: leggi e le
+varianti sollevano AllegatoMancante, che app e renderer gestiscono
+(nuovo caricamento, foto assente). Le scritture sono atomiche
+(file temporaneo + rename), quindi più processi possono usare la stessa
+cartella.
+
+    python allegati.py               # dimensione del deposito
+    python allegati.py --pulisci 200 # riduce il deposito a 200 MB
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import os
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+RADICE = Path(__file__).resolve().parent / "allegati"
+MAX_BYTES = 512 * 1024 * 1024
+MINIATURA_PX = 400
+
+
+@dataclass(frozen=True)
+class Allegato:
+    """Riferimento a un'immagine del deposito: viaggia nel payload al posto dei byte."""
+    hash: str
+
+
+class AllegatoMancante(FileNotFoundError):
+    """L'originale dell'allegato non è più nel deposito (eliminato dalla pulizia)."""
+
+
+class Deposito:
+    def __init__(self, radice: Union[str, Path] = RADICE, max_bytes: int = MAX_BYTES):
+        self.radice = Path(radice)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._totale: Optional[int] = None  # byte su disco, calcolato alla prima scrittura
+
+    def _percorso(self, hash_: str, variante: str = "") -> Path:
+        nome = f"{hash_}.{variante}" if variante else hash_
+        return self.radice / hash_[:2] / nome
+
+    def _scrivi(self, path: Path, blob: Union[bytes, memoryview]) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}")
+        tmp.write_bytes(blob)
+        os.replace(tmp, path)
+        with self._lock:
+            if self._totale is None:
+                self._totale = self.dimensione()
+            else:
+                self._totale += memoryview(blob).nbytes
+            pieno = self._totale > self.max_bytes
+        if pieno:
+            self.pulisci()
+
+    def deposita(self, blob: Union[bytes, memoryview]) -> Allegato:
+        """Allegato per ``blob``, scritto solo se il deposito non lo contiene già.
+
+        Accetta anche un memoryview (es. ``UploadedFile.getbuffer()``): hash e
+        scrittura non copiano il contenuto.
+        """
+        rif = Allegato(hashlib.sha256(blob).hexdigest())
+        path = self._percorso(rif.hash)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            self._scrivi(path, blob)
+        return rif
+
+    def leggi(self, rif: Allegato) -> bytes:
+        """Byte dell'originale. AllegatoMancante se è stato eliminato dalla pulizia."""
+        path = self._percorso(rif.hash)
+        try:
+            blob = path.read_bytes()
+        except FileNotFoundError:
+            raise AllegatoMancante(f"allegato {rif.hash[:12]} non più nel deposito") from None
+        os.utime(path)
+        return blob
+
+    def variante(self, rif: Allegato, nome: str, crea: Callable[[bytes], bytes]) -> bytes:
+        """Variante ``nome`` dell'allegato: dal disco se c'è, altrimenti ``crea(originale)`` salvata accanto.
+
+        AllegatoMancante se mancano sia la variante sia l'originale.
+        """
+        path = self._percorso(rif.hash, nome)
+        try:
+            blob = path.read_bytes()
+        except FileNotFoundError:
+            blob = crea(self.leggi(rif))
+            self._scrivi(path, blob)
+            return blob
+        os.utime(path)
+        return blob
+
+    def miniatura(self, rif: Allegato, lato: int = MINIATURA_PX) -> bytes:
+        """Anteprima con il lato lungo di ``lato`` pixel (JPEG, PNG se trasparente)."""
+        return self.variante(rif, f"mini{lato}", lambda blob: _miniatura(blob, lato))
+
+    def stampa(self, rif: Allegato, larghezza_emu: int) -> bytes:
+        """L'immagine come la restituirebbe immagini.per_docx per ``larghezza_emu``, calcolata una volta."""
+        from immagini import DPI, EMU_PER_POLLICE, per_docx
+
+        larghezza_px = max(1, round(int(larghezza_emu) * DPI / EMU_PER_POLLICE))
+        return self.variante(rif, f"stampa{larghezza_px}", lambda blob: per_docx(blob, larghezza_emu))
+
+    def dimensione(self) -> int:
+        return sum(size for size, _, _ in self._gruppi().values())
+
+    def pulisci(self, max_bytes: Optional[int] = None) -> int:
+        """Elimina gli allegati usati meno di recente finché il deposito sta in ``max_bytes``; restituisce quanti."""
+        limite = self.max_bytes if max_bytes is None else max_bytes
+        gruppi = self._gruppi()
+        totale = sum(size for size, _, _ in gruppi.values())
+        eliminati = 0
+        for size, _, files in sorted(gruppi.values(), key=lambda g: g[1]):
+            if totale <= limite:
+                break
+            for path in files:
+                path.unlink(missing_ok=True)
+            totale -= size
+            eliminati += 1
+        with self._lock:
+            self._totale = totale
+        return eliminati
+
+    def _gruppi(self) -> Dict[str, Tuple[int, float, List[Path]]]:
+        """hash -> (byte, ultimo uso, file) per originale e varianti insieme."""
+        gruppi: Dict[str, Tuple[int, float, List[Path]]] = {}
+        if not self.radice.is_dir():
+            return gruppi
+        for cartella in self.radice.iterdir():
+            if not cartella.is_dir():
+                continue
+            for voce in os.scandir(cartella):
+                if voce.name.startswith("."):
+                    continue
+                try:
+                    st = voce.stat()
+                except FileNotFoundError:
+                    continue
+                hash_ = voce.name.split(".", 1)[0]
+                size, uso, files = gruppi.get(hash_, (0, 0.0, []))
+                files.append(Path(voce.path))
+                gruppi[hash_] = (size + st.st_size, max(uso, st.st_mtime), files)
+        return gruppi
+
+
+def _miniatura(blob: bytes, lato: int) -> bytes:
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(blob)) as im:
+        im.draft("RGB", (lato, lato))  # JPEG: decodifica già ridotta
+        im = ImageOps.exif_transpose(im)
+        im.thumbnail((lato, lato))
+        out = io.BytesIO()
+        if im.mode in ("RGBA", "LA", "P") and (im.mode != "P" or "transparency" in im.info):
+            im.save(out, "PNG", optimize=True)
+        else:
+            im.convert("RGB").save(out, "JPEG", quality=80)
+    return out.getvalue()
+
+
+@lru_cache(maxsize=None)
+def deposito() -> Deposito:
+    """Deposito predefinito del processo (cartella RADICE, condivisa da app e worker)."""
+    return Deposito()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Deposito delle immagini caricate.")
+    parser.add_argument("--pulisci", type=float, metavar="MB", help="elimina gli allegati meno recenti oltre MB")
+    args = parser.parse_args(argv)
+
+    dep = deposito()
+    if args.pulisci is not None:
+        print(f"{dep.pulisci(int(args.pulisci * 1024 * 1024))} allegati eliminati")
+    gruppi = dep._gruppi()
+    print(f"{len(gruppi)} allegati, {sum(g[0] for g in gruppi.values()) / 1e6:.1f} MB in {dep.radice}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,315 @@
+"""Archivio locale dei progetti (SQLite) con salvataggio incrementale.
+
+Un progetto è una riga di ``progetti`` (campi semplici in JSON, più
+committente, cod_progetto, nome e data del documento in colonne indicizzate
+per la ricerca) e una riga di ``righe`` per ogni riga delle tabelle
+revisioni, quadri, linee e verifiche, con chiave (progetto, tabella,
+posizione). Le immagini non sono archiviate.
+
+salva confronta il progetto con l'ultimo stato scritto (tenuto in memoria
+come JSON per riga) e scrive solo le differenze: i campi se sono cambiati,
+le righe di tabella diverse da quelle nella stessa posizione, la
+cancellazione delle righe in coda se la tabella si è accorciata. Il
+confronto è per posizione: modificare o aggiungere righe in fondo scrive
+solo quelle, mentre una riga inserita o tolta in mezzo riscrive tutte le
+successive. Un salvataggio senza modifiche non scrive nulla, così l'app può
+salvare a ogni rerun. carica legge il progetto con due query sulle chiavi
+primarie.
+
+Ogni progetto ha una versione (l'istante dell'ultimo salvataggio, colonna
+``aggiornato``), restituita da carica e salva. Chi passa a salva la versione
+che ha letto riceve Conflitto se nel frattempo un'altra sessione (o un altro
+processo) ha salvato lo stesso progetto, invece di sovrascriverne le
+modifiche.
+
+    python archivio.py --cerca Rossi                # progetti per committente / cod. progetto
+    python archivio.py --esporta 12 progetto.json   # file di progetto per cli.py e batch.py
+"""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from relazione import IMAGE_KEYS
+
+ARCHIVIO = Path(__file__).resolve().parent / "archivio.sqlite"
+TABELLE = ("revisioni", "quadri", "linee", "verifiche")
+CAMPI = "campi"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS progetti (
+    id INTEGER PRIMARY KEY,
+    committente TEXT NOT NULL COLLATE NOCASE,
+    cod_progetto TEXT NOT NULL COLLATE NOCASE,
+    nome_progetto TEXT NOT NULL,
+    data TEXT,
+    aggiornato REAL NOT NULL,
+    campi TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS progetti_committente ON progetti (committente);
+CREATE INDEX IF NOT EXISTS progetti_cod_progetto ON progetti (cod_progetto);
+CREATE INDEX IF NOT EXISTS progetti_data ON progetti (data);
+CREATE TABLE IF NOT EXISTS righe (
+    progetto INTEGER NOT NULL REFERENCES progetti (id) ON DELETE CASCADE,
+    tabella TEXT NOT NULL,
+    pos INTEGER NOT NULL,
+    dati TEXT NOT NULL,
+    PRIMARY KEY (progetto, tabella, pos)
+) WITHOUT ROWID;
+"""
+
+
+class Conflitto(RuntimeError):
+    """Il progetto è stato salvato da altri dopo la versione che si voleva aggiornare."""
+
+
+@dataclass(frozen=True)
+class Voce:
+    """Riga dell'elenco progetti restituito da Archivio.cerca."""
+    id: int
+    committente: str
+    cod_progetto: str
+    nome_progetto: str
+    data: Optional[str]
+    aggiornato: float
+
+    def etichetta(self) -> str:
+        return f"{self.committente} – {self.cod_progetto} ({self.data or 's.d.'})"
+
+
+def _json_default(v: Any) -> Any:
+    # date dei widget: marcate per tornare date al caricamento; il resto (Timestamp, ...) come testo
+    if isinstance(v, date):
+        return {"$data": v.isoformat()}
+    return str(v)
+
+
+def _json_hook(d: Dict[str, Any]) -> Any:
+    return date.fromisoformat(d["$data"]) if len(d) == 1 and "$data" in d else d
+
+
+def _dumps(v: Any) -> str:
+    return json.dumps(v, ensure_ascii=False, default=_json_default)
+
+
+def _loads(s: str) -> Any:
+    return json.loads(s, object_hook=_json_hook)
+
+
+def _testo(v: Any) -> str:
+    return "" if v is None else str(v)
+
+
+def _data_iso(v: Any) -> Optional[str]:
+    if isinstance(v, date):
+        return v.isoformat()
+    if isinstance(v, str) and v:
+        return v
+    return None
+
+
+def _like(prefisso: str) -> str:
+    return prefisso.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def _scomponi(progetto: Dict[str, Any]) -> Dict[str, List[str]]:
+    """{"campi": [json], tabella: [json per riga]}: la forma in cui il progetto è confrontato e scritto."""
+    escluse = set(TABELLE) | set(IMAGE_KEYS)
+    stato = {CAMPI: [_dumps({k: v for k, v in progetto.items() if k not in escluse})]}
+    for tabella in TABELLE:
+        stato[tabella] = [_dumps(r) for r in progetto.get(tabella) or ()]
+    return stato
+
+
+class Archivio:
+    """Archivio dei progetti su un file SQLite, condivisibile tra thread (una connessione, un lock)."""
+
+    def __init__(self, path: Union[str, Path] = ARCHIVIO):
+        self.path = Path(path)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.executescript("PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL; PRAGMA foreign_keys=ON;")
+        self._conn.executescript(_SCHEMA)
+        # ultimo stato letto o scritto per progetto, nella forma di _scomponi, con la sua versione
+        self._salvati: Dict[int, Tuple[float, Dict[str, List[str]]]] = {}
+
+    def salva(
+        self, progetto: Dict[str, Any], id_: Optional[int] = None, versione: Optional[float] = None
+    ) -> Tuple[int, float]:
+        """Salva ``progetto`` (nuovo se ``id_`` è None) scrivendo solo ciò che è cambiato.
+
+        Restituisce ``(id, versione)``. Con ``versione`` (quella restituita
+        dall'ultimo carica o salva del chiamante) solleva Conflitto se il
+        progetto è stato salvato da altri nel frattempo; senza, lo sovrascrive.
+        """
+        nuovo = _scomponi(progetto)
+        with self._lock:
+            if id_ is not None:
+                attuale = self._versione(id_, versione)
+                vecchio = self._stato(id_, attuale)
+                if vecchio == nuovo:
+                    return id_, attuale
+            else:
+                vecchio = None
+            conn = self._conn
+            with _transazione(conn):
+                adesso = time.time()
+                if id_ is not None:
+                    # ricontrollata nella transazione: un altro processo può aver scritto nel frattempo
+                    prima_versione, attuale = attuale, self._versione(id_, versione)
+                    if attuale != prima_versione:
+                        vecchio = self._leggi(id_)
+                    adesso = max(adesso, attuale + 1e-6)
+                indice = (
+                    _testo(progetto.get("committente")), _testo(progetto.get("cod_progetto")),
+                    _testo(progetto.get("nome_progetto")), _data_iso(progetto.get("data_doc")), adesso,
+                )
+                if vecchio is None:
+                    id_ = conn.execute(
+                        "INSERT INTO progetti (committente, cod_progetto, nome_progetto, data, aggiornato, campi)"
+                        " VALUES (?, ?, ?, ?, ?, ?)", (*indice, nuovo[CAMPI][0])
+                    ).lastrowid
+                    vecchio = {CAMPI: nuovo[CAMPI], **{t: [] for t in TABELLE}}
+                elif vecchio[CAMPI] != nuovo[CAMPI]:
+                    conn.execute(
+                        "UPDATE progetti SET committente = ?, cod_progetto = ?, nome_progetto = ?, data = ?,"
+                        " aggiornato = ?, campi = ? WHERE id = ?", (*indice, nuovo[CAMPI][0], id_)
+                    )
+                else:
+                    conn.execute("UPDATE progetti SET aggiornato = ? WHERE id = ?", (indice[-1], id_))
+                for tabella in TABELLE:
+                    prima, dopo = vecchio[tabella], nuovo[tabella]
+                    cambiate = [
+                        (id_, tabella, pos, riga) for pos, riga in enumerate(dopo)
+                        if pos >= len(prima) or prima[pos] != riga
+                    ]
+                    if cambiate:
+                        conn.executemany("INSERT OR REPLACE INTO righe VALUES (?, ?, ?, ?)", cambiate)
+                    if len(dopo) < len(prima):
+                        conn.execute(
+                            "DELETE FROM righe WHERE progetto = ? AND tabella = ? AND pos >= ?", (id_, tabella, len(dopo))
+                        )
+            self._salvati[id_] = (adesso, nuovo)
+        return id_, adesso
+
+    def carica(self, id_: int) -> Tuple[Dict[str, Any], float]:
+        """Il progetto ``id_`` (campi e tabelle, senza immagini) e la sua versione. KeyError se non esiste."""
+        with self._lock:
+            while True:
+                versione = self._versione(id_)
+                stato = self._leggi(id_)
+                # un altro processo ha salvato fra le due letture: si rilegge
+                if self._versione(id_) == versione:
+                    break
+            self._salvati[id_] = (versione, stato)
+        progetto = _loads(stato[CAMPI][0])
+        for tabella in TABELLE:
+            progetto[tabella] = [_loads(r) for r in stato[tabella]]
+        return progetto, versione
+
+    def cerca(
+        self, testo: str = "", dal: Optional[date] = None, al: Optional[date] = None, limite: int = 50
+    ) -> List[Voce]:
+        """Progetti il cui committente o cod. progetto inizia con ``testo``, nell'intervallo di date, più recenti prima."""
+        condizioni, args = [], []
+        if testo:
+            condizioni.append("(committente LIKE ? ESCAPE '\\' OR cod_progetto LIKE ? ESCAPE '\\')")
+            args += [_like(testo)] * 2
+        if dal:
+            condizioni.append("data >= ?")
+            args.append(dal.isoformat())
+        if al:
+            condizioni.append("data <= ?")
+            args.append(al.isoformat())
+        where = f"WHERE {' AND '.join(condizioni)}" if condizioni else ""
+        with self._lock:
+            righe = self._conn.execute(
+                "SELECT id, committente, cod_progetto, nome_progetto, data, aggiornato FROM progetti"
+                f" {where} ORDER BY data DESC, id DESC LIMIT ?", (*args, limite)
+            ).fetchall()
+        return [Voce(*r) for r in righe]
+
+    def elimina(self, id_: int) -> None:
+        with self._lock, _transazione(self._conn):
+            self._conn.execute("DELETE FROM progetti WHERE id = ?", (id_,))
+            self._salvati.pop(id_, None)
+
+    def chiudi(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _versione(self, id_: int, attesa: Optional[float] = None) -> float:
+        """Versione salvata di ``id_``; Conflitto se diversa da ``attesa``, KeyError se il progetto non c'è."""
+        riga = self._conn.execute("SELECT aggiornato FROM progetti WHERE id = ?", (id_,)).fetchone()
+        if riga is None:
+            raise KeyError(id_)
+        if attesa is not None and riga[0] != attesa:
+            raise Conflitto(f"il progetto {id_} è stato modificato da un'altra sessione")
+        return riga[0]
+
+    def _stato(self, id_: int, versione: float) -> Dict[str, List[str]]:
+        # lo stato in memoria vale solo se nessun altro ha salvato dopo
+        salvato = self._salvati.get(id_)
+        return salvato[1] if salvato is not None and salvato[0] == versione else self._leggi(id_)
+
+    def _leggi(self, id_: int) -> Dict[str, List[str]]:
+        riga = self._conn.execute("SELECT campi FROM progetti WHERE id = ?", (id_,)).fetchone()
+        if riga is None:
+            raise KeyError(id_)
+        stato: Dict[str, List[str]] = {CAMPI: [riga[0]], **{t: [] for t in TABELLE}}
+        for tabella, dati in self._conn.execute(
+            "SELECT tabella, dati FROM righe WHERE progetto = ? ORDER BY tabella, pos", (id_,)
+        ):
+            stato[tabella].append(dati)
+        return stato
+
+
+@contextmanager
+def _transazione(conn: sqlite3.Connection) -> Iterator[None]:
+    """BEGIN IMMEDIATE ... COMMIT (ROLLBACK se c'è un'eccezione) sulla connessione in autocommit."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Archivio dei progetti.")
+    parser.add_argument("--archivio", default=str(ARCHIVIO), help=f"file SQLite (default: {ARCHIVIO.name})")
+    gruppo = parser.add_mutually_exclusive_group(required=True)
+    gruppo.add_argument("--cerca", metavar="TESTO", help="committente o cod. progetto (inizio); '' per tutti")
+    gruppo.add_argument("--esporta", nargs=2, metavar=("ID", "JSON"), help="scrive il progetto in un file JSON")
+    args = parser.parse_args(argv)
+
+    archivio = Archivio(args.archivio)
+    try:
+        if args.esporta is not None:
+            id_, dest = args.esporta
+            progetto, _ = archivio.carica(int(id_))
+            Path(dest).write_text(
+                json.dumps(progetto, ensure_ascii=False, indent=1, default=lambda v: v.isoformat()), encoding="utf-8"
+            )
+            print(f"progetto {id_} esportato in {dest}")
+        else:
+            for voce in archivio.cerca(args.cerca, limite=1000):
+                print(f"{voce.id:>6}  {voce.etichetta()}")
+    finally:
+        archivio.chiudi()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
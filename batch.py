@@ -0,0 +1,237 @@
+"""Generazione PDF in blocco (depositi flotte, contratti multi-condominio, ...).
+
+Le relazioni vengono generate su un pool di processi dimensionato sui core:
+genera_pdf_relazione_bytes è puro Python sotto GIL, quindi i thread non
+servirebbero. La coda dei lavori in volo è limitata, così anche migliaia di
+progetti non finiscono tutti in memoria; gli errori sono raccolti per documento
+e non interrompono il lotto.
+
+Uso da riga di comando:
+
+    python batch.py progetti/ -o pdf/ -j 8
+
+Ogni file JSON è un payload per genera_pdf_relazione_bytes. I campi immagine
+(``*_bytes``, ``timbro_png``) possono contenere il percorso del file,
+relativo al JSON. Con ``--progetti`` i file (JSON o YAML) sono invece file di
+progetto come per cli.py, trasformati con relazione.costruisci_payload.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, Executor, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+IMAGE_KEYS = ("timbro_bytes", "timbro_png", "foto1_bytes", "foto2_bytes", "foto3_bytes", "foto4_bytes")
+
+
+@dataclass
+class EsitoBatch:
+    nome: str
+    pdf: Optional[bytes] = None
+    docx: Optional[bytes] = None
+    percorso: Optional[str] = None
+    errore: str = ""
+    secondi: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return not self.errore
+
+
+Lavoro = Tuple[str, Union[Dict[str, Any], str, Path]]
+
+
+def carica_payload(path: Union[str, Path]) -> Dict[str, Any]:
+    """Legge un payload JSON risolvendo i campi immagine indicati come percorso."""
+    path = Path(path)
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    for key in IMAGE_KEYS:
+        val = data.get(key)
+        if isinstance(val, str) and val:
+            data[key] = (path.parent / val).read_bytes()
+    return data
+
+
+def _avvia_worker():
+    """Initializer del pool: renderer PDF importato ed esercitato prima del primo lavoro."""
+    from documento import riscalda
+
+    riscalda(("pdf",))
+
+
+def _genera_uno(
+    nome: str, sorgente: Union[Dict[str, Any], str, Path], out_dir: Optional[str], da_progetto: bool
+) -> EsitoBatch:
+    t0 = time.perf_counter()
+    try:
+        from pdf_generator import genera_pdf_relazione_bytes
+
+        if da_progetto:
+            from relazione import carica_progetto, costruisci_payload
+
+            progetto = sorgente if isinstance(sorgente, dict) else carica_progetto(sorgente)
+            payload = costruisci_payload(progetto)
+        else:
+            payload = sorgente if isinstance(sorgente, dict) else carica_payload(sorgente)
+        pdf = genera_pdf_relazione_bytes(payload)
+        if out_dir:
+            dest = os.path.join(out_dir, f"{nome}.pdf")
+            with open(dest, "wb") as f:
+                f.write(pdf)
+            return EsitoBatch(nome, percorso=dest, secondi=time.perf_counter() - t0)
+        return EsitoBatch(nome, pdf=pdf, secondi=time.perf_counter() - t0)
+    except Exception:
+        return EsitoBatch(nome, errore=traceback.format_exc(limit=3), secondi=time.perf_counter() - t0)
+
+
+def genera_pdf_batch(
+    lavori: Iterable[Lavoro],
+    out_dir: Optional[Union[str, Path]] = None,
+    max_workers: Optional[int] = None,
+    max_in_flight: Optional[int] = None,
+    progress: Optional[Callable[[int, EsitoBatch], None]] = None,
+    da_progetto: bool = False,
+) -> Iterator[EsitoBatch]:
+    """Genera i PDF dei lavori ``(nome, payload | percorso JSON)`` in parallelo.
+
+    Restituisce gli esiti man mano che i documenti sono pronti (ordine di
+    completamento). Con ``out_dir`` i PDF sono scritti dai worker e l'esito
+    contiene solo il percorso, evitando di rimandare i byte al processo padre.
+    ``progress(n_completati, esito)`` viene chiamata per ogni documento.
+    Con ``da_progetto`` le sorgenti sono dati di progetto (relazione.DEFAULTS)
+    e il payload viene costruito nel worker.
+    """
+    workers = max_workers or os.cpu_count() or 1
+    in_flight = max(max_in_flight or 2 * workers, 1)
+    dest = str(out_dir) if out_dir else None
+    if dest:
+        os.makedirs(dest, exist_ok=True)
+
+    lavori_it = ((_genera_uno, (nome, sorgente, dest, da_progetto)) for nome, sorgente in lavori)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_avvia_worker) as pool:
+        yield from in_parallelo(pool, lavori_it, in_flight, progress)
+
+
+def in_parallelo(
+    pool: Executor,
+    chiamate: Iterable[Tuple[Callable[..., EsitoBatch], tuple]],
+    in_flight: int,
+    progress: Optional[Callable[[int, EsitoBatch], None]] = None,
+    completati: int = 0,
+) -> Iterator[EsitoBatch]:
+    """Sottomette ``(funzione, argomenti)`` al pool con al più ``in_flight`` lavori in volo.
+
+    Gli esiti sono restituiti in ordine di completamento; ``chiamate`` viene
+    consumato solo quando si libera un posto. ``completati`` è il punto di
+    partenza del contatore passato a ``progress``.
+    """
+    chiamate_it = iter(chiamate)
+    pending = set()
+    esaurito = False
+    while True:
+        while not esaurito and len(pending) < in_flight:
+            try:
+                fn, argomenti = next(chiamate_it)
+            except StopIteration:
+                esaurito = True
+                break
+            pending.add(pool.submit(fn, *argomenti))
+        if not pending:
+            break
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for fut in done:
+            esito = fut.result()
+            completati += 1
+            if progress:
+                progress(completati, esito)
+            yield esito
+
+
+def _nomi_univoci(files: List[Path]) -> List[str]:
+    """Nome di ogni file per l'output: lo stem, reso univoco quando più file hanno lo stesso.
+
+    Agli stem ripetuti si antepongono le cartelle a partire da quella comune
+    (``a/p.json``, ``b/p.json`` -> ``a-p``, ``b-p``); se non basta si aggiunge
+    l'estensione (``p.json``, ``p.yaml`` -> ``p-json``, ``p-yaml``) e come
+    ultima risorsa un numero. Le maiuscole non contano (file system che non
+    le distinguono).
+    """
+    gruppi: Dict[str, List[int]] = {}
+    for i, f in enumerate(files):
+        gruppi.setdefault(f.stem.casefold(), []).append(i)
+    nomi = [f.stem for f in files]
+    for indici in gruppi.values():
+        if len(indici) < 2:
+            continue
+        percorsi = [files[i] for i in indici]
+        base = Path(os.path.commonpath([f.parent for f in percorsi]))
+        for i, f in zip(indici, percorsi):
+            nomi[i] = "-".join(f.relative_to(base).with_suffix("").parts)
+        if len({nomi[i].casefold() for i in indici}) < len(indici):
+            for i, f in zip(indici, percorsi):
+                nomi[i] += "-" + f.suffix.lstrip(".")
+    usati = set()
+    for i, nome in enumerate(nomi):
+        univoco, n = nome, 2
+        while univoco.casefold() in usati:
+            univoco, n = f"{nome}-{n}", n + 1
+        usati.add(univoco.casefold())
+        nomi[i] = univoco
+    return nomi
+
+
+def trova_progetti(sorgenti: Iterable[Union[str, Path]], patterns: Tuple[str, ...] = ("*.json",)) -> List[Lavoro]:
+    """Espande file e cartelle in lavori ``(nome, percorso)`` (cartelle: file che rispettano ``patterns``).
+
+    Un file indicato più volte dà un solo lavoro; i nomi sono univoci (vedi
+    _nomi_univoci), così nessun file di output ne sovrascrive un altro.
+    """
+    files: List[Path] = []
+    visti = set()
+    for s in sorgenti:
+        p = Path(s)
+        for f in sorted(f for pat in patterns for f in p.glob(pat)) if p.is_dir() else [p]:
+            f = f.resolve()
+            if f not in visti:
+                visti.add(f)
+                files.append(f)
+    return list(zip(_nomi_univoci(files), files))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Generazione PDF in blocco delle relazioni tecniche.")
+    parser.add_argument("sorgenti", nargs="+", help="file JSON o cartelle contenenti file JSON")
+    parser.add_argument("-o", "--out", default="pdf", help="cartella di destinazione (default: pdf)")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="processi (default: numero di core)")
+    parser.add_argument("--in-flight", type=int, default=None, help="lavori in coda al pool (default: 2 x processi)")
+    parser.add_argument("--progetti", action="store_true", help="i file sono progetti (JSON/YAML) come per cli.py")
+    args = parser.parse_args(argv)
+
+    patterns = ("*.json", "*.yaml", "*.yml") if args.progetti else ("*.json",)
+    lavori = trova_progetti(args.sorgenti, patterns)
+    totale = len(lavori)
+
+    def _progress(n: int, esito: EsitoBatch):
+        stato = "ok" if esito.ok else "ERRORE"
+        print(f"[{n}/{totale}] {esito.nome}: {stato} ({esito.secondi:.2f}s)", file=sys.stderr)
+
+    t0 = time.perf_counter()
+    errori = [e for e in genera_pdf_batch(lavori, args.out, args.jobs, args.in_flight, _progress, args.progetti) if not e.ok]
+    dt = time.perf_counter() - t0
+    print(f"{totale - len(errori)}/{totale} PDF generati in {dt:.1f}s", file=sys.stderr)
+    for e in errori:
+        print(f"\n--- {e.nome} ---\n{e.errore}", file=sys.stderr)
+    return 1 if errori else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
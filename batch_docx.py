@@ -0,0 +1,383 @@
+"""Generazione DOCX in blocco a partire dai profili (profiles/*.json).
+
+Un profilo ha le chiavi di profiles/default.json: i campi di RelazioneData,
+ProgettistaData (``progettista_*``) ed EsecutriceData (``esecutrice_*``), più
+alcune chiavi facoltative:
+
+- ``data``: data della relazione (``AAAA-MM-GG`` o testo; default oggi);
+- ``template``: template .docx, relativo al profilo (default ``--template``);
+- ``colonnine``: lista di ``{"descrizione", "quantita"}``; se manca si usa
+  ``modello_wallbox`` / ``potenza_wallbox_kw``;
+- ``extra_fields``: campi "aggiungere ..." come per generate_document;
+- ``foto`` (percorsi o ``{"file", "didascalia"}``), ``diagramma``,
+  ``allegati``: file relativi al profilo, letti dal worker;
+- ``quadri``, ``linee``: righe delle tabelle come nel payload PDF
+  (relazione.costruisci_payload).
+
+I profili sono validati nel processo padre (risultato in cache per mtime, così
+un servizio che rilancia il lotto non rilegge i file invariati); i documenti
+sono generati su un pool di processi. I template sono letti una sola volta dal
+padre e passati ai worker all'avvio: ciascun worker li prepara una volta e poi
+li usa in sola lettura.
+
+    python batch_docx.py profiles/ -o docx/          # un .docx per profilo
+    python batch_docx.py profiles/ -o relazioni.zip  # zip scritto man mano
+    python batch_docx.py profiles/ -o - > relazioni.zip
+    python batch_docx.py --campi -t templates/template_aggiungere.dotx  # campi usati dal template
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import threading
+import time
+import traceback
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from batch import EsitoBatch, Lavoro, in_parallelo, trova_progetti
+
+TEMPLATE_DEFAULT = Path(__file__).resolve().parent / "templates" / "relazione_base.docx"
+BACKENDS = ("stream", "python-docx")
+
+# chiave del profilo -> tipo; le chiavi non elencate sono ignorate (es. richiedente_*)
+CAMPI_OBBLIGATORI = {
+    "luogo": str,
+    "committente_nome": str,
+    "sito_indirizzo": str,
+    "sito_cap_citta": str,
+    "oggetto": str,
+    "progettista_nome": str,
+    "progettista_indirizzo": str,
+    "progettista_cell": str,
+    "progettista_email": str,
+    "progettista_piva": str,
+}
+CAMPI_FACOLTATIVI = {
+    "data": str,
+    "template": str,
+    "distanza_m": int,
+    "potenza_impegnata_kw": float,
+    "potenza_wallbox_kw": float,
+    "ik_trifase_ka": float,
+    "ik_monofase_ka": float,
+    "cavo_lunghezza_m": int,
+    "cavo_tipo": str,
+    "modello_wallbox": str,
+    "layout_incluso": str,
+    "layout_escluso": str,
+    "esecutrice_nome": str,
+    "esecutrice_indirizzo": str,
+    "esecutrice_piva": str,
+    "colonnine": list,
+    "extra_fields": dict,
+    "foto": list,
+    "diagramma": str,
+    "allegati": list,
+    "quadri": list,
+    "linee": list,
+}
+
+
+class ProfiloNonValido(ValueError):
+    pass
+
+
+def _valida(path: Path, dati: Any) -> Dict[str, Any]:
+    if not isinstance(dati, dict):
+        raise ProfiloNonValido(f"{path}: il profilo deve essere un oggetto JSON")
+    mancanti = [k for k in CAMPI_OBBLIGATORI if k not in dati]
+    if mancanti:
+        raise ProfiloNonValido(f"{path}: campi mancanti: {', '.join(mancanti)}")
+    profilo = dict(dati)
+    for chiave, tipo in {**CAMPI_OBBLIGATORI, **CAMPI_FACOLTATIVI}.items():
+        val = profilo.get(chiave)
+        if val is None:
+            continue
+        if tipo in (int, float):
+            # i numeri possono arrivare anche come testo ("4,5")
+            try:
+                num = float(val.replace(",", ".")) if isinstance(val, str) else float(val)
+            except (TypeError, ValueError):
+                raise ProfiloNonValido(f"{path}: {chiave} deve essere un numero, non {val!r}") from None
+            profilo[chiave] = int(num) if tipo is int and num == int(num) else num
+        elif tipo is str:
+            if isinstance(val, (int, float)) and not isinstance(val, bool):
+                profilo[chiave] = str(val)
+            elif not isinstance(val, str):
+                raise ProfiloNonValido(f"{path}: {chiave} deve essere un testo")
+        elif not isinstance(val, tipo):
+            raise ProfiloNonValido(f"{path}: {chiave} deve essere {'una lista' if tipo is list else 'un oggetto'}")
+    for i, c in enumerate(profilo.get("colonnine") or []):
+        if not isinstance(c, dict) or not str(c.get("descrizione", "")).strip():
+            raise ProfiloNonValido(f"{path}: colonnine[{i}] senza descrizione")
+    return profilo
+
+
+_VALIDATI: Dict[str, Tuple[int, int, Dict[str, Any]]] = {}
+_VALIDATI_LOCK = threading.Lock()
+
+
+def carica_profilo(path: Union[str, Path]) -> Dict[str, Any]:
+    """Legge e valida un profilo JSON; il risultato resta in cache finché mtime e dimensione non cambiano.
+
+    Solleva ProfiloNonValido (o OSError / json.JSONDecodeError) se il file non è utilizzabile.
+    """
+    import json
+
+    path = Path(path).resolve()
+    st = path.stat()
+    chiave = str(path)
+    with _VALIDATI_LOCK:
+        hit = _VALIDATI.get(chiave)
+    if hit is not None and hit[:2] == (st.st_mtime_ns, st.st_size):
+        return hit[2]
+    with open(path, "r", encoding="utf-8") as f:
+        profilo = _valida(path, json.load(f))
+    with _VALIDATI_LOCK:
+        _VALIDATI[chiave] = (st.st_mtime_ns, st.st_size, profilo)
+    return profilo
+
+
+def dati_da_profilo(profilo: Dict[str, Any]):
+    """Dataclass del generatore da un profilo validato.
+
+    Restituisce ``(RelazioneData, ProgettistaData, EsecutriceData | None,
+    colonnine, extra_fields)``; foto, diagramma e allegati sono letti a parte
+    (vedi ``_file_da_profilo``).
+    """
+    from generator import ColonninaItem, EsecutriceData, ProgettistaData, RelazioneData
+    from relazione import _data
+
+    def testo(k: str) -> str:
+        return str(profilo.get(k) or "").strip()
+
+    facoltativi = {
+        k: profilo[k]
+        for k in ("distanza_m", "potenza_impegnata_kw", "ik_trifase_ka", "ik_monofase_ka",
+                  "cavo_lunghezza_m", "cavo_tipo", "layout_incluso", "layout_escluso")
+        if profilo.get(k) is not None
+    }
+    data = RelazioneData(
+        luogo_data=f"{testo('luogo')}, {_data(profilo.get('data'))}",
+        committente=testo("committente_nome"),
+        sito_indirizzo=testo("sito_indirizzo"),
+        sito_cap_citta=testo("sito_cap_citta"),
+        oggetto=testo("oggetto"),
+        **facoltativi,
+    )
+    progettista = ProgettistaData(
+        testo("progettista_nome"), testo("progettista_indirizzo"), testo("progettista_cell"),
+        testo("progettista_email"), testo("progettista_piva"),
+    )
+    esecutrice = None
+    if testo("esecutrice_nome"):
+        esecutrice = EsecutriceData(testo("esecutrice_nome"), testo("esecutrice_indirizzo"), testo("esecutrice_piva"))
+
+    if profilo.get("colonnine"):
+        colonnine = [ColonninaItem(str(c["descrizione"]).strip(), int(c.get("quantita") or 1)) for c in profilo["colonnine"]]
+    elif testo("modello_wallbox"):
+        descr = testo("modello_wallbox")
+        if profilo.get("potenza_wallbox_kw"):
+            descr += f" da {profilo['potenza_wallbox_kw']:g} kW".replace(".", ",")
+        colonnine = [ColonninaItem(descr)]
+    else:
+        colonnine = []
+    extra = {str(k): str(v) for k, v in (profilo.get("extra_fields") or {}).items()}
+    return data, progettista, esecutrice, colonnine, extra
+
+
+def _file_da_profilo(profilo: Dict[str, Any], base: Path):
+    """Foto, diagramma e allegati del profilo (percorsi relativi a ``base``)."""
+    from generator import AllegatoItem, PhotoItem
+
+    photos = []
+    for voce in profilo.get("foto") or []:
+        nome, didascalia = (voce, "") if isinstance(voce, str) else (voce["file"], voce.get("didascalia", ""))
+        f = base / nome
+        photos.append(PhotoItem(f.name, f.read_bytes(), didascalia))
+    diagram = (base / profilo["diagramma"]).read_bytes() if profilo.get("diagramma") else None
+    allegati = []
+    for nome in profilo.get("allegati") or []:
+        f = base / nome
+        allegati.append(AllegatoItem(f.name, f.read_bytes(), f.suffix.lower().lstrip(".")))
+    return photos, diagram, allegati
+
+
+def template_di(profilo: Dict[str, Any], percorso: Path, default: Path) -> Path:
+    return (percorso.parent / profilo["template"]).resolve() if profilo.get("template") else Path(default).resolve()
+
+
+# -------------------- Worker --------------------
+_TEMPLATE: Dict[str, bytes] = {}
+
+
+def _avvia_worker(templates: Dict[str, bytes], backend: str):
+    """Initializer del pool: registra i template e li prepara una volta per processo."""
+    _TEMPLATE.update(templates)
+    if backend == "stream":
+        import docx_stream
+
+        for raw in templates.values():
+            docx_stream._modello(raw)
+    else:
+        import generator
+
+        generator.TEMPLATES.precarica(templates.values())
+
+
+def _genera_uno_docx(
+    nome: str, percorso: str, profilo: Dict[str, Any], template: str, out_dir: Optional[str], backend: str
+) -> EsitoBatch:
+    t0 = time.perf_counter()
+    try:
+        data, progettista, esecutrice, colonnine, extra = dati_da_profilo(profilo)
+        photos, diagram, allegati = _file_da_profilo(profilo, Path(percorso).parent)
+        raw = _TEMPLATE.get(template) or Path(template).read_bytes()
+        argomenti = (raw, data, progettista, esecutrice, colonnine, photos, diagram, allegati, extra)
+        tabelle = {"quadri": profilo.get("quadri"), "linee": profilo.get("linee")}
+        if backend == "stream":
+            from docx_stream import genera_docx_stream
+
+            if out_dir:
+                dest = os.path.join(out_dir, f"{nome}.docx")
+                with open(dest, "wb") as f:
+                    genera_docx_stream(*argomenti, out=f, **tabelle)
+                return EsitoBatch(nome, percorso=dest, secondi=time.perf_counter() - t0)
+            docx = genera_docx_stream(*argomenti, **tabelle)
+        else:
+            from generator import generate_document
+
+            docx = generate_document(*argomenti, **tabelle)
+            if out_dir:
+                dest = os.path.join(out_dir, f"{nome}.docx")
+                with open(dest, "wb") as f:
+                    f.write(docx)
+                return EsitoBatch(nome, percorso=dest, secondi=time.perf_counter() - t0)
+        return EsitoBatch(nome, docx=docx, secondi=time.perf_counter() - t0)
+    except Exception:
+        return EsitoBatch(nome, errore=traceback.format_exc(limit=3), secondi=time.perf_counter() - t0)
+
+
+# -------------------- API --------------------
+def genera_docx_batch(
+    lavori: Iterable[Lavoro],
+    template: Union[str, Path] = TEMPLATE_DEFAULT,
+    out_dir: Optional[Union[str, Path]] = None,
+    max_workers: Optional[int] = None,
+    max_in_flight: Optional[int] = None,
+    progress: Optional[Callable[[int, EsitoBatch], None]] = None,
+    backend: str = "stream",
+) -> Iterator[EsitoBatch]:
+    """Genera i DOCX dei lavori ``(nome, percorso profilo)`` in parallelo.
+
+    Come genera_pdf_batch: esiti in ordine di completamento, con ``out_dir``
+    i file sono scritti dai worker. I profili non validi producono subito un
+    esito con errore e non arrivano al pool. ``backend`` è ``"stream"``
+    (docx_stream, default) o ``"python-docx"`` (generator.generate_document).
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"backend sconosciuto: {backend!r} (ammessi: {', '.join(BACKENDS)})")
+    validi = []
+    completati = 0
+    for nome, percorso in lavori:
+        try:
+            profilo = carica_profilo(percorso)
+            validi.append((nome, str(percorso), profilo, str(template_di(profilo, Path(percorso), template))))
+        except Exception as exc:
+            completati += 1
+            esito = EsitoBatch(nome, errore=f"{type(exc).__name__}: {exc}")
+            if progress:
+                progress(completati, esito)
+            yield esito
+    if not validi:
+        return
+
+    # ogni template letto una volta sola, poi condiviso con i worker all'avvio
+    templates = {t: Path(t).read_bytes() for t in sorted({v[3] for v in validi})}
+    workers = min(max_workers or os.cpu_count() or 1, len(validi))
+    in_flight = max(max_in_flight or 2 * workers, 1)
+    dest = str(out_dir) if out_dir else None
+    if dest:
+        os.makedirs(dest, exist_ok=True)
+
+    chiamate = ((_genera_uno_docx, (*v, dest, backend)) for v in validi)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_avvia_worker, initargs=(templates, backend)) as pool:
+        yield from in_parallelo(pool, chiamate, in_flight, progress, completati)
+
+
+def scrivi_zip(esiti: Iterable[EsitoBatch], out: IO[bytes]) -> List[EsitoBatch]:
+    """Scrive in ``out`` uno zip con un .docx per esito riuscito, man mano che arrivano.
+
+    ``out`` può non essere seekable (es. stdout). I DOCX sono già compressi e
+    vengono memorizzati senza ricomprimerli. Restituisce gli esiti con errore.
+    """
+    errori = []
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_STORED) as zf:
+        for esito in esiti:
+            if not esito.ok:
+                errori.append(esito)
+                continue
+            zf.writestr(f"{esito.nome}.docx", esito.docx)
+            esito.docx = None
+    return errori
+
+
+def stampa_campi(template: Union[str, Path]) -> None:
+    """Campi di RelazioneData e campi "aggiungere ..." (extra_fields) che il template usa davvero."""
+    from generator import manifest_template
+
+    manifest = manifest_template(Path(template))
+    print(f"{Path(template).name}:")
+    print(f"  segnaposto: {', '.join(manifest.campi_relazione()) or '-'}")
+    print(f"  extra_fields: {', '.join(manifest.campi().get('aggiungere', [])) or '-'}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Generazione DOCX in blocco dai profili.")
+    parser.add_argument("sorgenti", nargs="*", help="profili JSON o cartelle di profili")
+    parser.add_argument("-o", "--out", default="docx", help="cartella, file .zip o '-' per uno zip su stdout (default: docx)")
+    parser.add_argument("-t", "--template", default=str(TEMPLATE_DEFAULT), help="template per i profili senza 'template'")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="processi (default: numero di core)")
+    parser.add_argument("--in-flight", type=int, default=None, help="lavori in coda al pool (default: 2 x processi)")
+    parser.add_argument("--backend", choices=BACKENDS, default="stream")
+    parser.add_argument("--campi", action="store_true", help="elenca i campi usati dal template ed esce")
+    args = parser.parse_args(argv)
+    if args.campi:
+        stampa_campi(args.template)
+        return 0
+    if not args.sorgenti:
+        parser.error("indicare almeno un profilo o una cartella di profili")
+
+    lavori = trova_progetti(args.sorgenti)
+    totale = len(lavori)
+
+    def _progress(n: int, esito: EsitoBatch):
+        stato = "ok" if esito.ok else "ERRORE"
+        print(f"[{n}/{totale}] {esito.nome}: {stato} ({esito.secondi:.2f}s)", file=sys.stderr)
+
+    t0 = time.perf_counter()
+    in_zip = args.out == "-" or args.out.lower().endswith(".zip")
+    esiti = genera_docx_batch(
+        lavori, args.template, None if in_zip else args.out, args.jobs, args.in_flight, _progress, args.backend
+    )
+    if args.out == "-":
+        errori = scrivi_zip(esiti, sys.stdout.buffer)
+    elif in_zip:
+        with open(args.out, "wb") as f:
+            errori = scrivi_zip(esiti, f)
+    else:
+        errori = [e for e in esiti if not e.ok]
+    dt = time.perf_counter() - t0
+    print(f"{totale - len(errori)}/{totale} DOCX generati in {dt:.1f}s", file=sys.stderr)
+    for e in errori:
+        print(f"\n--- {e.nome} ---\n{e.errore}", file=sys.stderr)
+    return 1 if errori else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+"""Latenza di rerun dell'app Streamlit su un progetto con molti circuiti.
+
+    python benchmarks/bench_app_rerun.py [--circuiti 500] [-n 5] [--strict]
+
+L'app gira in streamlit.testing (AppTest) con ``--circuiti`` righe nella
+tabella circuiti e quattro foto caricate. Confronta l'esecuzione dell'intero
+script (quello che costava ogni modifica prima dei fragment) con il rerun del
+solo fragment interessato: un campo dei dati identificativi, la tabella
+circuiti (editor + calcoli) e le foto. Con ``--strict`` exit 1 se modificare
+un dato identificativo costa più di LIMITE_RAPPORTO volte meno dell'app intera.
+
+AppTest riesegue sempre l'intero script: il rerun di un fragment viene chiesto
+al runner come fa il browser (``fragment_id_queue``). Gli id dei fragment sono
+presi nell'ordine in cui l'app li registra. Si misura solo l'esecuzione dello
+script (o del fragment) nel thread del runner, senza l'attesa a polling e la
+ricostruzione dell'albero degli elementi di AppTest.
+"""
+
+from __future__ import annotations
+
+import argparse
+import ast
+import io
+import os
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from PIL import Image  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+from streamlit.runtime.scriptrunner import script_runner  # noqa: E402
+from streamlit.testing.v1 import local_script_runner  # noqa: E402
+
+import relazione  # noqa: E402
+
+APP = os.path.join(ROOT, "app.py")
+LIMITE_RAPPORTO = 3.0
+
+
+def _circuiti(n: int) -> List[dict]:
+    modello = relazione.DEFAULT_LINEE[0]
+    return [{**modello, "Circuito/Linea": f"L{i}", "Lunghezza_m": 10 + i % 40} for i in range(1, n + 1)]
+
+
+def _foto(lato: int = 2000) -> bytes:
+    out = io.BytesIO()
+    Image.effect_noise((lato, lato * 3 // 4), 64).convert("RGB").save(out, "JPEG", quality=85)
+    return out.getvalue()
+
+
+def _fragment_app() -> List[str]:
+    """Nomi dei fragment di app.py nell'ordine di definizione (= ordine di chiamata).
+
+    Esclusi quelli chiamati solo da altri fragment (es. _avanzamento, solo con
+    lavori in corso): nel benchmark non sono registrati.
+    """
+    albero = ast.parse(open(APP, encoding="utf-8").read())
+    fragment = [
+        f for f in albero.body
+        if isinstance(f, ast.FunctionDef) and any(ast.unparse(d).startswith("st.fragment") for d in f.decorator_list)
+    ]
+    nomi = {f.name for f in fragment}
+    interni = {
+        n.func.id for f in fragment for n in ast.walk(f)
+        if isinstance(n, ast.Call) and isinstance(n.func, ast.Name) and n.func.id in nomi
+    }
+    return [f.name for f in fragment if f.name not in interni]
+
+
+@contextmanager
+def _solo_fragment(fragment_id: str):
+    """Il prossimo at.run() riesegue solo ``fragment_id``, come un'interazione dentro il fragment."""
+    originale = local_script_runner.RerunData
+
+    # vale anche per la richiesta iniziale del runner, che altrimenti vale come rerun dell'app intera
+    def rerun_data(**kwargs):
+        return originale(fragment_id_queue=[fragment_id], **kwargs)
+
+    local_script_runner.RerunData = rerun_data
+    try:
+        yield
+    finally:
+        local_script_runner.RerunData = originale
+
+
+_esecuzioni: List[float] = []
+
+
+def _cronometra(esegui):
+    def esegui_cronometrato(*args, **kwargs):
+        t = time.perf_counter()
+        try:
+            return esegui(*args, **kwargs)
+        finally:
+            _esecuzioni.append((time.perf_counter() - t) * 1000.0)
+    return esegui_cronometrato
+
+
+def _misura(azione: Callable[[], None], n: int) -> float:
+    """Mediana (ms) dell'esecuzione dello script dopo ``azione``."""
+    tempi = []
+    for _ in range(n):
+        del _esecuzioni[:]
+        azione()
+        tempi.append(sum(_esecuzioni))
+    return statistics.median(tempi)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--circuiti", type=int, default=500)
+    parser.add_argument("-n", type=int, default=5, help="ripetizioni per misura (mediana)")
+    parser.add_argument("--strict", action="store_true", help=f"exit 1 se il rapporto è sotto {LIMITE_RAPPORTO:g}")
+    args = parser.parse_args(argv)
+
+    script_runner.exec_func_with_error_handling = _cronometra(script_runner.exec_func_with_error_handling)
+    # app.py importa DEFAULT_LINEE a ogni esecuzione dello script: la tabella parte con n circuiti
+    relazione.DEFAULT_LINEE = _circuiti(args.circuiti)
+    at = AppTest.from_file(APP, default_timeout=300)
+    at.run()
+    foto = _foto()
+    for key in ("foto1", "foto2", "foto3", "foto4"):
+        # primo upload: l'uploader ha key "<foto>_0" (app._caricatore)
+        at.file_uploader(key=f"{key}_0").set_value((f"{key}.jpg", foto, "image/jpeg"))
+    at.run()
+    if at.exception:
+        raise SystemExit(at.exception[0].message)
+
+    nomi = _fragment_app()
+    ids = list(at._fragment_storage._fragments)
+    if len(ids) != len(nomi):
+        raise SystemExit(f"fragment registrati {len(ids)}, in app.py {len(nomi)}")
+    fragment: Dict[str, str] = dict(zip(nomi, ids))
+
+    contatore = iter(range(10 ** 9))
+
+    def committente():
+        at.text_input(key="committente").input(f"Committente {next(contatore)}")
+
+    def app_intera():
+        committente()
+        at.run()
+
+    def rerun(nome: str, prima: Callable[[], None] = lambda: None):
+        def azione():
+            prima()
+            with _solo_fragment(fragment[nome]):
+                at.run()
+        return azione
+
+    risultati = [("app intera (modifica Committente)", _misura(app_intera, args.n))]
+    risultati.append(("fragment identificazione", _misura(rerun("_identificazione", committente), args.n)))
+    at.run()
+    risultati.append(("fragment circuiti", _misura(rerun("_circuiti"), args.n)))
+    at.run()
+    risultati.append(("fragment foto", _misura(rerun("_foto"), args.n)))
+
+    print(f"{args.circuiti} circuiti, 4 foto")
+    print(f"{'rerun':<36}{'mediana ms':>12}")
+    for nome, ms in risultati:
+        print(f"{nome:<36}{ms:>12.1f}")
+    rapporto = risultati[0][1] / risultati[1][1]
+    print(f"identificazione: {rapporto:.1f}x più veloce dell'app intera")
+    return 1 if (args.strict and rapporto < LIMITE_RAPPORTO) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""Archivio progetti: salvataggio incrementale, caricamento e ricerca.
+
+    python benchmarks/bench_archivio.py [--progetti 2000] [--circuiti 200] [-n 20] [--strict]
+
+Riempie un archivio temporaneo con ``--progetti`` progetti di ``--circuiti``
+circuiti ciascuno (committenti e date diversi), poi misura su uno di essi il
+primo salvataggio, il salvataggio di una riga modificata, quello senza
+modifiche, il caricamento da un'istanza nuova (senza stato in memoria) e la
+ricerca per inizio del committente. Con ``--strict`` exit 1 se il caricamento
+supera LIMITE_CARICA_MS.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from typing import Callable, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from archivio import Archivio  # noqa: E402
+from relazione import DEFAULT_LINEE, DEFAULTS  # noqa: E402
+
+LIMITE_CARICA_MS = 50.0
+
+
+def _progetto(i: int, circuiti: int) -> dict:
+    p = dict(DEFAULTS)
+    p.update(committente=f"Committente {i % 300:03d}", cod_progetto=f"P{i:05d}", data_doc=date(2020, 1, 1) + timedelta(i))
+    p["linee"] = [{**DEFAULT_LINEE[0], "Circuito/Linea": f"L{j}", "Lunghezza_m": 10 + j % 40} for j in range(circuiti)]
+    return p
+
+
+def _ms(fn: Callable[[], object], n: int) -> float:
+    tempi = []
+    for _ in range(n):
+        t = time.perf_counter()
+        fn()
+        tempi.append((time.perf_counter() - t) * 1000.0)
+    return statistics.median(tempi)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--progetti", type=int, default=2000)
+    parser.add_argument("--circuiti", type=int, default=200)
+    parser.add_argument("-n", type=int, default=20, help="ripetizioni per misura (mediana)")
+    parser.add_argument("--strict", action="store_true", help=f"exit 1 se il caricamento supera {LIMITE_CARICA_MS:g} ms")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "archivio.sqlite")
+        archivio = Archivio(path)
+        t = time.perf_counter()
+        for i in range(args.progetti - 1):
+            archivio.salva(_progetto(i, args.circuiti))
+        riempimento = time.perf_counter() - t
+
+        progetto = _progetto(args.progetti, args.circuiti)
+        t = time.perf_counter()
+        id_, versione = archivio.salva(progetto)
+        primo = (time.perf_counter() - t) * 1000.0
+
+        contatore = iter(range(10 ** 9))
+
+        # come l'app: ogni salvataggio passa la versione restituita dal precedente
+        def salva():
+            nonlocal versione
+            _, versione = archivio.salva(progetto, id_, versione)
+
+        def modifica_riga():
+            progetto["linee"][17] = {**progetto["linee"][17], "Lunghezza_m": next(contatore)}
+            salva()
+
+        righe = [
+            ("primo salvataggio", primo),
+            ("salvataggio, 1 riga modificata", _ms(modifica_riga, args.n)),
+            ("salvataggio senza modifiche", _ms(salva, args.n)),
+        ]
+        archivio.chiudi()
+
+        nuovo = Archivio(path)
+        righe.append(("caricamento (istanza nuova)", _ms(lambda: nuovo.carica(id_), args.n)))
+        righe.append(("ricerca committente (50 risultati)", _ms(lambda: nuovo.cerca("committente 12"), args.n)))
+        righe.append(("ricerca per intervallo di date", _ms(
+            lambda: nuovo.cerca(dal=date(2021, 1, 1), al=date(2021, 3, 31)), args.n
+        )))
+        nuovo.chiudi()
+        dimensione = os.path.getsize(path) / 1e6
+
+    print(f"{args.progetti} progetti da {args.circuiti} circuiti ({dimensione:.0f} MB, riempito in {riempimento:.1f}s)")
+    print(f"{'':<38}{'mediana ms':>12}")
+    for nome, ms in righe:
+        print(f"{nome:<38}{ms:>12.2f}")
+    return 1 if (args.strict and righe[3][1] > LIMITE_CARICA_MS) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""Throughput DOCX: generator.generate_document (python-docx) contro docx_stream.
+
+    python benchmarks/bench_docx_backend.py [-n 30] [--template templates/relazione_base.docx]
+
+Entrambi i backend usano la propria cache dei template (primo documento
+escluso dalla misura). Prima della misura verifica che i due risultati
+abbiano lo stesso word/document.xml.
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import os
+import sys
+import time
+import zipfile
+from typing import Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import docx_stream  # noqa: E402
+import generator as g  # noqa: E402
+
+
+def _png(colore: int) -> bytes:
+    from PIL import Image
+
+    buf = io.BytesIO()
+    Image.new("RGB", (320, 240), (colore, 90, 160)).save(buf, "PNG")
+    return buf.getvalue()
+
+
+def _argomenti(template: str):
+    data = g.RelazioneData(
+        "Milano, 01/03/2025", "Condominio Aurora", "Via Roma 1", "20100 Milano",
+        "installazione wallbox 7,4 kW", layout_incluso="Quadro\nLinea", layout_escluso="Opere murarie",
+    )
+    return (
+        template,
+        data,
+        g.ProgettistaData("Ing. Rossi", "Via Verdi 2", "333 000000", "rossi@example.com", "01234567890"),
+        g.EsecutriceData("Elettro Srl", "Via Bianchi 3", "09876543210"),
+        [g.ColonninaItem("Wallbox 7,4 kW", 2)],
+        [g.PhotoItem(f"foto{i}.png", _png(40 * i), f"Foto {i}") for i in range(1, 5)],
+        _png(200),
+        [g.AllegatoItem("scheda.pdf", b"%PDF", "pdf")],
+        {"COMMITTENTE": "Condominio Aurora"},
+    )
+
+
+def _misura(fn, args, n: int) -> float:
+    fn(*args)  # cache del template
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn(*args)
+    return (time.perf_counter() - t0) / n
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", type=int, default=30, help="documenti per backend")
+    parser.add_argument("--template", default=os.path.join(ROOT, "templates", "relazione_base.docx"))
+    args = parser.parse_args(argv)
+
+    argomenti = _argomenti(args.template)
+    a = zipfile.ZipFile(io.BytesIO(g.generate_document(*argomenti))).read("word/document.xml")
+    b = zipfile.ZipFile(io.BytesIO(docx_stream.genera_docx_stream(*argomenti))).read("word/document.xml")
+    if a != b:
+        print("ERRORE: i due backend producono document.xml diversi", file=sys.stderr)
+        return 1
+
+    t_docx = _misura(g.generate_document, argomenti, args.n)
+    t_stream = _misura(docx_stream.genera_docx_stream, argomenti, args.n)
+    print(f"{'backend':<14}{'ms/doc':>10}{'doc/s':>10}")
+    print(f"{'python-docx':<14}{t_docx * 1000:>10.1f}{1 / t_docx:>10.1f}")
+    print(f"{'docx_stream':<14}{t_stream * 1000:>10.1f}{1 / t_stream:>10.1f}")
+    print(f"\nspeedup: {t_docx / t_stream:.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""Ricerca dei paragrafi nel DOCX su template sintetici fino a 200 pagine.
+
+    python benchmarks/bench_docx_lookup.py [--pagine 25 50 100 200] [--strict]
+
+Per ogni dimensione genera un template con titoli, testo e una tabella per
+pagina, poi misura la ricerca di un titolo presente in molti paragrafi:
+
+- ``indice``: DocIndex (costruzione compresa) + trova, come in generate_document;
+- ``precedente``: la ricerca di prima, con ``p in doc.paragraphs`` per ogni
+  candidato (quadratica).
+
+Il tempo per paragrafo dell'indice deve restare costante al crescere del
+documento; con ``--strict`` exit 1 se a 200 pagine supera il triplo di quello
+del template più piccolo.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from typing import List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docx import Document  # noqa: E402
+
+import generator  # noqa: E402
+
+PARAGRAFI_PER_PAGINA = 30
+RIGHE_TABELLA = 4
+
+
+def _template(pagine: int) -> Document:
+    doc = Document()
+    for n in range(1, pagine + 1):
+        doc.add_paragraph(f"{n} Capitolo {n}")
+        for i in range(PARAGRAFI_PER_PAGINA - 2):
+            doc.add_paragraph(f"Testo della sezione {n}.{i}: vedere schema elettrico allegato.")
+        t = doc.add_table(rows=RIGHE_TABELLA, cols=3)
+        for r in range(RIGHE_TABELLA):
+            for c in range(3):
+                t.cell(r, c).text = f"cella {n}/{r}/{c}"
+    # il titolo cercato sta in fondo: la ricerca scorre tutto il documento
+    doc.add_paragraph("LAYOUT D'IMPIANTO")
+    return doc
+
+
+def _precedente(doc: Document, needles: List[str]):
+    """Ricerca com'era prima di DocIndex."""
+    needles_l = [n.lower() for n in needles]
+    best = None
+    for p in generator.iter_all_paragraphs(doc):
+        t = (p.text or "").lower()
+        if any(n in t for n in needles_l):
+            if generator._is_toc_paragraph(p):
+                continue
+            if p in doc.paragraphs:
+                return p
+            best = best or p
+    return best
+
+
+def _indice(doc: Document, needles: List[str]):
+    return generator.DocIndex(doc).trova(needles, prefer_body=True)
+
+
+def _misura(fn, doc: Document, needles: List[str]) -> float:
+    t0 = time.perf_counter()
+    fn(doc, needles)
+    return (time.perf_counter() - t0) * 1000.0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pagine", type=int, nargs="+", default=[25, 50, 100, 200])
+    parser.add_argument("--senza-precedente", action="store_true", help="non misura la ricerca quadratica")
+    parser.add_argument("--strict", action="store_true", help="exit 1 se l'indice non scala linearmente")
+    args = parser.parse_args(argv)
+
+    # "schema elettrico" compare in quasi ogni paragrafo: molti candidati
+    needles = ["LAYOUT D'IMPIANTO", "schema elettrico"]
+    print(f"{'pagine':>8}{'paragrafi':>11}{'indice ms':>12}{'us/par':>9}{'precedente ms':>16}")
+    per_paragrafo = []
+    for pagine in args.pagine:
+        doc = _template(pagine)
+        n_par = sum(1 for _ in generator.iter_all_paragraphs(doc))
+        t_idx = _misura(_indice, doc, needles)
+        per_paragrafo.append(t_idx * 1000.0 / n_par)
+        prec = "-" if args.senza_precedente else f"{_misura(_precedente, doc, needles):.1f}"
+        print(f"{pagine:>8}{n_par:>11}{t_idx:>12.1f}{per_paragrafo[-1]:>9.2f}{prec:>16}")
+
+    rapporto = per_paragrafo[-1] / per_paragrafo[0]
+    print(f"\nus/paragrafo, piu' grande / piu' piccolo: {rapporto:.2f} (lineare ~ 1)")
+    return 1 if (args.strict and rapporto > 3.0) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
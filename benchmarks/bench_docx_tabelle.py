@@ -0,0 +1,79 @@
+"""Scrittura delle tabelle quadri/linee nel DOCX con molte righe.
+
+    python benchmarks/bench_docx_tabelle.py [--righe 500 1000 5000] [--strict]
+
+Confronta generator.xml_tabella (riga modello copiata per record) con la
+costruzione tramite python-docx (``add_row`` e ``cell().text`` per cella),
+sulla tabella circuiti (8 colonne). Con ``--strict`` exit 1 se 5000 righe
+richiedono più di 1 s.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from typing import List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docx import Document  # noqa: E402
+
+import generator  # noqa: E402
+
+LIMITE_5K_S = 1.0
+
+
+def _righe(n: int) -> List[dict]:
+    return [
+        {"Linea": f"L{i}", "Uso": "Prese", "Posa": "Tubo PVC", "L_m": 25, "Cavo": "FG16OM16 3G2.5",
+         "Protezione": "MT 16A curva C", "Diff": "Tipo A 30mA", "DV_perc": "0.23", "Esito": "OK"}
+        for i in range(1, n + 1)
+    ]
+
+
+def _xml(doc: Document, righe: List[dict]):
+    ultimo = doc.add_paragraph("Elenco circuiti")._p
+    generator.xml_tabella(generator.LINEE_COLONNE, righe, doc._block_width, None, dopo=ultimo)
+
+
+def _python_docx(doc: Document, righe: List[dict]):
+    colonne = generator.LINEE_COLONNE
+    table = doc.add_table(rows=1, cols=len(colonne))
+    for j, c in enumerate(colonne):
+        table.cell(0, j).text = c[0]
+    for r in righe:
+        cells = table.add_row().cells
+        for j, c in enumerate(colonne):
+            cells[j].text = str(c[1](r) if callable(c[1]) else r.get(c[1], ""))
+
+
+def _misura(fn, n: int) -> float:
+    doc = Document()
+    righe = _righe(n)
+    t0 = time.perf_counter()
+    fn(doc, righe)
+    return time.perf_counter() - t0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--righe", type=int, nargs="+", default=[500, 1000, 5000])
+    parser.add_argument("--senza-precedente", action="store_true", help="non misura python-docx")
+    parser.add_argument("--strict", action="store_true", help=f"exit 1 se 5000 righe superano {LIMITE_5K_S:g} s")
+    args = parser.parse_args(argv)
+
+    print(f"{'righe':>8}{'xml ms':>10}{'python-docx ms':>16}")
+    t_5k = None
+    for n in args.righe:
+        t_xml = _misura(_xml, n)
+        if n == 5000:
+            t_5k = t_xml
+        prec = "-" if args.senza_precedente else f"{_misura(_python_docx, n) * 1000:.0f}"
+        print(f"{n:>8}{t_xml * 1000:>10.0f}{prec:>16}")
+    return 1 if (args.strict and t_5k is not None and t_5k > LIMITE_5K_S) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""Latenza interattiva del server mentre altre sessioni generano relazioni.
+
+    python benchmarks/bench_pool.py [--lavori 4] [--workers 2] [--circuiti 2000] [--strict]
+
+Simula il rerun del fragment circuiti (relazione.calcola_linee su
+``--circuiti`` righe) a ciclo nel thread principale, prima a vuoto e poi con
+``--lavori`` generazioni PDF+DOCX in corso (progetto con quattro foto) sul
+GestoreLavori a thread e su quello a processi. Riporta mediana e 95° percentile
+del rerun. Con ``--strict`` exit 1 se col pool a processi il 95° percentile
+supera LIMITE_RAPPORTO volte quello a vuoto.
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import os
+import statistics
+import sys
+import time
+from typing import List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image  # noqa: E402
+
+from lavori import FINITI, GestoreLavori  # noqa: E402
+from relazione import DEFAULT_LINEE, DEFAULTS, calcola_linee  # noqa: E402
+
+LIMITE_RAPPORTO = 2.0
+
+
+def _foto(lato: int = 2000) -> bytes:
+    out = io.BytesIO()
+    Image.effect_noise((lato, lato * 3 // 4), 64).convert("RGB").save(out, "JPEG", quality=85)
+    return out.getvalue()
+
+
+def _rerun(circuiti: dict) -> float:
+    t = time.perf_counter()
+    calcola_linee(circuiti)
+    return (time.perf_counter() - t) * 1000.0
+
+
+def _misura(
+    circuiti: dict, progetto: dict, gestore: Optional[GestoreLavori], n_lavori: int
+) -> Tuple[float, float, float]:
+    """(mediana ms, p95 ms, secondi per tutti i lavori) dei rerun finché i lavori girano."""
+    tempi: List[float] = []
+    t0 = time.perf_counter()
+    if gestore is None:
+        while time.perf_counter() - t0 < 2.0:
+            tempi.append(_rerun(circuiti))
+            time.sleep(0.005)
+        durata = 0.0
+    else:
+        # un utente per lavoro: partono tutti insieme fino ai posti del pool
+        lavori = [gestore.sottometti(progetto, utente=f"u{i}") for i in range(n_lavori)]
+        while any(l.stato not in FINITI for l in lavori):
+            tempi.append(_rerun(circuiti))
+            time.sleep(0.005)
+        durata = time.perf_counter() - t0
+        errori = [l.errore for l in lavori if l.errore]
+        if errori:
+            raise SystemExit(errori[0])
+    tempi.sort()
+    return statistics.median(tempi), tempi[int(len(tempi) * 0.95) - 1], durata
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lavori", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--circuiti", type=int, default=2000)
+    parser.add_argument("--strict", action="store_true", help=f"exit 1 se il p95 a processi supera {LIMITE_RAPPORTO:g}x")
+    args = parser.parse_args(argv)
+
+    foto = _foto()
+    progetto = dict(DEFAULTS)
+    progetto.update({f"foto{i}_bytes": foto for i in range(1, 5)})
+    circuiti = dict(DEFAULTS)
+    circuiti["linee"] = [{**DEFAULT_LINEE[0], "Circuito/Linea": f"L{i}"} for i in range(1, args.circuiti + 1)]
+
+    righe = [("a vuoto", *_misura(circuiti, progetto, None, 0))]
+    for nome, processi in (("pool a thread", False), ("pool a processi", True)):
+        t = time.perf_counter()
+        gestore = GestoreLavori(max_workers=args.workers, processi=processi)
+        avvio = time.perf_counter() - t
+        try:
+            righe.append((f"{nome} (avvio {avvio:.1f}s)", *_misura(circuiti, progetto, gestore, args.lavori)))
+        finally:
+            gestore.chiudi()
+
+    print(f"rerun circuiti ({args.circuiti} righe) con {args.lavori} generazioni PDF+DOCX, "
+          f"{args.workers} worker, {os.cpu_count()} core")
+    print(f"{'':<32}{'mediana ms':>12}{'p95 ms':>10}{'lavori s':>10}")
+    for nome, med, p95, durata in righe:
+        print(f"{nome:<32}{med:>12.1f}{p95:>10.1f}{durata:>10.1f}")
+    rapporto = righe[2][2] / righe[0][2]
+    return 1 if (args.strict and rapporto > LIMITE_RAPPORTO) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
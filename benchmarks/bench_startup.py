@@ -0,0 +1,98 @@
+"""Tempo di import a freddo per modulo, con budget di avvio.
+
+    python benchmarks/bench_startup.py [-n 5] [--strict]
+
+Ogni misura gira in un interprete nuovo con ``-X importtime`` (cache .pyc già
+calda, come per un nuovo worker dell'app o una chiamata della CLI). Oltre al
+tempo viene controllato che gli entry point leggeri non importino moduli
+pesanti (Streamlit, pandas, ReportLab, python-docx): l'import pigro è il
+modo in cui teniamo basso l'avvio.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Optional, Set, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# modulo -> budget (ms) sul tempo cumulativo di import
+BUDGET_MS: Dict[str, float] = {
+    "calcoli": 40.0,
+    "template_sections": 15.0,
+    "relazione": 60.0,
+    "cli": 70.0,
+    "batch": 70.0,
+    "pdf_generator": 600.0,
+    "generator": 400.0,
+}
+
+# entry point -> moduli top-level che NON devono essere importati
+VIETATI: Dict[str, Set[str]] = {
+    "calcoli": {"streamlit", "pandas", "reportlab", "docx"},
+    "template_sections": {"streamlit", "pandas", "reportlab", "docx"},
+    "relazione": {"streamlit", "pandas", "reportlab", "docx"},
+    "cli": {"streamlit", "pandas", "reportlab", "docx"},
+    "batch": {"streamlit", "pandas", "reportlab", "docx"},
+}
+
+
+def _importtime(modulo: str) -> Tuple[float, Set[str]]:
+    """Tempo cumulativo (ms) dell'import di ``modulo`` e moduli top-level caricati."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    totale = 0.0
+    caricati: Set[str] = set()
+    for riga in proc.stderr.splitlines():
+        if not riga.startswith("import time:") or "|" not in riga:
+            continue
+        parti = riga.split("|")
+        try:
+            cumulativo_us = int(parti[1])
+        except ValueError:
+            continue  # intestazione
+        nome = parti[2].strip()
+        caricati.add(nome.split(".")[0])
+        if nome == modulo:
+            totale = cumulativo_us / 1000.0
+    return totale, caricati
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", type=int, default=5, help="ripetizioni per modulo (mediana)")
+    parser.add_argument("--strict", action="store_true", help="exit 1 se un budget è superato")
+    args = parser.parse_args(argv)
+
+    fallimenti = []
+    print(f"{'modulo':<20}{'mediana ms':>12}{'budget ms':>12}  esito")
+    for modulo, budget in BUDGET_MS.items():
+        tempi = []
+        caricati: Set[str] = set()
+        for _ in range(args.n):
+            t, caricati = _importtime(modulo)
+            tempi.append(t)
+        med = statistics.median(tempi)
+        esito = "ok"
+        if med > budget:
+            esito = "FUORI BUDGET"
+            fallimenti.append(modulo)
+        pesanti = VIETATI.get(modulo, set()) & caricati
+        if pesanti:
+            esito = f"IMPORTA {', '.join(sorted(pesanti))}"
+            fallimenti.append(modulo)
+        print(f"{modulo:<20}{med:>12.1f}{budget:>12.0f}  {esito}")
+    return 1 if (fallimenti and args.strict) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
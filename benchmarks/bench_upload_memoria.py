@@ -0,0 +1,105 @@
+"""Memoria trattenuta da una sessione dell'app mentre si caricano molte foto.
+
+    python benchmarks/bench_upload_memoria.py [--giri 10] [--lato 2000] [--strict]
+
+L'app gira in streamlit.testing (AppTest) con il deposito allegati in una
+cartella temporanea. A ogni giro si caricano quattro foto nuove (``--lato``
+pixel, JPEG) al posto delle precedenti e si riesegue l'app; dopo ogni giro si
+misurano i byte rimasti nel gestore degli upload di Streamlit e, con
+tracemalloc, la memoria Python ancora allocata (sessione, widget, gestore
+degli upload, miniature) rispetto a prima del primo upload, e il picco
+durante il giro. Con ``--strict`` exit 1 se dopo l'ultimo giro la
+sessione trattiene più di LIMITE_MB.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import io
+import os
+import sys
+import tempfile
+import tracemalloc
+from typing import List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from PIL import Image  # noqa: E402
+from streamlit.testing.v1 import AppTest, local_script_runner  # noqa: E402
+
+import allegati  # noqa: E402
+
+APP = os.path.join(ROOT, "app.py")
+FOTO = ("foto1", "foto2", "foto3", "foto4")
+LIMITE_MB = 8.0
+
+
+def _foto(lato: int) -> bytes:
+    out = io.BytesIO()
+    Image.effect_noise((lato, lato * 3 // 4), 64).convert("RGB").save(out, "JPEG", quality=85)
+    return out.getvalue()
+
+
+def _mb(n: int) -> float:
+    return n / (1024 * 1024)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--giri", type=int, default=10, help="giri da quattro foto")
+    parser.add_argument("--lato", type=int, default=2000, help="lato lungo delle foto (px)")
+    parser.add_argument("--strict", action="store_true", help=f"exit 1 se la sessione trattiene più di {LIMITE_MB:g} MB")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        allegati.Deposito.__init__.__defaults__ = (tmp, allegati.MAX_BYTES)
+        allegati.deposito.cache_clear()
+
+        # AppTest crea un gestore degli upload per ogni run: si tiene quello dell'ultimo, che in un
+        # server vero è lo stesso per tutta la sessione
+        gestori = []
+        init = local_script_runner.LocalScriptRunner.__init__
+
+        def init_spia(self, *a, **kw):
+            init(self, *a, **kw)
+            gestori[:] = [self._uploaded_file_mgr]
+
+        local_script_runner.LocalScriptRunner.__init__ = init_spia
+
+        at = AppTest.from_file(APP, default_timeout=300)
+        at.run()
+        caricati = 0
+        gc.collect()
+        tracemalloc.start()
+        base = tracemalloc.get_traced_memory()[0]
+        righe = []
+        for giro in range(1, args.giri + 1):
+            tracemalloc.reset_peak()
+            # foto nuove a ogni giro, allocate sotto tracemalloc: restano in memoria solo se l'app le trattiene
+            for key in FOTO:
+                n = at.session_state[f"_n_{key}"] if f"_n_{key}" in at.session_state else 0
+                blob = _foto(args.lato)
+                at.file_uploader(key=f"{key}_{n}").set_value((f"{key}.jpg", blob, "image/jpeg"))
+                caricati += len(blob)
+            del blob
+            at.run()
+            if at.exception:
+                raise SystemExit(at.exception[0].message)
+            gc.collect()
+            attuale, picco = tracemalloc.get_traced_memory()
+            gestore = gestori[-1]
+            upload = sum(len(f.data) for files in gestore.file_storage.values() for f in files.values())
+            righe.append((giro, _mb(caricati), _mb(upload), _mb(attuale - base), _mb(picco - base)))
+        tracemalloc.stop()
+
+    print(f"{args.giri} giri da 4 foto {args.lato}px")
+    print(f"{'giro':>6}{'caricati MB':>14}{'gestore upload MB':>20}{'trattenuti MB':>16}{'picco MB':>12}")
+    for giro, tot, upload, trattenuti, picco in righe:
+        print(f"{giro:>6}{tot:>14.1f}{upload:>20.1f}{trattenuti:>16.1f}{picco:>12.1f}")
+    return 1 if (args.strict and righe[-1][3] > LIMITE_MB) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
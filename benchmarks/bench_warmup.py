@@ -0,0 +1,71 @@
+"""Latenza della prima relazione in un processo nuovo, a freddo e dopo documento.riscalda.
+
+    python benchmarks/bench_warmup.py [-n 5] [--formati pdf docx] [--strict]
+
+Ogni misura gira in un interprete nuovo (come un worker appena avviato):
+"a freddo" genera subito la relazione del progetto di default, "caldo" chiama
+prima documento.riscalda e poi genera. Per confronto è riportata anche la
+seconda relazione dello stesso processo (regime). Con ``--strict`` exit 1 se
+la prima relazione dopo il riscaldamento supera di più di LIMITE_RAPPORTO il
+regime.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LIMITE_RAPPORTO = 1.25
+
+MISURA = """
+import json, sys, time
+from relazione import DEFAULTS, costruisci_payload
+from documento import genera, riscalda
+formati = tuple(sys.argv[2:])
+r = riscalda(formati) if sys.argv[1] == "caldo" else 0.0
+t1 = time.perf_counter()
+genera(costruisci_payload(dict(DEFAULTS)), formati)
+t2 = time.perf_counter()
+genera(costruisci_payload(dict(DEFAULTS)), formati)
+t3 = time.perf_counter()
+print(json.dumps({"riscalda": r, "prima": t2 - t1, "regime": t3 - t2}))
+"""
+
+
+def _misura(modo: str, formati: List[str]) -> Dict[str, float]:
+    proc = subprocess.run(
+        [sys.executable, "-c", MISURA, modo, *formati], cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", type=int, default=5, help="processi per modo (mediana)")
+    parser.add_argument("--formati", nargs="+", default=["pdf", "docx"], choices=["pdf", "docx"])
+    parser.add_argument("--strict", action="store_true", help=f"exit 1 se caldo > {LIMITE_RAPPORTO:g} x regime")
+    args = parser.parse_args(argv)
+
+    risultati = {}
+    for modo in ("freddo", "caldo"):
+        misure = [_misura(modo, args.formati) for _ in range(args.n)]
+        risultati[modo] = {k: statistics.median(m[k] for m in misure) * 1000.0 for k in misure[0]}
+
+    regime = statistics.median([risultati["freddo"]["regime"], risultati["caldo"]["regime"]])
+    print(f"prima relazione ({' + '.join(args.formati)}), mediana su {args.n} processi")
+    print(f"{'':<28}{'ms':>10}")
+    print(f"{'a freddo':<28}{risultati['freddo']['prima']:>10.1f}")
+    print(f"{'dopo riscalda':<28}{risultati['caldo']['prima']:>10.1f}")
+    print(f"{'riscalda (una volta)':<28}{risultati['caldo']['riscalda']:>10.1f}")
+    print(f"{'regime (seconda relazione)':<28}{regime:>10.1f}")
+    return 1 if (args.strict and risultati["caldo"]["prima"] > LIMITE_RAPPORTO * regime) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
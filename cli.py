@@ -0,0 +1,47 @@
+"""Generazione headless della relazione: file di progetto JSON/YAML -> PDF e/o DOCX.
+
+    python cli.py progetto.json -o relazione.pdf
+    python cli.py progetto.json -f pdf -f docx     # entrambi, stesso documento intermedio
+
+Non importa Streamlit né pandas; ReportLab (e python-docx, solo se serve il
+DOCX) viene caricato dopo la costruzione del payload, così l'avvio resta
+rapido per script e cron.
+Le chiavi del file di progetto sono quelle di relazione.DEFAULTS (i campi
+mancanti assumono i valori predefiniti dell'app).
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+from documento import FORMATI, da_payload, genera
+from relazione import carica_progetto, costruisci_payload
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Genera la relazione tecnica (PDF e/o DOCX) da un file di progetto.")
+    parser.add_argument("progetto", help="file di progetto .json / .yaml")
+    parser.add_argument("-o", "--out", default=None,
+                        help="file di destinazione (default: stesso nome del progetto); con più formati "
+                             "l'estensione è quella del formato")
+    parser.add_argument("-f", "--formato", action="append", choices=FORMATI, default=None,
+                        help="formato da generare, ripetibile (default: pdf)")
+    args = parser.parse_args(argv)
+
+    src = Path(args.progetto)
+    formati = list(dict.fromkeys(args.formato or ["pdf"]))
+    base = Path(args.out) if args.out else src.with_suffix("")
+
+    documento = da_payload(costruisci_payload(carica_progetto(src)))
+    for formato, blob in genera(documento, formati).items():
+        dest = base if args.out and len(formati) == 1 else base.with_suffix(f".{formato}")
+        dest.write_bytes(blob)
+        print(dest, file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
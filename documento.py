@@ -0,0 +1,424 @@
+"""Modello intermedio della relazione, comune ai renderer PDF e DOCX.
+
+da_payload trasforma il payload di relazione.costruisci_payload in un
+Documento: una sequenza di blocchi (titoli, testi, tabelle, griglia foto, ...)
+già filtrati (le sezioni senza contenuto significativo non compaiono) e con
+le foto già ricampionate alla dimensione di stampa. I renderer
+(pdf_generator.rendi_pdf, docx_relazione.rendi_docx) si limitano a tradurre i
+blocchi nel proprio formato, quindi chiedere entrambi i formati (genera)
+costruisce contenuti e immagini una volta sola.
+
+I capitoli seguono il catalogo CAPITOLI: ogni sezione ha un flag di inclusione
+(``payload["sezioni"]``) e il suo contenuto nel payload può essere una
+funzione, chiamata solo se la sezione è inclusa.
+
+Il modulo non importa ReportLab né python-docx.
+"""
+
+from __future__ import annotations
+
+import io
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from allegati import Allegato, AllegatoMancante, deposito
+from immagini import EMU_PER_POLLICE, per_docx
+
+FORMATI = ("pdf", "docx")
+
+# avanzamento(evento, valore) durante il rendering, con gli eventi di ReportLab:
+# "SIZE_EST" (blocchi da impaginare), "PROGRESS" (blocchi fatti), "PAGE" (pagina chiusa, solo PDF)
+Avanzamento = Callable[[str, int], None]
+
+# larghezza utile della pagina (A4 con margini di 18 mm), base dei pesi delle colonne
+LARGHEZZA_UTILE_MM = 174
+EMU_PER_MM = EMU_PER_POLLICE / 25.4
+# foto nella griglia 2x2: riquadro massimo dell'immagine in ogni cella
+FOTO_MAX_MM = (80, 100)
+# timbro/firma: larghezza massima con cui compare (copertina PDF, DOCX)
+TIMBRO_MAX_MM = 60
+
+
+def _meaningful(value: Any) -> bool:
+    if value is None:
+        return False
+    s = str(value).strip()
+    if not s:
+        return False
+    low = s.lower()
+    bad = {
+        "non pertinente",
+        "non applicabile",
+        "n/a",
+        "na",
+        "—",
+        "-",
+        "nessuna",
+        "nessuna / non applicabile",
+    }
+    if low in bad:
+        return False
+    if "xxxx" in low:
+        return False
+    return True
+
+
+# -------------------- Colonne delle tabelle --------------------
+def _posa_lunghezza(r: Dict) -> str:
+    posa = str(r.get("Posa", "") or "").strip()
+    ll = r.get("L_m", "")
+    return f"{posa}\n{ll}" if _meaningful(posa) else f"{ll}"
+
+
+Colonna = Tuple[str, Union[str, Callable[[Dict], Any]], float]
+
+# (intestazione, chiave del record o funzione, larghezza in mm su LARGHEZZA_UTILE_MM)
+QUADRI_COLONNE: List[Colonna] = [
+    ("Quadro", "Quadro", 16),
+    ("Ubicazione", "Ubicazione", 40),
+    ("IP", "IP", 12),
+    ("Interruttore generale\n(tipo/In)", "Generale", 52),
+    ("Differenziale generale\n(tipo/Idn)", "Diff", 54),
+]
+
+LINEE_COLONNE: List[Colonna] = [
+    ("Circuito/Linea", "Linea", 16),
+    ("Destinazione/Utilizzo", "Uso", 30),
+    ("Posa\nL (m)", _posa_lunghezza, 24),
+    ("Cavo\n(tipo/sezione)", "Cavo", 32),
+    ("Protezione\n(MT/MTD)", "Protezione", 26),
+    ("Differenziale\n(tipo/Idn)", "Diff", 26),
+    ("ΔV %", "DV_perc", 10),
+    ("Esito", "Esito", 10),
+]
+
+REVISIONI_COLONNE: List[Colonna] = [
+    ("Rev.", "Rev", 18),
+    ("Data", "Data", 30),
+    ("Descrizione", "Descrizione", 126),
+]
+
+
+def valore(colonna: Colonna, riga: Dict) -> str:
+    chiave = colonna[1]
+    v = chiave(riga) if callable(chiave) else riga.get(chiave, "")
+    return str("" if v is None else v)
+
+
+# -------------------- Blocchi --------------------
+@dataclass
+class Copertina:
+    stile: str  # "engineering" | "legacy"
+
+
+@dataclass
+class NuovaPagina:
+    pass
+
+
+@dataclass
+class Indice:
+    pass
+
+
+@dataclass
+class Titolo:
+    testo: str
+    livello: int  # 0 = titolo di pagina, 1 = capitolo, 2 = paragrafo
+    in_indice: bool = True
+
+
+@dataclass
+class Testo:
+    testo: str
+
+
+@dataclass
+class Spazio:
+    punti: float
+
+
+@dataclass
+class ChiaveValore:
+    """Tabella a due colonne; la prima riga è l'intestazione."""
+
+    righe: List[Tuple[str, str]]
+
+
+@dataclass
+class Tabella:
+    colonne: List[Colonna]
+    righe: List[Dict]
+    compatta: bool = True  # corpo 8 pt (tabelle di sintesi) invece di 9 pt
+
+
+@dataclass
+class Foto:
+    didascalia: str
+    blob: Optional[bytes] = None
+    px: Optional[Tuple[int, int]] = None  # dimensioni dopo il ricampionamento, se leggibile
+
+
+@dataclass
+class GrigliaFoto:
+    foto: List[Foto]
+
+
+Blocco = Union[Copertina, NuovaPagina, Indice, Titolo, Testo, Spazio, ChiaveValore, Tabella, GrigliaFoto]
+
+
+@dataclass
+class Documento:
+    meta: Dict[str, Any]  # payload originale: copertina, intestazione e piè di pagina
+    blocchi: List[Blocco] = field(default_factory=list)
+
+
+# -------------------- Costruzione --------------------
+FOTO_KEYS = (
+    ("Foto 1 – Posizione Pulsante Antincendio (se presente)", "foto1_bytes"),
+    ("Foto 2 – Quadro realizzato", "foto2_bytes"),
+    ("Foto 3 – Percorso realizzato", "foto3_bytes"),
+    ("Foto 4 – Apparecchiatura di ricarica (se installata)", "foto4_bytes"),
+)
+
+
+def prepara_foto(didascalia: str, blob: Union[bytes, Allegato, None]) -> Foto:
+    """Foto ricampionata alla larghezza della cella (una volta per tutti i formati).
+
+    Per un Allegato la versione ricampionata è una variante del deposito,
+    calcolata una volta e poi letta dal disco; se il deposito non ha più
+    l'allegato la foto è trattata come assente.
+    """
+    if not blob:
+        return Foto(didascalia)
+    larghezza = int(FOTO_MAX_MM[0] * EMU_PER_MM)
+    if isinstance(blob, Allegato):
+        try:
+            blob = deposito().stampa(blob, larghezza)
+        except AllegatoMancante:
+            return Foto(didascalia)
+    else:
+        blob = per_docx(blob, larghezza)
+    try:
+        from PIL import Image
+
+        with Image.open(io.BytesIO(blob)) as im:
+            px = im.size
+    except Exception:
+        px = None
+    return Foto(didascalia, blob, px)
+
+
+# -------------------- Catalogo dei capitoli --------------------
+@dataclass(frozen=True)
+class Sezione:
+    """Voce del catalogo: titolo e chiave del contenuto nel payload.
+
+    ``tipo``: "testo", "tabella" (righe del payload), "foto" (FOTO_KEYS) o
+    "titolo" (solo intestazione di capitolo). Un capitolo (livello 1) compare
+    se ha contenuto proprio o almeno un paragrafo, oppure sempre con ``sempre``.
+    """
+
+    chiave: str
+    titolo: str
+    livello: int = 2
+    tipo: str = "testo"
+    spazio: float = 8
+    sempre: bool = False
+
+
+CAPITOLI: Tuple[Sezione, ...] = (
+    Sezione("premessa", "CAPITOLO 1 - PREMESSA", 1, spazio=10, sempre=True),
+    Sezione("norme", "CAPITOLO 2 - RIFERIMENTI LEGISLATIVI E NORMATIVI", 1, spazio=10, sempre=True),
+    Sezione("criterio_progetto", "CAPITOLO 3 - CRITERI DI PROGETTO DEGLI IMPIANTI", 1, spazio=10),
+    Sezione("soluzione", "CAPITOLO 4 - SOLUZIONE PROGETTUALE ADOTTATA", 1, "titolo", sempre=True),
+    Sezione("dati_tecnici", "4.1 Dati tecnici di base"),
+    Sezione("descrizione_impianto", "4.2 Descrizione impianto e opere"),
+    Sezione("confini", "4.3 Confini dell’intervento e interfacce", spazio=10),
+    Sezione("quadri", "4.4 Quadri elettrici e distribuzione (sintesi)", tipo="tabella", spazio=10),
+    Sezione("linee", "4.5 Elenco circuiti, cavi e protezioni (sintesi)", tipo="tabella", spazio=10),
+    Sezione("indicazioni", "CAPITOLO 5 - ULTERIORI INDICAZIONI", 1, "titolo", sempre=True),
+    Sezione("sicurezza", "5.1 Protezione contro i contatti diretti e indiretti"),
+    Sezione("verifiche", "5.2 Verifiche, prove e collaudi"),
+    Sezione("manutenzione", "5.3 Esercizio, manutenzione e avvertenze"),
+    Sezione("allegati", "CAPITOLO 6 - ALLEGATI", 1, spazio=0),
+    # Allegato fotografico: 1 pagina con griglia 2x2 (4 foto)
+    Sezione("foto", "Allegato fotografico", tipo="foto"),
+)
+
+TABELLE = {"quadri": QUADRI_COLONNE, "linee": LINEE_COLONNE}
+
+
+def inclusa(data: Dict[str, Any], sezione: Sezione) -> bool:
+    """Flag ``include`` della sezione: ``data["sezioni"][chiave]``, default True."""
+    return bool((data.get("sezioni") or {}).get(sezione.chiave, True))
+
+
+def _contenuto(data: Dict[str, Any], chiave: str, default: Any = ""):
+    # i testi del payload possono essere funzioni senza argomenti, valutate solo qui
+    v = data.get(chiave, default)
+    return v() if callable(v) else v
+
+
+def _blocchi_sezione(data: Dict[str, Any], s: Sezione) -> List[Blocco]:
+    if s.tipo == "tabella":
+        righe = _contenuto(data, s.chiave, [])
+        return [Titolo(s.titolo, s.livello), Tabella(TABELLE[s.chiave], righe), Spazio(s.spazio)] if righe else []
+    if s.tipo == "foto":
+        if not any(data.get(k) for _, k in FOTO_KEYS):
+            return []
+        foto = [prepara_foto(didascalia, data.get(k)) for didascalia, k in FOTO_KEYS]
+        return [Spazio(10), Titolo(s.titolo, s.livello), Spazio(6), GrigliaFoto(foto)]
+    testo = _contenuto(data, s.chiave)
+    if _meaningful(testo):
+        return [Titolo(s.titolo, s.livello), Testo(testo), Spazio(s.spazio)]
+    return []
+
+
+def _capitoli(data: Dict[str, Any], catalogo: Sequence[Sezione] = CAPITOLI) -> List[Blocco]:
+    """Blocchi dei capitoli inclusi; le sezioni escluse non vengono nemmeno costruite."""
+    gruppi: List[List[Sezione]] = []
+    for s in catalogo:
+        if s.livello == 1 or not gruppi:
+            gruppi.append([s])
+        else:
+            gruppi[-1].append(s)
+
+    out: List[Blocco] = []
+    for capitolo, *paragrafi in gruppi:
+        if not inclusa(data, capitolo):
+            continue
+        proprio: List[Blocco] = []
+        if capitolo.tipo == "testo":
+            testo = _contenuto(data, capitolo.chiave)
+            if capitolo.sempre or _meaningful(testo):
+                proprio = [Testo(testo)] + ([Spazio(capitolo.spazio)] if capitolo.spazio else [])
+        figli = [blocco for s in paragrafi if inclusa(data, s) for blocco in _blocchi_sezione(data, s)]
+        if capitolo.sempre or proprio or figli:
+            out += [Titolo(capitolo.titolo, capitolo.livello), *proprio, *figli]
+    return out
+
+
+def da_payload(data: Dict[str, Any]) -> Documento:
+    """Documento dal payload di relazione.costruisci_payload (o di un file batch)."""
+    if isinstance(data.get("timbro_bytes"), Allegato):
+        # i renderer disegnano il timbro dai byte in meta: la variante di stampa, non l'originale
+        try:
+            timbro = deposito().stampa(data["timbro_bytes"], int(TIMBRO_MAX_MM * EMU_PER_MM))
+        except AllegatoMancante:
+            timbro = None  # eliminato dalla pulizia del deposito: relazione senza timbro
+        data = {**data, "timbro_bytes": timbro}
+    b: List[Blocco] = []
+
+    # 1) COVER
+    stile = (data.get("cover_style") or "engineering").lower()
+    b += [Copertina("engineering" if stile.startswith("eng") else "legacy"), NuovaPagina()]
+
+    # 2) REVISIONI
+    revs = data.get("revisioni") or [
+        {"Rev": str(data.get("rev", "00")), "Data": str(data.get("data", "")), "Descrizione": "Emissione documento"}
+    ]
+    b += [Titolo("ELENCO DELLE REVISIONI", 0, False), Tabella(REVISIONI_COLONNE, revs, compatta=False), Spazio(10)]
+
+    # 2.1) Dati identificativi documento
+    ident = [
+        ("DATI IDENTIFICATIVI DOCUMENTO", ""),
+        ("Committente", data.get("committente_nome", "")),
+        ("Luogo di installazione", data.get("impianto_indirizzo", "")),
+        ("Oggetto intervento", data.get("oggetto_intervento", "")),
+        ("Tipologia impianto", data.get("tipologia", "")),
+        ("Sistema di distribuzione", data.get("sistema", "")),
+        ("Tensione/Frequenza", data.get("tensione", "")),
+        ("Potenza impegnata / disponibile", data.get("potenza_disp", "")),
+        ("Cod. progetto", data.get("cod_progetto", "")),
+        ("N. documento", data.get("n_doc", "")),
+        ("Revisione", data.get("rev", "")),
+        ("Data", data.get("data", "")),
+    ]
+    b += [ChiaveValore([(k, "" if v is None else str(v)) for k, v in ident]), Spazio(10)]
+
+    # 2.2) Dati progettista (se forniti)
+    progettista_blocco = data.get("progettista_blocco", "")
+    if _meaningful(progettista_blocco):
+        b += [Titolo("TECNICO PROGETTISTA / REDATTORE", 1, False), Testo(progettista_blocco), Spazio(10)]
+
+    disclaimer = data.get(
+        "disclaimer_calcoli",
+        "I calcoli e le verifiche riportate sono di sintesi e in linea con le normative applicabili"
+        "Le raccomandazioni non sostituiscono le verifiche prescrittive previste dalle norme applicabili.",
+    )
+    if _meaningful(disclaimer):
+        b += [Titolo("NOTA", 1, False), Testo(disclaimer)]
+    b.append(NuovaPagina())
+
+    if data.get("indice", True):
+        b += [Titolo("INDICE", 0, False), Indice()]
+
+    b += _capitoli(data)
+
+    # Firma finale (facoltativa)
+    luogo_f = data.get("luogo_firma", "")
+    data_f = data.get("data_firma", "")
+    firma = data.get("firma", "")
+    if _meaningful(luogo_f) or _meaningful(data_f) or _meaningful(firma):
+        b.append(Spazio(14))
+        if _meaningful(luogo_f) or _meaningful(data_f):
+            b += [Testo(f"Luogo e data: {luogo_f} – {data_f}".strip(" –")), Spazio(8)]
+        if _meaningful(firma):
+            b.append(Testo(f"Firma e timbro: {firma}"))
+
+    return Documento(data, b)
+
+
+def genera(
+    data: Union[Dict[str, Any], Documento],
+    formati: Sequence[str] = FORMATI,
+    avanzamento: Optional[Avanzamento] = None,
+) -> Dict[str, bytes]:
+    """``{formato: bytes}`` per ogni formato richiesto, da un unico Documento."""
+    doc = data if isinstance(data, Documento) else da_payload(data)
+    out: Dict[str, bytes] = {}
+    for formato in formati:
+        if formato == "pdf":
+            from pdf_generator import rendi_pdf
+
+            out["pdf"] = rendi_pdf(doc, avanzamento)
+        elif formato == "docx":
+            from docx_relazione import rendi_docx
+
+            out["docx"] = rendi_docx(doc, avanzamento=avanzamento)
+        else:
+            raise ValueError(f"formato non supportato: {formato!r} (ammessi: {', '.join(FORMATI)})")
+    return out
+
+
+def riscalda(formati: Sequence[str] = FORMATI) -> float:
+    """Esercita una volta il percorso di rendering e restituisce i secondi impiegati.
+
+    Un documento fittizio (copertina, indice, titolo, testo, tabella, griglia
+    con una foto) passa per ``genera``: import dei renderer, fogli di stile,
+    metriche dei font, decoder e ricampionamento delle immagini e template
+    DOCX sono già pronti per la prima relazione vera. Da chiamare all'avvio
+    del server o nell'initializer dei worker.
+    """
+    import time
+
+    from PIL import Image
+
+    t0 = time.perf_counter()
+    buf = io.BytesIO()
+    Image.new("RGB", (640, 480), (200, 200, 200)).save(buf, "JPEG")
+    meta = {"titolo_cover": "Riscaldamento", "committente_nome": "-", "cod_progetto": "-"}
+    blocchi: List[Blocco] = [
+        Copertina("engineering"),
+        NuovaPagina(),
+        Indice(),
+        NuovaPagina(),
+        Titolo("Riscaldamento", 1),
+        Testo("Testo di prova con <b>grassetto</b>."),
+        Tabella(LINEE_COLONNE, [{"Linea": "L1", "Esito": "OK"}]),
+        GrigliaFoto([prepara_foto("Foto", buf.getvalue())] + [Foto(d) for d, _ in FOTO_KEYS[1:]]),
+    ]
+    genera(Documento(meta, blocchi), formati)
+    return time.perf_counter() - t0
+
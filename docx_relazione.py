@@ -0,0 +1,269 @@
+"""Renderer DOCX del documento intermedio (documento.Documento).
+
+È la controparte di pdf_generator.rendi_pdf per la relazione dell'app: stessi
+blocchi, stesso ordine, tradotti in un .docx con gli stili predefiniti di
+python-docx (o di un template indicato, di cui si usano solo stili e margini).
+Le tabelle sono costruite con generator.xml_tabella, le foto sono quelle già
+ricampionate da documento.prepara_foto.
+
+Non va confuso con generator.generate_document, che compila i segnaposto del
+template di progetto a partire dai profili.
+"""
+
+from __future__ import annotations
+
+import io
+from pathlib import Path
+from typing import Optional, Union
+
+from docx import Document
+from docx.enum.section import WD_SECTION
+from docx.enum.text import WD_ALIGN_PARAGRAPH, WD_BREAK
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from docx.shared import Mm, Pt, RGBColor
+
+from documento import (
+    FOTO_MAX_MM,
+    LARGHEZZA_UTILE_MM,
+    TIMBRO_MAX_MM,
+    Avanzamento,
+    ChiaveValore,
+    Copertina,
+    Documento,
+    Foto,
+    GrigliaFoto,
+    Indice,
+    NuovaPagina,
+    Spazio,
+    Tabella,
+    Testo,
+    Titolo,
+    _meaningful,
+)
+from generator import xml_tabella
+
+GRIGIO = RGBColor(0x80, 0x80, 0x80)
+
+
+def _testo(doc: Document, testo: str, style: Optional[str] = None):
+    """Un paragrafo per riga non vuota (nel PDF le righe vanno a capo nello stesso paragrafo)."""
+    ultimo = None
+    for riga in (testo or "").split("\n"):
+        if riga.strip():
+            ultimo = doc.add_paragraph(riga, style)
+    return ultimo
+
+
+def _campo(paragraph, istruzione: str, segnaposto: str = ""):
+    """Campo Word (es. TOC, PAGE): aggiornato all'apertura o con F9."""
+    run = paragraph.add_run()
+    for tipo, testo in (("begin", None), (None, istruzione), ("separate", None), (None, segnaposto), ("end", None)):
+        if tipo:
+            e = OxmlElement("w:fldChar")
+            e.set(qn("w:fldCharType"), tipo)
+        elif testo is istruzione:
+            e = OxmlElement("w:instrText")
+            e.set(qn("xml:space"), "preserve")
+            e.text = testo
+        else:
+            e = OxmlElement("w:t")
+            e.text = testo
+        run._r.append(e)
+
+
+def _copertina(doc: Document, data: dict):
+    titolo = data.get("titolo_cover") or "RELAZIONE TECNICO-SPECIALISTICA"
+    nome_progetto = data.get("nome_progetto") or data.get("oggetto_intervento") or ""
+    sottotitolo = data.get("sottotitolo_cover") or ""
+    doc.add_paragraph(titolo, "Title").alignment = WD_ALIGN_PARAGRAPH.CENTER
+    for testo in (nome_progetto, sottotitolo):
+        if _meaningful(testo):
+            doc.add_paragraph(testo, "Subtitle").alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+    progettista = data.get("progettista_nome") or (data.get("progettista_blocco") or "").strip().split("\n")[0]
+    righe = [
+        ("Committente", data.get("committente_nome")),
+        ("Luogo", data.get("impianto_indirizzo")),
+        ("Cod. Progetto", data.get("cod_progetto")),
+        ("N. Documento", data.get("n_documento") or data.get("n_doc")),
+        ("Revisione", data.get("revisione") or data.get("rev")),
+        ("Data", data.get("data_documento") or data.get("data")),
+        ("Progettista", progettista),
+    ]
+    _chiave_valore(doc, [(k, str(v or "")) for k, v in righe], intestazione=False)
+
+    timbro = data.get("timbro_bytes")
+    if timbro:
+        doc.add_paragraph("Spazio timbro / firma").runs[0].bold = True
+        try:
+            doc.add_paragraph().add_run().add_picture(io.BytesIO(timbro), width=Mm(TIMBRO_MAX_MM))
+        except Exception:
+            pass
+    note = data.get("disclaimer_cover") or (
+        "Documento emesso a supporto della DiCo ex D.M. 37/08; "
+        "eventuali aggiornamenti normativi successivi non sono inclusi."
+    )
+    p = doc.add_paragraph()
+    r = p.add_run(note)
+    r.font.size = Pt(8)
+
+
+def _chiave_valore(doc: Document, righe, intestazione: bool = True):
+    tbl = doc.add_table(rows=len(righe), cols=2)
+    tbl.style = _stile_griglia(doc)
+    for tr, (k, v) in zip(tbl.rows, righe):
+        a, b = tr.cells
+        a.width, b.width = Mm(55), Mm(LARGHEZZA_UTILE_MM - 55)
+        a.text, b.text = k, v
+    if intestazione and righe:
+        prima = tbl.rows[0].cells
+        prima[0].merge(prima[1])
+        for run in prima[0].paragraphs[0].runs:
+            run.bold = True
+    else:
+        for tr in tbl.rows:
+            for run in tr.cells[0].paragraphs[0].runs:
+                run.bold = True
+    return tbl
+
+
+def _stile_griglia(doc: Document):
+    try:
+        return doc.styles["Table Grid"]
+    except KeyError:
+        return None
+
+
+def _tabella(doc: Document, t: Tabella):
+    # la tabella viene costruita già nel documento, dopo un paragrafo di appoggio
+    appoggio = doc.add_paragraph()
+    stile = _stile_griglia(doc)
+    xml_tabella(t.colonne, t.righe, int(Mm(LARGHEZZA_UTILE_MM)), stile.style_id if stile else None, dopo=appoggio._p)
+    appoggio._p.getparent().remove(appoggio._p)
+
+
+def _griglia_foto(doc: Document, foto: list):
+    tbl = doc.add_table(rows=2, cols=2)
+    tbl.style = _stile_griglia(doc)
+    celle = [c for tr in tbl.rows for c in tr.cells]
+    max_w, max_h = FOTO_MAX_MM
+    for cella, f in zip(celle, foto):
+        cella.width = Mm(LARGHEZZA_UTILE_MM / 2)
+        didascalia = cella.paragraphs[0]
+        didascalia.add_run(f.didascalia).font.size = Pt(9)
+        if not _foto(cella.add_paragraph(), f, max_w, max_h):
+            r = cella.add_paragraph().add_run("(non presente)")
+            r.font.size = Pt(9)
+            r.font.color.rgb = GRIGIO
+
+
+def _foto(paragraph, f: Foto, max_w: float, max_h: float) -> bool:
+    if not f.blob:
+        return False
+    try:
+        if f.px:
+            w, h = f.px
+            scala = min(max_w / w, max_h / h)
+            paragraph.add_run().add_picture(io.BytesIO(f.blob), width=Mm(w * scala), height=Mm(h * scala))
+        else:
+            paragraph.add_run().add_picture(io.BytesIO(f.blob), width=Mm(max_w))
+    except Exception:
+        return False
+    return True
+
+
+def _intestazioni(doc: Document, data: dict):
+    """Intestazione e piè di pagina come nel PDF, esclusa la copertina (prima sezione)."""
+    cod = data.get("cod_progetto")
+    header = data.get("header_titolo") or "Relazione Tecnico-Specialistica"
+    if _meaningful(cod):
+        header = f"{header} · Cod. {cod}"
+    rev, data_doc = data.get("rev"), data.get("data")
+    meta = " · ".join(x for x in (f"Rev. {rev}" if _meaningful(rev) else "", f"Data {data_doc}" if _meaningful(data_doc) else "") if x)
+
+    sezione = doc.sections[-1]
+    sezione.header.is_linked_to_previous = False
+    sezione.footer.is_linked_to_previous = False
+    sezione.header.paragraphs[0].text = header
+    p = sezione.footer.paragraphs[0]
+    p.text = f"{meta}\t" if meta else "\t"
+    p.add_run("Pagina ")
+    _campo(p, "PAGE", "1")
+    p.add_run(" di ")
+    _campo(p, "NUMPAGES", "1")
+    for part in (sezione.header, sezione.footer):
+        for run in part.paragraphs[0].runs:
+            run.font.size = Pt(9)
+            run.font.color.rgb = GRIGIO
+
+
+def rendi_docx(
+    documento: Documento,
+    template: Optional[Union[str, Path]] = None,
+    avanzamento: Optional[Avanzamento] = None,
+) -> bytes:
+    """DOCX del documento intermedio (documento.da_payload).
+
+    ``avanzamento`` riceve "SIZE_EST" e un "PROGRESS" per blocco, come per il PDF.
+    """
+    doc = Document(str(template) if template else None)
+    body = doc.element.body
+    for e in list(body):
+        if e.tag != qn("w:sectPr"):
+            body.remove(e)
+    sezione = doc.sections[0]
+    sezione.page_width, sezione.page_height = Mm(210), Mm(297)
+    sezione.left_margin = sezione.right_margin = Mm(18)
+    sezione.top_margin, sezione.bottom_margin = Mm(20), Mm(18)
+
+    data = documento.meta
+    ultimo = None  # ultimo paragrafo di testo, a cui Spazio aggiunge lo spazio dopo
+    inizio_pagina = True
+    if avanzamento:
+        avanzamento("SIZE_EST", len(documento.blocchi))
+    for i, b in enumerate(documento.blocchi):
+        if avanzamento:
+            avanzamento("PROGRESS", i)
+        if isinstance(b, Spazio):
+            if ultimo is not None:
+                ultimo.paragraph_format.space_after = Pt(b.punti)
+            continue
+        ultimo = None
+        if isinstance(b, Testo):
+            ultimo = _testo(doc, b.testo)
+        elif isinstance(b, Titolo):
+            if b.in_indice:
+                ultimo = doc.add_heading(b.testo, level=b.livello)
+            else:
+                ultimo = doc.add_paragraph()
+                run = ultimo.add_run(b.testo)
+                run.bold = True
+                run.font.size = Pt(16 if b.livello == 0 else 13)
+        elif isinstance(b, Tabella):
+            _tabella(doc, b)
+        elif isinstance(b, ChiaveValore):
+            _chiave_valore(doc, b.righe)
+        elif isinstance(b, GrigliaFoto):
+            _griglia_foto(doc, b.foto)
+        elif isinstance(b, Copertina):
+            _copertina(doc, data)
+            # la copertina ha una sezione propria, senza intestazione
+            doc.add_section(WD_SECTION.NEW_PAGE)
+            _intestazioni(doc, data)
+            inizio_pagina = True
+            continue
+        elif isinstance(b, NuovaPagina):
+            if not inizio_pagina:
+                doc.add_paragraph().add_run().add_break(WD_BREAK.PAGE)
+                inizio_pagina = True
+            continue
+        elif isinstance(b, Indice):
+            _campo(doc.add_paragraph(), 'TOC \\o "1-2" \\h \\z \\u', "Aggiornare l'indice (F9).")
+        inizio_pagina = False
+    if avanzamento:
+        avanzamento("PROGRESS", len(documento.blocchi))
+
+    out = io.BytesIO()
+    doc.save(out)
+    return out.getvalue()
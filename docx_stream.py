@@ -0,0 +1,924 @@
+"""Backend DOCX diretto su lxml per la generazione in blocco.
+
+Stesso risultato di generator.generate_document, senza il modello a oggetti di
+python-docx (Document, Paragraph, Run, Package): il template viene letto dallo
+zip, word/document.xml e gli header/footer delle sezioni sono trasformati come
+alberi lxml (con le classi oxml di python-docx, per creare gli elementi
+esattamente come fa python-docx) e lo zip di uscita viene scritto in streaming.
+Le parti non toccate sono copiate così come sono, senza rileggerle né
+riserializzarle.
+
+Come TemplateRegistry, ogni template viene analizzato una volta (anchor,
+indice dei paragrafi, stili, relazioni) e conservato per hash del contenuto;
+ogni documento parte da una copia degli alberi XML.
+
+    from docx_stream import genera_docx_stream
+    docx_bytes = genera_docx_stream(template, data, progettista, esecutrice,
+                                    colonnine, photos, diagram_bytes, allegati)
+
+Limite noto: se la prima sezione non ha header/footer predefiniti,
+python-docx li crea (vuoti) durante la ricerca; qui vengono semplicemente
+ignorati, senza differenze nel testo del documento.
+"""
+
+from __future__ import annotations
+
+import copy
+import hashlib
+import io
+import posixpath
+import re
+import struct
+import threading
+import time
+import zipfile
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import IO, Dict, List, Optional, Tuple, Union
+
+from docx.enum.style import WD_STYLE_TYPE
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.image.image import Image
+from docx.oxml.ns import qn
+from docx.oxml.parser import parse_xml
+from docx.oxml.shape import CT_Inline
+from docx.oxml.table import CT_Tbl
+from docx.shared import Emu, Inches, Pt
+from docx.styles.styles import Styles
+from lxml import etree
+
+from documento import LINEE_COLONNE, QUADRI_COLONNE
+from generator import (
+    ANCHORS,
+    HEADING_HINTS,
+    SAMPLE_TEXT_MAPPING,
+    TABLE_ANCHORS,
+    TABLE_HEADING_HINTS,
+    AllegatoItem,
+    ColonninaItem,
+    EsecutriceData,
+    PhotoItem,
+    ProgettistaData,
+    RelazioneData,
+    RE_CANDIDATO,
+    Replacer,
+    build_field_mapping,
+    come_documento,
+    is_heading_like,
+    sostituisci_nei_run,
+    occorrenze,
+    xml_tabella,
+)
+from immagini import DPI, per_docx, riduci_media
+
+BODY = "body"
+TABLE = "table"
+HEADER_FOOTER = "header_footer"
+
+RT_OFFICE_DOCUMENT = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"
+RT_IMAGE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/image"
+NS_RELS = "http://schemas.openxmlformats.org/package/2006/relationships"
+NS_CT = "http://schemas.openxmlformats.org/package/2006/content-types"
+
+_P, _R, _T, _TAB, _PTAB, _BR, _CR, _NBH, _HYPERLINK = (
+    qn(t) for t in ("w:p", "w:r", "w:t", "w:tab", "w:ptab", "w:br", "w:cr", "w:noBreakHyphen", "w:hyperlink")
+)
+_TBL, _TR, _TC = qn("w:tbl"), qn("w:tr"), qn("w:tc")
+_BR_TYPE = qn("w:type")
+
+
+# -------------------- Testo dei paragrafi (come python-docx) --------------------
+def _testo_r(r) -> str:
+    parti = []
+    for e in r:
+        tag = e.tag
+        if tag == _T:
+            parti.append(e.text or "")
+        elif tag == _TAB or tag == _PTAB:
+            parti.append("\t")
+        elif tag == _BR:
+            parti.append("\n" if e.get(_BR_TYPE, "textWrapping") == "textWrapping" else "")
+        elif tag == _CR:
+            parti.append("\n")
+        elif tag == _NBH:
+            parti.append("-")
+    return "".join(parti)
+
+
+def _runs(p) -> list:
+    return [e for e in p if e.tag == _R]
+
+
+def _testi(p) -> Tuple[str, str]:
+    """(Paragraph.text, testo dei soli run diretti) senza wrapper python-docx."""
+    tutto, diretti = [], []
+    for e in p:
+        if e.tag == _R:
+            t = _testo_r(e)
+            tutto.append(t)
+            diretti.append(t)
+        elif e.tag == _HYPERLINK:
+            tutto.extend(_testo_r(r) for r in e if r.tag == _R)
+    testo = "".join(tutto)
+    return testo, ("".join(diretti) if diretti else testo)
+
+
+# -------------------- Indice --------------------
+class _Voce:
+    __slots__ = ("p", "parte", "testo", "testo_l", "testo_run", "posizione", "in_tabella", "toc")
+
+    def __init__(self, p, parte: str, posizione: str, in_tabella: bool, toc: bool):
+        self.p = p
+        self.parte = parte
+        self.posizione = posizione
+        self.in_tabella = in_tabella
+        self.toc = toc
+        self.aggiorna()
+
+    def aggiorna(self):
+        self.testo, self.testo_run = _testi(self.p)
+        self.testo_l = self.testo.lower()
+
+    def copia(self, p) -> "_Voce":
+        v = _Voce.__new__(_Voce)
+        v.p = p
+        for attr in ("parte", "testo", "testo_l", "testo_run", "posizione", "in_tabella", "toc"):
+            setattr(v, attr, getattr(self, attr))
+        return v
+
+
+class _Indice:
+    """Come generator.DocIndex, ma su elementi w:p invece che su Paragraph."""
+
+    def __init__(self, voci: List[_Voce]):
+        self._voci = voci
+        self._per_elemento = {v.p: v for v in voci}
+
+    def voci(self, posizione: Optional[str] = None) -> List[_Voce]:
+        if posizione is None:
+            return list(self._voci)
+        return [v for v in self._voci if v.posizione == posizione]
+
+    def contiene(self, text: str) -> bool:
+        needle = text.lower()
+        return any(needle in v.testo_l for v in self._voci)
+
+    def nel_body(self, p) -> bool:
+        v = self._per_elemento.get(p)
+        return v is not None and v.posizione == BODY
+
+    def trova(self, needles: List[str], prefer_body: bool = True):
+        needles_l = [n.lower() for n in needles]
+        best = None
+        for v in self._voci:
+            if not any(n in v.testo_l for n in needles_l):
+                continue
+            if v.toc:
+                continue
+            if not prefer_body or v.posizione == BODY:
+                return v.p
+            best = best if best is not None else v.p
+        return best
+
+    def aggiorna(self, p):
+        v = self._per_elemento.get(p)
+        if v is not None:
+            v.aggiorna()
+
+    def _registra(self, i: int, p, rif: Optional[_Voce]):
+        v = _Voce(p, rif.parte if rif else "", rif.posizione if rif else BODY, rif.in_tabella if rif else False, False)
+        self._voci.insert(i, v)
+        self._per_elemento[p] = v
+
+    def inserisci_dopo(self, rif, p):
+        vr = self._per_elemento[rif]
+        self._registra(self._voci.index(vr) + 1, p, vr)
+
+    def inserisci_in_coda_body(self, p, parte: str):
+        i = 0
+        for j, v in enumerate(self._voci):
+            if v.posizione == BODY:
+                i = j + 1
+        self._registra(i, p, None)
+        self._voci[i].parte = parte
+
+    def inserisci_in_testa(self, paragrafi: list, parte: str):
+        for k, p in enumerate(paragrafi):
+            self._registra(k, p, None)
+            self._voci[k].parte = parte
+
+    def rimuovi(self, p):
+        v = self._per_elemento.pop(p, None)
+        if v is not None:
+            self._voci.remove(v)
+
+
+# -------------------- Stili --------------------
+class _Stili:
+    def __init__(self, styles_xml: Optional[bytes]):
+        self.styles = Styles(parse_xml(styles_xml)) if styles_xml else None
+        self._nomi: Dict[str, str] = {}
+        self._default = ""
+        self._presenti: Dict[str, bool] = {}
+        self._ids: Dict[tuple, object] = {}
+        if self.styles is None:
+            return
+        for s in self.styles._element.style_lst:
+            if s.type != WD_STYLE_TYPE.PARAGRAPH:
+                continue
+            nome = (s.name_val or "").lower()
+            self._nomi[s.styleId] = nome
+            if s.default:
+                self._default = nome
+
+    def toc(self, p) -> bool:
+        pPr = p.pPr
+        style_id = pPr.style if pPr is not None else None
+        return self._nomi.get(style_id, self._default).startswith("toc")
+
+    def __contains__(self, nome: str) -> bool:
+        if nome not in self._presenti:
+            self._presenti[nome] = self.styles is not None and nome in self.styles
+        return self._presenti[nome]
+
+    def style_id(self, nome: str, tipo=WD_STYLE_TYPE.PARAGRAPH) -> Optional[str]:
+        # ricerca per nome lineare sugli stili: memorizzata, il modello è condiviso
+        chiave = (nome, tipo)
+        if chiave not in self._ids:
+            if self.styles is None:
+                raise KeyError(nome)
+            try:
+                self._ids[chiave] = self.styles.get_style_id(nome, tipo)
+            except (KeyError, ValueError) as exc:
+                self._ids[chiave] = exc
+        risultato = self._ids[chiave]
+        if isinstance(risultato, Exception):
+            raise risultato
+        return risultato
+
+
+# -------------------- Template analizzato --------------------
+def _risolvi(base: str, target: str) -> str:
+    return posixpath.normpath(posixpath.join(posixpath.dirname(base), target)).lstrip("/")
+
+
+def _rels_di(nome_parte: str) -> str:
+    d, f = posixpath.split(nome_parte)
+    return posixpath.join(d, "_rels", f + ".rels")
+
+
+class _ZipStream:
+    """Scrittore zip minimale e sequenziale (niente seek: va bene anche su socket o pipe).
+
+    Le voci del template sono scritte con i byte già compressi, senza
+    decomprimerle e ricomprimerle; solo le parti modificate passano da zlib.
+    """
+
+    def __init__(self, out: IO[bytes]):
+        self.out = out
+        self.offset = 0
+        self.centrale: List[bytes] = []
+        t = time.localtime()
+        self._data = (t.tm_year - 1980) << 9 | t.tm_mon << 5 | t.tm_mday
+        self._ora = t.tm_hour << 11 | t.tm_min << 5 | t.tm_sec // 2
+
+    def _voce(self, nome: str, metodo: int, crc: int, csize: int, usize: int, dati: bytes):
+        nome_b = nome.encode("utf-8")
+        flag = 0x800 if not nome.isascii() else 0
+        locale = struct.pack(
+            "<4s2B4HL2L2H", b"PK\x03\x04", 20, 0, flag, metodo, self._ora, self._data,
+            crc, csize, usize, len(nome_b), 0,
+        )
+        self.centrale.append(struct.pack(
+            "<4s4B4HL2L5H2L", b"PK\x01\x02", 20, 0, 20, 0, flag, metodo, self._ora, self._data,
+            crc, csize, usize, len(nome_b), 0, 0, 0, 0, 0, self.offset,
+        ) + nome_b)
+        self.out.write(locale)
+        self.out.write(nome_b)
+        self.out.write(dati)
+        self.offset += len(locale) + len(nome_b) + len(dati)
+
+    def scrivi(self, nome: str, dati: bytes):
+        c = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+        compressi = c.compress(dati) + c.flush()
+        self._voce(nome, zipfile.ZIP_DEFLATED, zlib.crc32(dati), len(compressi), len(dati), compressi)
+
+    def copia(self, nome: str, grezza: "_VoceZip"):
+        self._voce(nome, grezza.metodo, grezza.crc, len(grezza.dati), grezza.usize, grezza.dati)
+
+    def chiudi(self):
+        inizio = self.offset
+        cd = b"".join(self.centrale)
+        self.out.write(cd)
+        n = len(self.centrale)
+        self.out.write(struct.pack("<4s4H2LH", b"PK\x05\x06", 0, 0, n, n, len(cd), inizio, 0))
+
+
+@dataclass
+class _VoceZip:
+    metodo: int
+    crc: int
+    usize: int
+    dati: bytes  # byte compressi così come sono nel template
+
+
+def _voci_zip(raw: bytes, zin: zipfile.ZipFile) -> Dict[str, _VoceZip]:
+    voci = {}
+    for info in zin.infolist():
+        n, e = struct.unpack("<HH", raw[info.header_offset + 26: info.header_offset + 30])
+        inizio = info.header_offset + 30 + n + e
+        voci[info.filename] = _VoceZip(info.compress_type, info.CRC, info.file_size, raw[inizio: inizio + info.compress_size])
+    return voci
+
+
+def _serializza(root) -> bytes:
+    # come docx.opc.oxml.serialize_part_xml
+    return etree.tostring(root, encoding="UTF-8", standalone=True)
+
+
+@dataclass
+class _Modello:
+    nomi: List[str]  # ordine delle voci nello zip
+    grezzi: Dict[str, bytes]
+    parte_doc: str
+    radici: Dict[str, object]  # parte -> radice XML (document + header/footer), già ancorata
+    voci: List[tuple]  # (parte, ordinale del w:p, _Voce)
+    stili: _Stili
+    compressi: Dict[str, _VoceZip]
+    max_id: int = 0  # massimo @id numerico di document.xml (id delle immagini)
+    immagini: Dict[str, str] = field(default_factory=dict)  # sha1 -> parte immagine
+    modificate: set = field(default_factory=set)
+    da_sostituire: List[int] = field(default_factory=list)  # voci con segnaposto (manifest)
+
+
+def _sezioni(body) -> list:
+    return body.xpath("./w:p/w:pPr/w:sectPr | ./w:sectPr")
+
+
+def _header_footer(rels_doc: Dict[str, Tuple[str, str]], body) -> List[str]:
+    """Parti header/footer predefinite per sezione, in ordine (come section.header/footer)."""
+    parti = []
+    precedenti = {"header": None, "footer": None}
+    for sectPr in _sezioni(body):
+        for tipo in ("header", "footer"):
+            ref = None
+            for r in sectPr.findall(qn(f"w:{tipo}Reference")):
+                if r.get(qn("w:type")) == "default":
+                    ref = r.get(qn("r:id"))
+            parte = rels_doc[ref][1] if ref in rels_doc else precedenti[tipo]
+            precedenti[tipo] = parte
+            if parte:
+                parti.append(parte)
+    return parti
+
+
+def _celle(tbl) -> list:
+    """w:tc di una tabella come row.cells (celle in vMerge continue escluse)."""
+    celle = []
+    for tr in tbl.iterchildren(_TR):
+        for tc in tr.iterchildren(_TC):
+            if tc.vMerge == "continue":
+                continue
+            celle.append(tc)
+    return celle
+
+
+def _costruisci_voci(radici: Dict[str, object], parte_doc: str, parti_hf: List[str], stili: _Stili) -> List[_Voce]:
+    voci: List[_Voce] = []
+    visti = set()
+
+    def aggiungi(p, parte, posizione, in_tabella):
+        if p in visti:
+            return
+        visti.add(p)
+        voci.append(_Voce(p, parte, posizione, in_tabella, stili.toc(p)))
+
+    body = radici[parte_doc].body
+    for p in body.iterchildren(_P):
+        aggiungi(p, parte_doc, BODY, False)
+    for tbl in body.iterchildren(_TBL):
+        for tc in _celle(tbl):
+            for p in tc.iterchildren(_P):
+                aggiungi(p, parte_doc, TABLE, True)
+            for ntbl in tc.iterchildren(_TBL):
+                for ntc in _celle(ntbl):
+                    for p in ntc.iterchildren(_P):
+                        aggiungi(p, parte_doc, TABLE, True)
+    for parte in parti_hf:
+        root = radici[parte]
+        for p in root.iterchildren(_P):
+            aggiungi(p, parte, HEADER_FOOTER, False)
+        for tbl in root.iterchildren(_TBL):
+            for tc in _celle(tbl):
+                for p in tc.iterchildren(_P):
+                    aggiungi(p, parte, HEADER_FOOTER, True)
+    return voci
+
+
+def _leggi_rels(grezzi: Dict[str, bytes], parte: str) -> Dict[str, Tuple[str, str]]:
+    """rId -> (tipo, parte di destinazione) delle relazioni interne di ``parte``."""
+    nome = _rels_di(parte)
+    if nome not in grezzi:
+        return {}
+    rels = {}
+    for rel in etree.fromstring(grezzi[nome]):
+        if rel.get("TargetMode") == "External":
+            continue
+        rels[rel.get("Id")] = (rel.get("Type"), _risolvi(parte, rel.get("Target")))
+    return rels
+
+
+def _analizza(raw: bytes) -> _Modello:
+    with zipfile.ZipFile(io.BytesIO(raw)) as zin:
+        nomi = zin.namelist()
+        grezzi = {n: zin.read(n) for n in nomi}
+        compressi = _voci_zip(raw, zin)
+    parte_doc = next(t for tipo, t in _leggi_rels(grezzi, "").values() if tipo == RT_OFFICE_DOCUMENT)
+    rels_doc = _leggi_rels(grezzi, parte_doc)
+    stili = _Stili(next((grezzi[p] for tipo, p in rels_doc.values() if tipo.endswith("/styles")), None))
+
+    radici = {parte_doc: parse_xml(grezzi[parte_doc])}
+    parti_hf = _header_footer(rels_doc, radici[parte_doc].body)
+    for parte in parti_hf:
+        if parte not in radici:
+            radici[parte] = parse_xml(grezzi[parte])
+    indice = _Indice(_costruisci_voci(radici, parte_doc, parti_hf, stili))
+    modello = _Modello(nomi, grezzi, parte_doc, radici, [], stili, compressi)
+    if _ensure_anchors(modello, radici, indice):
+        modello.modificate.add(parte_doc)
+    # come StoryPart.next_id; i paragrafi e le tabelle aggiunti dopo non hanno @id
+    modello.max_id = max((int(i) for i in radici[parte_doc].xpath("//@id") if i.isdigit()), default=0)
+
+    # immagini già presenti (per il riuso per sha1, come ImageParts)
+    for nome in nomi:
+        if not nome.endswith(".rels"):
+            continue
+        cartella = posixpath.dirname(posixpath.dirname(nome))
+        sorgente = posixpath.join(cartella, posixpath.basename(nome)[: -len(".rels")])
+        for tipo, parte in _leggi_rels(grezzi, sorgente).values():
+            if tipo == RT_IMAGE and parte in grezzi:
+                modello.immagini.setdefault(hashlib.sha1(grezzi[parte]).hexdigest(), parte)
+
+    ordinali = {parte: {p: i for i, p in enumerate(root.iter(_P))} for parte, root in radici.items()}
+    modello.voci = [(v.parte, ordinali[v.parte][v.p], v) for v in indice.voci()]
+    # come estrai_manifest: le sostituzioni toccano solo questi paragrafi
+    modello.da_sostituire = [
+        i for i, (_, _, v) in enumerate(modello.voci)
+        if RE_CANDIDATO.search(v.testo_run) and occorrenze([_testo_r(r) for r in _runs(v.p)] or [v.testo_run])
+    ]
+    return modello
+
+
+_MODELLI: "OrderedDict[str, _Modello]" = OrderedDict()
+_MAX_MODELLI = 8
+_lock = threading.Lock()
+
+
+def _modello(raw: bytes) -> _Modello:
+    chiave = hashlib.sha1(raw).hexdigest()
+    with _lock:
+        m = _MODELLI.get(chiave)
+        if m is not None:
+            _MODELLI.move_to_end(chiave)
+            return m
+    m = _analizza(riduci_media(come_documento(raw)))
+    with _lock:
+        _MODELLI[chiave] = m
+        while len(_MODELLI) > _MAX_MODELLI:
+            _MODELLI.popitem(last=False)
+    return m
+
+
+# -------------------- Documento in lavorazione --------------------
+class _Documento:
+    """Copia di lavoro di un _Modello: alberi XML, indice, relazioni e media nuovi."""
+
+    def __init__(self, modello: _Modello):
+        self.m = modello
+        self.radici = {parte: copy.deepcopy(root) for parte, root in modello.radici.items()}
+        self.root = self.radici[modello.parte_doc]
+        self.body = self.root.body
+        self.stili = modello.stili
+        self.modificate = set(modello.modificate)
+        elementi = {parte: list(root.iter(_P)) for parte, root in self.radici.items()}
+        voci = [v.copia(elementi[parte][i]) for parte, i, v in modello.voci]
+        self.indice = _Indice(voci)
+        self.da_sostituire = [voci[i] for i in modello.da_sostituire]
+        self.nuovi_media: Dict[str, Tuple[bytes, str]] = {}  # parte -> (blob, content type)
+        self.immagini = dict(modello.immagini)
+        self._rels_doc = None
+        self._max_id = modello.max_id
+
+    # --- relazioni / immagini ---
+    def _rels(self):
+        if self._rels_doc is None:
+            nome = _rels_di(self.m.parte_doc)
+            self._rels_doc = etree.fromstring(self.m.grezzi[nome])
+        return self._rels_doc
+
+    def _relaziona_immagine(self, parte: str) -> str:
+        rels = self._rels()
+        target = posixpath.relpath(parte, posixpath.dirname(self.m.parte_doc))
+        ids = set()
+        for rel in rels:
+            ids.add(rel.get("Id"))
+            if rel.get("Type") == RT_IMAGE and rel.get("TargetMode") != "External" and \
+                    _risolvi(self.m.parte_doc, rel.get("Target")) == parte:
+                return rel.get("Id")
+        rid = next("rId%d" % n for n in range(1, len(ids) + 2) if "rId%d" % n not in ids)
+        etree.SubElement(rels, f"{{{NS_RELS}}}Relationship", Id=rid, Type=RT_IMAGE, Target=target)
+        return rid
+
+    def _parte_immagine(self, image: Image) -> str:
+        parte = self.immagini.get(image.sha1)
+        if parte is not None:
+            return parte
+        usati = []
+        for p in self.immagini.values():
+            m = re.search(r"(\d+)\.[^.]*$", p)
+            usati.append(int(m.group(1)) if m else None)
+        n = next((n for n in range(1, len(usati) + 1) if n not in usati), len(usati) + 1)
+        parte = f"word/media/image{n}.{image.ext}"
+        self.immagini[image.sha1] = parte
+        self.nuovi_media[parte] = (image.blob, image.content_type)
+        return parte
+
+    def aggiungi_immagine(self, r, blob: bytes, width: int):
+        # come Run.add_picture / StoryPart.new_pic_inline
+        image = Image.from_blob(blob)
+        rid = self._relaziona_immagine(self._parte_immagine(image))
+        cx, cy = image.scaled_dimensions(width, None)
+        self._max_id += 1
+        shape_id = self._max_id
+        r.add_drawing(CT_Inline.new_pic_inline(shape_id, rid, image.filename, cx, cy))
+
+    # --- paragrafi ---
+    def nuovo_paragrafo(self, text: str = "", style: Optional[str] = None):
+        """Come doc.add_paragraph: in fondo al corpo, prima di w:sectPr."""
+        p = self.body.add_p()
+        if text:
+            p.add_r().text = text
+        if style is not None:
+            p.style = self.stili.style_id(style)
+        return p
+
+    def _content_types(self) -> bytes:
+        nome = "[Content_Types].xml"
+        if not self.nuovi_media:
+            return self.m.grezzi[nome]
+        root = etree.fromstring(self.m.grezzi[nome])
+        default = {d.get("Extension", "").lower(): d.get("ContentType") for d in root.iter(f"{{{NS_CT}}}Default")}
+        for parte, (_, ct) in self.nuovi_media.items():
+            ext = parte.rsplit(".", 1)[-1].lower()
+            if ext not in default:
+                etree.SubElement(root, f"{{{NS_CT}}}Default", Extension=ext, ContentType=ct)
+                default[ext] = ct
+            elif default[ext] != ct:
+                etree.SubElement(root, f"{{{NS_CT}}}Override", PartName="/" + parte, ContentType=ct)
+        return _serializza(root)
+
+    def scrivi(self, out: IO[bytes]):
+        rels_nome = _rels_di(self.m.parte_doc)
+        zout = _ZipStream(out)
+        for nome in self.m.nomi:
+            if nome == "[Content_Types].xml" and self.nuovi_media:
+                zout.scrivi(nome, self._content_types())
+            elif nome == rels_nome and self._rels_doc is not None:
+                zout.scrivi(nome, _serializza(self._rels_doc))
+            elif nome in self.radici and nome in self.modificate:
+                zout.scrivi(nome, _serializza(self.radici[nome]))
+            else:
+                zout.copia(nome, self.m.compressi[nome])
+        for parte, (blob, _) in self.nuovi_media.items():
+            zout.scrivi(parte, blob)
+        zout.chiudi()
+
+
+# -------------------- Operazioni (come generator) --------------------
+def _ensure_anchors(m: _Modello, radici: Dict[str, object], indice: _Indice) -> List[str]:
+    body = radici[m.parte_doc].body
+    created = []
+    for key, marker in ANCHORS.items():
+        if indice.contiene(marker):
+            continue
+        hints = HEADING_HINTS.get(key, [])
+        anchor_after = indice.trova(hints, prefer_body=True) if hints else None
+        new_p = body.add_p()
+        new_p.add_r().text = marker
+        if anchor_after is None:
+            indice.inserisci_in_coda_body(new_p, m.parte_doc)
+        else:
+            anchor_after.addnext(new_p)
+            indice.inserisci_dopo(anchor_after, new_p)
+        created.append(marker)
+    return created
+
+
+def _replace_everywhere(doc: _Documento, replacer: Replacer):
+    if not replacer:
+        return
+    for v in doc.da_sostituire:
+        if not replacer.search(v.testo_run):
+            continue
+        p = v.p
+        runs = _runs(p)
+        fatto = sostituisci_nei_run(runs, replacer) if runs else None
+        if fatto is not None:
+            if fatto:
+                v.aggiorna()
+                doc.modificate.add(v.parte)
+            continue
+        full = v.testo_run
+        new = replacer.sub(full)
+        if new == full:
+            continue
+        if not runs:
+            # Paragraph.text = new
+            p.clear_content()
+            r = p.add_r()
+            if new:
+                r.text = new
+        else:
+            runs[0].text = new
+            for r in runs[1:]:
+                r.text = ""
+        v.aggiorna()
+        doc.modificate.add(v.parte)
+
+
+def _wipe(doc: _Documento, p):
+    for r in _runs(p):
+        r.text = ""
+    doc.indice.aggiorna(p)
+
+
+def _insert_bullets_after(doc: _Documento, p, lines: List[str]):
+    style = "List Bullet" if "List Bullet" in doc.stili else None
+    prev = p
+    for line in lines:
+        if not line.strip():
+            continue
+        bp = doc.nuovo_paragrafo(line.strip(), style)
+        prev.addnext(bp)
+        doc.indice.inserisci_dopo(prev, bp)
+        prev = bp
+
+
+def _bold_primo_run(p):
+    runs = _runs(p)
+    if runs:
+        runs[0].get_or_add_rPr()._set_bool_val("b", True)
+
+
+def _insert_cover(doc: _Documento, data: RelazioneData, progettista: ProgettistaData, esecutrice: Optional[EsecutriceData]):
+    def add_par(text: str, size: int, bold: bool, align: str):
+        p = doc.nuovo_paragrafo()
+        r = p.add_r()
+        if text:
+            r.text = text
+        rPr = r.get_or_add_rPr()
+        rPr._set_bool_val("b", bold)
+        rPr.sz_val = Pt(size)
+        p.get_or_add_pPr().jc_val = WD_ALIGN_PARAGRAPH.CENTER if align == "center" else WD_ALIGN_PARAGRAPH.LEFT
+        return p
+
+    def add_left(text: str):
+        p = doc.nuovo_paragrafo(text)
+        p.get_or_add_pPr().jc_val = WD_ALIGN_PARAGRAPH.LEFT
+        return p
+
+    cover = [
+        add_par("RELAZIONE TECNICA", 22, True, "center"),
+        add_par(data.oggetto.upper(), 14, True, "center"),
+        add_par("", 11, False, "center"),
+        add_par(f"Sito: {data.sito_indirizzo} — {data.sito_cap_citta}", 11, False, "center"),
+        add_par(f"Committente: {data.committente}", 11, False, "center"),
+        add_par(data.luogo_data, 11, False, "center"),
+        add_par("", 11, False, "center"),
+        add_par("PROGETTISTA", 12, True, "left"),
+    ]
+    for line in [
+        progettista.nome,
+        progettista.indirizzo,
+        f"Cell: {progettista.cell}",
+        f"Email: {progettista.email}",
+        f"P.IVA: {progettista.piva}",
+    ]:
+        cover.append(add_left(line))
+
+    if esecutrice and (esecutrice.nome.strip() or esecutrice.indirizzo.strip() or esecutrice.piva.strip()):
+        p_ex = doc.nuovo_paragrafo()
+        p_ex.get_or_add_pPr().jc_val = WD_ALIGN_PARAGRAPH.LEFT
+        r = p_ex.add_r()
+        r.text = "DITTA ESECUTRICE"
+        r.get_or_add_rPr()._set_bool_val("b", True)
+        cover.append(p_ex)
+        for line in [
+            esecutrice.nome.strip(),
+            esecutrice.indirizzo.strip(),
+            (f"P.IVA: {esecutrice.piva.strip()}" if esecutrice.piva.strip() else ""),
+        ]:
+            if line:
+                cover.append(add_left(line))
+
+    pb = doc.nuovo_paragrafo()
+    pb.add_r().add_br().type = "page"
+    cover.append(pb)
+
+    for e in reversed(cover):
+        doc.body.insert(0, e)
+    doc.indice.inserisci_in_testa(cover, doc.m.parte_doc)
+
+
+def _write_ditta_esecutrice(doc: _Documento, esecutrice: EsecutriceData):
+    p = doc.indice.trova([ANCHORS["DITTA_ESECUTRICE"]], prefer_body=True)
+    if p is None:
+        return
+    _wipe(doc, p)
+    lines = []
+    if esecutrice.nome.strip(): lines.append(esecutrice.nome.strip())
+    if esecutrice.indirizzo.strip(): lines.append(esecutrice.indirizzo.strip())
+    if esecutrice.piva.strip(): lines.append(f"P.IVA: {esecutrice.piva.strip()}")
+    if lines:
+        _insert_bullets_after(doc, p, lines)
+
+
+def _clear_section_after_heading_body(doc: _Documento, heading_any: List[str]):
+    title = doc.indice.trova(heading_any, prefer_body=True)
+    if title is None:
+        return None
+    body_paras = [v.p for v in doc.indice.voci(BODY)]
+    if title not in body_paras:
+        return title
+    idx = body_paras.index(title)
+    to_delete = []
+    for p2 in body_paras[idx+1:]:
+        if is_heading_like(_testi(p2)[0]):
+            break
+        to_delete.append(p2)
+    for p2 in reversed(to_delete):
+        p2.getparent().remove(p2)
+        doc.indice.rimuovi(p2)
+    return title
+
+
+def _write_layout(doc: _Documento, data: RelazioneData):
+    p = doc.indice.trova([ANCHORS["LAYOUT"]], prefer_body=True)
+    if p is not None:
+        _wipe(doc, p)
+        anchor = p
+    else:
+        anchor = _clear_section_after_heading_body(doc, ["LAYOUT D'IMPIANTO", "LAYOUT D’IMPIANTO"])
+        if anchor is None:
+            return
+
+    elm = anchor
+    if data.layout_incluso.strip():
+        lbl = doc.nuovo_paragrafo("Incluso:")
+        elm.addnext(lbl)
+        doc.indice.inserisci_dopo(elm, lbl)
+        _bold_primo_run(lbl)
+        elm = lbl
+        _insert_bullets_after(doc, lbl, data.layout_incluso.splitlines())
+    if data.layout_escluso.strip():
+        lbl2 = doc.nuovo_paragrafo("Escluso:")
+        elm.addnext(lbl2)
+        doc.indice.inserisci_dopo(elm, lbl2)
+        _bold_primo_run(lbl2)
+        elm = lbl2
+        _insert_bullets_after(doc, lbl2, data.layout_escluso.splitlines())
+
+
+def _write_colonnine(doc: _Documento, colonnine: List[ColonninaItem]):
+    p = doc.indice.trova([ANCHORS["COLONNINE"]], prefer_body=True)
+    if p is None:
+        return
+    _wipe(doc, p)
+    if not colonnine:
+        return
+    _insert_bullets_after(doc, p, [f"n. {c.quantita} — {c.descrizione}" for c in colonnine])
+
+
+def _write_allegati(doc: _Documento, allegati: List[AllegatoItem]):
+    p = doc.indice.trova([ANCHORS["ALLEGATI"]], prefer_body=True)
+    if p is None or not allegati:
+        return
+    _wipe(doc, p)
+    _insert_bullets_after(doc, p, [a.filename for a in allegati])
+
+
+def _larghezza_blocco(doc: _Documento) -> Emu:
+    # come Document._block_width: ultima sezione
+    sectPr = _sezioni(doc.body)[-1]
+    page_width = sectPr.page_width or Inches(8.5)
+    left_margin = sectPr.left_margin or Inches(1)
+    right_margin = sectPr.right_margin or Inches(1)
+    return Emu(page_width - left_margin - right_margin)
+
+
+def _write_foto(doc: _Documento, photos: List[PhotoItem], dpi: Optional[int]):
+    p = doc.indice.trova([ANCHORS["FOTO"]], prefer_body=True)
+    if p is None or not photos:
+        return
+    _wipe(doc, p)
+    cols = 2
+    rows = (len(photos)+cols-1)//cols
+    tbl = CT_Tbl.new_tbl(rows, cols, _larghezza_blocco(doc))
+    doc.body._insert_tbl(tbl)
+    # doc.add_table(...) (style=None) e poi table.style = "Table Grid"
+    tbl.tblStyle_val = None
+    tbl.tblStyle_val = doc.stili.style_id("Table Grid", WD_STYLE_TYPE.TABLE)
+    celle = list(tbl.iter_tcs())
+    for idx, tc in enumerate(celle):
+        if idx >= len(photos):
+            # cell.text = ""
+            tc.clear_content()
+            tc.add_p().add_r().text = ""
+            continue
+        item = photos[idx]
+        r = tc.p_lst[0].add_r()
+        doc.aggiungi_immagine(r, per_docx(item.content, Inches(3.2), dpi), Inches(3.2))
+        if item.caption.strip():
+            cap = tc.add_p()
+            cap.add_r().text = item.caption.strip()
+            try:
+                cap.style = doc.stili.style_id("Caption")
+            except Exception:
+                pass
+    p.addnext(tbl)
+
+
+def _write_diagramma(doc: _Documento, diagram_bytes: Optional[bytes], dpi: Optional[int]):
+    p = doc.indice.trova([ANCHORS["DIAGRAMMA"]], prefer_body=True)
+    if p is None or not diagram_bytes:
+        return
+    _wipe(doc, p)
+    doc.aggiungi_immagine(p.add_r(), per_docx(diagram_bytes, Inches(6.5), dpi), Inches(6.5))
+
+
+def _write_tabella(doc: _Documento, chiave: str, colonne, righe: List[Dict]):
+    if not righe:
+        return
+    p = doc.indice.trova([TABLE_ANCHORS[chiave]], prefer_body=True)
+    if p is not None:
+        _wipe(doc, p)
+    else:
+        p = doc.indice.trova(TABLE_HEADING_HINTS[chiave], prefer_body=True)
+        if p is None or not doc.indice.nel_body(p):
+            return
+    try:
+        style_id = doc.stili.style_id("Table Grid", WD_STYLE_TYPE.TABLE)
+    except (KeyError, ValueError):
+        style_id = None
+    xml_tabella(colonne, righe, _larghezza_blocco(doc), style_id, dopo=p)
+
+
+# -------------------- API --------------------
+def genera_docx_stream(
+    template: Union[bytes, Path],
+    data: RelazioneData,
+    progettista: ProgettistaData,
+    esecutrice: Optional[EsecutriceData],
+    colonnine: List[ColonninaItem],
+    photos: List[PhotoItem],
+    diagram_bytes: Optional[bytes],
+    allegati: List[AllegatoItem],
+    extra_fields: Optional[Dict[str, str]] = None,
+    out: Optional[IO[bytes]] = None,
+    dpi_immagini: Optional[int] = DPI,
+    quadri: Optional[List[Dict]] = None,
+    linee: Optional[List[Dict]] = None,
+) -> Optional[bytes]:
+    """Come generator.generate_document; con ``out`` lo zip viene scritto lì e ritorna None."""
+    raw = bytes(template) if isinstance(template, (bytes, bytearray)) else Path(template).read_bytes()
+    doc = _Documento(_modello(raw))
+
+    extra_mapping = {}
+    for label, value in (extra_fields or {}).items():
+        token = f"aggiungere {label}".strip()
+        extra_mapping[token] = value
+        extra_mapping[token.capitalize()] = value
+        extra_mapping[token.upper()] = value
+    _replace_everywhere(doc, Replacer(build_field_mapping(data), SAMPLE_TEXT_MAPPING(data), extra_mapping))
+
+    _insert_cover(doc, data, progettista, esecutrice)
+
+    if esecutrice:
+        _write_ditta_esecutrice(doc, esecutrice)
+    _write_layout(doc, data)
+    _write_colonnine(doc, colonnine)
+    _write_foto(doc, photos, dpi_immagini)
+    _write_diagramma(doc, diagram_bytes, dpi_immagini)
+    _write_allegati(doc, allegati)
+    _write_tabella(doc, "LINEE", LINEE_COLONNE, linee or [])
+    _write_tabella(doc, "QUADRI", QUADRI_COLONNE, quadri or [])
+    doc.modificate.add(doc.m.parte_doc)
+
+    if out is not None:
+        doc.scrivi(out)
+        return None
+    buf = io.BytesIO()
+    doc.scrivi(buf)
+    return buf.getvalue()
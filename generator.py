@@ -1,14 +1,31 @@
 \
 from __future__ import annotations
 
+import bisect
+import copy
+import hashlib
 import io
+import json
+import os
 import re
-from dataclasses import dataclass
-from typing import Dict, List, Optional, Union, Iterable
+import threading
+import zipfile
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 from docx import Document
+from docx.enum.style import WD_STYLE_TYPE
 from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.opc.part import XmlPart
+from docx.oxml.ns import qn
+from docx.package import Package as DocxPackage
 from docx.shared import Inches, Pt
+from docx.text.paragraph import Paragraph
+
+from documento import LINEE_COLONNE, QUADRI_COLONNE
+from immagini import DPI, per_docx, riduci_media
 
 
 # -------------------- Data models --------------------
@@ -161,44 +178,307 @@ def _is_toc_paragraph(p) -> bool:
     # The whole TOC in your doc appears inside a table; treat table paragraphs as "likely toc" when very short and numeric.
     return False
 
-def _is_in_table(p) -> bool:
-    # check ancestors for table-cell tag 'w:tc'
-    try:
-        parent = p._p.getparent()
-        while parent is not None:
-            if parent.tag.endswith('}tc'):
-                return True
-            parent = parent.getparent()
-    except Exception:
-        pass
-    return False
+# -------------------- Document index --------------------
+BODY = "body"
+TABLE = "table"
+HEADER_FOOTER = "header_footer"
+
+
+class _Voce:
+    __slots__ = ("p", "testo", "testo_l", "testo_run", "posizione", "in_tabella", "_toc")
+
+    def __init__(self, p, posizione: str, in_tabella: bool = False):
+        self.p = p
+        self.posizione = posizione
+        self.in_tabella = in_tabella
+        self._toc = None
+        self.aggiorna()
+
+    def aggiorna(self):
+        p = self.p
+        self.testo = p.text or ""
+        self.testo_l = self.testo.lower()
+        # stesso testo usato da _replace_in_paragraph (solo i run diretti)
+        runs = p.runs
+        self.testo_run = "".join(r.text for r in runs) if runs else self.testo
+
+    @property
+    def toc(self) -> bool:
+        if self._toc is None:
+            self._toc = _is_toc_paragraph(self.p)
+        return self._toc
+
+    def copia(self, p) -> "_Voce":
+        """Stessa voce per ``p``, paragrafo corrispondente in una copia del documento."""
+        v = _Voce.__new__(_Voce)
+        v.p = p
+        for attr in ("testo", "testo_l", "testo_run", "posizione", "in_tabella", "_toc"):
+            setattr(v, attr, getattr(self, attr))
+        return v
+
+
+class DocIndex:
+    """Indice dei paragrafi del documento, costruito una volta per generate_document.
+
+    Per ogni paragrafo (corpo, tabelle anche annidate, header/footer) tiene il
+    testo, il testo in minuscolo e la posizione, in ordine di documento: ricerche
+    e sostituzioni scorrono stringhe già pronte invece di ripercorrere l'albero
+    XML ad ogni chiamata. Le funzioni che inseriscono o rimuovono paragrafi lo
+    aggiornano (inserisci_dopo / inserisci_in_testa / rimuovi / aggiorna).
+
+    Appartenenza al corpo e a una cella di tabella sono note dalla visita e
+    indicizzate per elemento XML (``p._p``): i wrapper Paragraph di python-docx
+    sono oggetti nuovi ad ogni accesso e non si confrontano tra loro.
+    """
 
-def doc_contains_text(doc: Document, text: str) -> bool:
-    needle = text.lower()
-    for p in iter_all_paragraphs(doc):
-        if needle in ((p.text or "").lower()):
-            return True
-    return False
+    def __init__(self, doc: Document):
+        self.doc = doc
+        self._voci: List[_Voce] = []
+        self._per_elemento: Dict[object, _Voce] = {}
+        self._da_sostituire: Optional[List[_Voce]] = None
+        for p in doc.paragraphs:
+            self._aggiungi(p, BODY, False)
+        for p in iter_table_paragraphs(doc):
+            self._aggiungi(p, TABLE, True)
+        celle_hf = set()
+        for section in doc.sections:
+            for hf in [section.header, section.footer]:
+                celle_hf.update(hf._element.xpath(".//w:tc//w:p"))
+        for p in iter_header_footer_paragraphs(doc):
+            self._aggiungi(p, HEADER_FOOTER, p._p in celle_hf)
+
+    @classmethod
+    def _da_voci(cls, doc: Document, voci: List[_Voce]) -> "DocIndex":
+        index = cls.__new__(cls)
+        index.doc = doc
+        index._voci = voci
+        index._per_elemento = {v.p._p: v for v in voci}
+        index._da_sostituire = None
+        return index
+
+    def _aggiungi(self, p, posizione: str, in_tabella: bool):
+        # le celle unite compaiono più volte in row.cells: un paragrafo, una voce
+        if p._p in self._per_elemento:
+            return
+        v = _Voce(p, posizione, in_tabella)
+        self._voci.append(v)
+        self._per_elemento[p._p] = v
+
+    def __iter__(self):
+        return (v.p for v in self._voci)
+
+    def voci(self, posizione: Optional[str] = None) -> List[_Voce]:
+        if posizione is None:
+            return list(self._voci)
+        return [v for v in self._voci if v.posizione == posizione]
+
+    def posizione(self, p) -> Optional[str]:
+        v = self._per_elemento.get(p._p)
+        return v.posizione if v else None
+
+    def nel_body(self, p) -> bool:
+        v = self._per_elemento.get(p._p)
+        return v is not None and v.posizione == BODY
+
+    def in_tabella(self, p) -> Optional[bool]:
+        """True/False per i paragrafi indicizzati, None se ``p`` non è noto."""
+        v = self._per_elemento.get(p._p)
+        return v.in_tabella if v else None
+
+    def contiene(self, text: str) -> bool:
+        needle = text.lower()
+        return any(needle in v.testo_l for v in self._voci)
+
+    def voci_da_sostituire(self) -> List[_Voce]:
+        """Voci con segnaposto secondo il manifest del template (tutte se non è noto)."""
+        return list(self._da_sostituire) if self._da_sostituire is not None else self.voci()
+
+    def trova(self, needles: List[str], prefer_body: bool = True):
+        needles_l = [n.lower() for n in needles]
+        best = None
+        for v in self._voci:
+            if not any(n in v.testo_l for n in needles_l):
+                continue
+            # skip TOC paragraphs if possible
+            if v.toc:
+                continue
+            if not prefer_body or v.posizione == BODY:
+                return v.p
+            best = best or v.p
+        return best
+
+    def aggiorna(self, p):
+        v = self._per_elemento.get(p._p)
+        if v is not None:
+            v.aggiorna()
+
+    def inserisci_dopo(self, rif, p):
+        """Registra ``p``, appena inserito nel documento subito dopo ``rif``."""
+        vr = self._per_elemento[rif._p]
+        v = _Voce(p, vr.posizione, vr.in_tabella)
+        self._voci.insert(self._voci.index(vr) + 1, v)
+        self._per_elemento[p._p] = v
+
+    def inserisci_in_coda_body(self, p):
+        """Registra ``p``, appena aggiunto in fondo al corpo (doc.add_paragraph)."""
+        i = 0
+        for j, v in enumerate(self._voci):
+            if v.posizione == BODY:
+                i = j + 1
+        v = _Voce(p, BODY)
+        self._voci.insert(i, v)
+        self._per_elemento[p._p] = v
+
+    def inserisci_in_testa(self, paragraphs: List):
+        """Registra i paragrafi spostati all'inizio del corpo (cover)."""
+        nuove = [_Voce(p, BODY) for p in paragraphs]
+        self._voci[0:0] = nuove
+        for v in nuove:
+            self._per_elemento[v.p._p] = v
+
+    def rimuovi(self, p):
+        v = self._per_elemento.pop(p._p, None)
+        if v is not None:
+            self._voci.remove(v)
+
+
+def doc_contains_text(doc: Document, text: str, index: Optional[DocIndex] = None) -> bool:
+    return (index or DocIndex(doc)).contiene(text)
 
 
 # -------------------- Basic mutations --------------------
-def _is_heading_like(text: str) -> bool:
+def is_heading_like(text: str) -> bool:
+    """Il testo inizia come un titolo numerato ("3 Quadri", "3. Quadri")."""
     t = (text or "").strip()
     return bool(re.match(r"^\d+(\.|)\s+", t))
 
-def _delete_paragraph(p):
+def _delete_paragraph(p, index: Optional[DocIndex] = None):
     p._element.getparent().remove(p._element)
+    if index is not None:
+        index.rimuovi(p)
 
-def _wipe_paragraph(p):
+def _wipe_paragraph(p, index: Optional[DocIndex] = None):
     for r in p.runs:
         r.text = ""
+    if index is not None:
+        index.aggiorna(p)
+
+class Replacer:
+    """Sostituzione di più insiemi di segnaposto in una sola scansione del testo.
 
-def _replace_in_paragraph(p, mapping: Dict[str, str]):
+    Le chiavi di tutti i mapping finiscono in un'unica alternanza regex
+    compilata. A parità di posizione vince la chiave con priorità più alta:
+    prima il mapping passato prima, poi la chiave più lunga (``{{CAVO_TIPO}}``
+    prima di un eventuale ``{{CAVO}}``). Il testo sostituito non viene
+    riesaminato, quindi un valore non può attivare un'altra sostituzione.
+    """
+
+    def __init__(self, *mappings: Dict[str, str]):
+        self.mapping: Dict[str, str] = {}
+        ordine = []
+        for prio, mapping in enumerate(mappings):
+            for k, v in mapping.items():
+                if k and k not in self.mapping:
+                    self.mapping[k] = v
+                    ordine.append((prio, -len(k), k))
+        ordine.sort()
+        self._re = re.compile("|".join(re.escape(k) for _, _, k in ordine)) if ordine else None
+
+    def __bool__(self) -> bool:
+        return self._re is not None
+
+    def search(self, text: str) -> bool:
+        return self._re is not None and self._re.search(text) is not None
+
+    def sub(self, text: str) -> str:
+        if self._re is None:
+            return text
+        return self._re.sub(lambda m: self.mapping[m.group(0)], text)
+
+    def finditer(self, text: str) -> Iterator[Tuple[int, int, str]]:
+        """``(inizio, fine, valore)`` delle occorrenze, come le sostituirebbe sub."""
+        if self._re is None:
+            return iter(())
+        return ((m.start(), m.end(), self.mapping[m.group(0)]) for m in self._re.finditer(text))
+
+
+_W_T = qn("w:t")
+_W_BR_TYPE = qn("w:type")
+_XML_SPACE = "{http://www.w3.org/XML/1998/namespace}space"
+# testo dei figli di w:r come Run.text (w:t a parte)
+_TESTO_FISSO = {qn("w:tab"): "\t", qn("w:ptab"): "\t", qn("w:cr"): "\n", qn("w:noBreakHyphen"): "-"}
+
+
+def _testo_figlio(e) -> str:
+    if e.tag == _W_T:
+        return e.text or ""
+    if e.tag == qn("w:br"):
+        return "\n" if e.get(_W_BR_TYPE, "textWrapping") == "textWrapping" else ""
+    return _TESTO_FISSO.get(e.tag, "")
+
+
+def sostituisci_nei_run(runs: list, replacer: Replacer) -> Optional[bool]:
+    """Sostituisce le occorrenze modificando solo i ``w:t`` che le contengono.
+
+    ``runs`` sono gli elementi ``w:r`` del paragrafo. Gli offset del testo dei
+    run (come Run.text) sono ricondotti ai nodi ``w:t`` in un solo passaggio:
+    il valore va nel primo ``w:t`` toccato dall'occorrenza (a capo e tab del
+    valore come ``w:br``/``w:tab`` subito dopo, vedi _imposta_testo), la parte
+    restante viene tolta dagli altri. Run e formattazione restano quelli del
+    template.
+    Restituisce False se non c'è nulla da sostituire e None, senza modificare
+    nulla, se un'occorrenza comprende tab o a capo (non ricostruibili nei w:t).
+    """
+    segmenti = []  # (inizio, fine, elemento, è un w:t)
+    testo = []
+    pos = 0
+    for r in runs:
+        for e in r:
+            t = _testo_figlio(e)
+            if t:
+                segmenti.append((pos, pos + len(t), e, e.tag == _W_T))
+                testo.append(t)
+                pos += len(t)
+    occorrenze_run = list(replacer.finditer("".join(testo)))
+    if not occorrenze_run:
+        return False
+    modifiche = []
+    i = 0
+    for inizio, fine, valore in occorrenze_run:
+        while segmenti[i][1] <= inizio:
+            i += 1
+        j = i
+        coinvolti = []
+        while j < len(segmenti) and segmenti[j][0] < fine:
+            coinvolti.append(segmenti[j])
+            j += 1
+        if not all(s[3] for s in coinvolti):
+            return None
+        modifiche.append((inizio, fine, valore, coinvolti))
+    # dalla fine: gli offset locali delle occorrenze precedenti restano validi
+    for inizio, fine, valore, coinvolti in reversed(modifiche):
+        for k, (s_inizio, s_fine, t, _) in enumerate(coinvolti):
+            a, b = max(inizio, s_inizio) - s_inizio, min(fine, s_fine) - s_inizio
+            vecchio = t.text or ""
+            if k == 0:
+                _imposta_testo(t, vecchio[:a] + valore + vecchio[b:])
+            else:
+                t.text = vecchio[:a] + vecchio[b:]
+            t.set(_XML_SPACE, "preserve")
+    return True
+
+
+def _replace_in_paragraph(p, mapping: Union[Dict[str, str], Replacer]) -> bool:
+    replacer = mapping if isinstance(mapping, Replacer) else Replacer(mapping)
+    runs = p._p.r_lst
+    if runs:
+        fatto = sostituisci_nei_run(runs, replacer)
+        if fatto is not None:
+            return fatto
+    # nessun run diretto, o occorrenze a cavallo di tab/a capo: il testo
+    # sostituito va tutto nel primo run
     full = "".join(r.text for r in p.runs) if p.runs else (p.text or "")
-    new = full
-    for old, newv in mapping.items():
-        if old:
-            new = new.replace(old, newv)
+    new = replacer.sub(full)
     if new != full:
         if not p.runs:
             p.text = new
@@ -206,137 +486,154 @@ def _replace_in_paragraph(p, mapping: Dict[str, str]):
             p.runs[0].text = new
             for r in p.runs[1:]:
                 r.text = ""
+        return True
+    return False
 
-def _replace_everywhere(doc: Document, mapping: Dict[str, str]):
-    for p in iter_all_paragraphs(doc):
-        _replace_in_paragraph(p, mapping)
-
-def _find_first_paragraph_containing(doc: Document, needles: List[str], prefer_body: bool = True):
-    needles_l = [n.lower() for n in needles]
-    best = None
-    for p in iter_all_paragraphs(doc):
-        tx = (p.text or "").lower()
-        if not any(n in tx for n in needles_l):
-            continue
-        # skip TOC paragraphs if possible
-        if _is_toc_paragraph(p):
+def _replace_everywhere(
+    doc: Document, mapping: Union[Dict[str, str], Replacer], index: Optional[DocIndex] = None, voci: Optional[List[_Voce]] = None
+):
+    index = index or DocIndex(doc)
+    replacer = mapping if isinstance(mapping, Replacer) else Replacer(mapping)
+    if not replacer:
+        return
+    for v in (index.voci() if voci is None else voci):
+        # il testo indicizzato evita di ricomporre i run dei paragrafi senza occorrenze
+        if not replacer.search(v.testo_run):
             continue
-        if prefer_body:
-            # Prefer real body paragraphs (not in table, not header/footer)
-            if not _is_in_table(p) and p in doc.paragraphs:
-                return p
-            best = best or p
-        else:
-            return p
-    return best
+        if _replace_in_paragraph(v.p, replacer):
+            v.aggiorna()
+
+def _find_first_paragraph_containing(doc: Document, needles: List[str], prefer_body: bool = True, index: Optional[DocIndex] = None):
+    return (index or DocIndex(doc)).trova(needles, prefer_body=prefer_body)
 
-def ensure_anchors(doc: Document) -> List[str]:
+def ensure_anchors(doc: Document, index: Optional[DocIndex] = None) -> List[str]:
     """
     Inserisce i marker nel CORPO del testo (non nell'indice/TOC).
     """
+    index = index or DocIndex(doc)
     created = []
     for key, marker in ANCHORS.items():
-        if doc_contains_text(doc, marker):
+        if index.contiene(marker):
             continue
         hints = HEADING_HINTS.get(key, [])
-        anchor_after = _find_first_paragraph_containing(doc, hints, prefer_body=True) if hints else None
+        anchor_after = index.trova(hints, prefer_body=True) if hints else None
         new_p = doc.add_paragraph(marker)
         if anchor_after is None:
+            index.inserisci_in_coda_body(new_p)
             created.append(marker)
             continue
         anchor_after._p.addnext(new_p._p)
+        index.inserisci_dopo(anchor_after, new_p)
         created.append(marker)
     return created
 
 def build_field_mapping(data: RelazioneData) -> Dict[str, str]:
     return {k: fn(data) for k, fn in FIELD_PLACEHOLDERS.items()}
 
-def _insert_bullets_after(paragraph, doc: Document, lines: List[str]):
+def _insert_bullets_after(paragraph, doc: Document, lines: List[str], index: Optional[DocIndex] = None):
     elm = paragraph._p
+    prev = paragraph
     for line in lines:
         if not line.strip():
             continue
         bp = doc.add_paragraph(line.strip(), style="List Bullet" if "List Bullet" in doc.styles else None)
         elm.addnext(bp._p)
         elm = bp._p
+        if index is not None:
+            index.inserisci_dopo(prev, bp)
+        prev = bp
 
 
 # -------------------- Section writers --------------------
-def _clear_section_after_heading_body(doc: Document, heading_any: List[str]):
+def _clear_section_after_heading_body(doc: Document, heading_any: List[str], index: Optional[DocIndex] = None):
     """Cancella paragrafi dopo il titolo NEL BODY fino al prossimo titolo numerato."""
-    title = _find_first_paragraph_containing(doc, heading_any, prefer_body=True)
+    index = index or DocIndex(doc)
+    title = index.trova(heading_any, prefer_body=True)
     if not title:
         return None
-    body_paras = list(doc.paragraphs)
-    if title not in body_paras:
+    if not index.nel_body(title):
         return title
-    idx = body_paras.index(title)
+    body_paras = [v.p for v in index.voci(BODY)]
+    idx = next(i for i, p2 in enumerate(body_paras) if p2._p is title._p)
     to_delete = []
     for p2 in body_paras[idx+1:]:
-        if _is_heading_like(p2.text):
+        if is_heading_like(p2.text):
             break
         to_delete.append(p2)
     for p2 in reversed(to_delete):
         try:
-            _delete_paragraph(p2)
+            _delete_paragraph(p2, index)
         except Exception:
             pass
     return title
 
-def write_layout(doc: Document, data: RelazioneData):
+def _add_after(doc: Document, elm, text: str, index: Optional[DocIndex], rif):
+    """Aggiunge un paragrafo subito dopo ``elm`` (paragrafo ``rif``)."""
+    par = doc.add_paragraph(text)
+    elm.addnext(par._p)
+    if index is not None:
+        index.inserisci_dopo(rif, par)
+    return par
+
+def write_layout(doc: Document, data: RelazioneData, index: Optional[DocIndex] = None):
+    index = index or DocIndex(doc)
     # prefer explicit anchor in BODY
     marker = ANCHORS["LAYOUT"]
-    p = _find_first_paragraph_containing(doc, [marker], prefer_body=True)
+    p = index.trova([marker], prefer_body=True)
     if p:
-        _wipe_paragraph(p)
+        _wipe_paragraph(p, index)
         anchor = p
     else:
-        anchor = _clear_section_after_heading_body(doc, ["LAYOUT D'IMPIANTO", "LAYOUT D’IMPIANTO"])
+        anchor = _clear_section_after_heading_body(doc, ["LAYOUT D'IMPIANTO", "LAYOUT D’IMPIANTO"], index)
         if not anchor:
             return
 
     elm = anchor._p
+    prev = anchor
     if data.layout_incluso.strip():
-        lbl = doc.add_paragraph("Incluso:")
+        lbl = _add_after(doc, elm, "Incluso:", index, prev)
         if lbl.runs: lbl.runs[0].bold = True
-        elm.addnext(lbl._p); elm = lbl._p
-        _insert_bullets_after(lbl, doc, data.layout_incluso.splitlines())
+        elm = lbl._p; prev = lbl
+        _insert_bullets_after(lbl, doc, data.layout_incluso.splitlines(), index)
     if data.layout_escluso.strip():
-        lbl2 = doc.add_paragraph("Escluso:")
+        lbl2 = _add_after(doc, elm, "Escluso:", index, prev)
         if lbl2.runs: lbl2.runs[0].bold = True
-        elm.addnext(lbl2._p); elm = lbl2._p
-        _insert_bullets_after(lbl2, doc, data.layout_escluso.splitlines())
+        elm = lbl2._p; prev = lbl2
+        _insert_bullets_after(lbl2, doc, data.layout_escluso.splitlines(), index)
 
-def write_colonnine(doc: Document, colonnine: List[ColonninaItem]):
+def write_colonnine(doc: Document, colonnine: List[ColonninaItem], index: Optional[DocIndex] = None):
+    index = index or DocIndex(doc)
     marker = ANCHORS["COLONNINE"]
-    p = _find_first_paragraph_containing(doc, [marker], prefer_body=True)
+    p = index.trova([marker], prefer_body=True)
     if not p:
         return
-    _wipe_paragraph(p)
+    _wipe_paragraph(p, index)
     if not colonnine:
         return
     lines = [f"n. {c.quantita} — {c.descrizione}" for c in colonnine]
-    _insert_bullets_after(p, doc, lines)
+    _insert_bullets_after(p, doc, lines, index)
 
-def write_ditta_esecutrice(doc: Document, esecutrice: EsecutriceData):
+def write_ditta_esecutrice(doc: Document, esecutrice: EsecutriceData, index: Optional[DocIndex] = None):
+    index = index or DocIndex(doc)
     marker = ANCHORS["DITTA_ESECUTRICE"]
-    p = _find_first_paragraph_containing(doc, [marker], prefer_body=True)
+    p = index.trova([marker], prefer_body=True)
     if not p:
         return
-    _wipe_paragraph(p)
+    _wipe_paragraph(p, index)
     lines = []
     if esecutrice.nome.strip(): lines.append(esecutrice.nome.strip())
     if esecutrice.indirizzo.strip(): lines.append(esecutrice.indirizzo.strip())
     if esecutrice.piva.strip(): lines.append(f"P.IVA: {esecutrice.piva.strip()}")
     if lines:
-        _insert_bullets_after(p, doc, lines)
+        _insert_bullets_after(p, doc, lines, index)
 
-def write_foto(doc: Document, photos: List[PhotoItem]):
+def write_foto(doc: Document, photos: List[PhotoItem], index: Optional[DocIndex] = None, dpi: Optional[int] = DPI):
+    index = index or DocIndex(doc)
     marker = ANCHORS["FOTO"]
-    p = _find_first_paragraph_containing(doc, [marker], prefer_body=True)
+    p = index.trova([marker], prefer_body=True)
     if not p or not photos:
         return
-    _wipe_paragraph(p)
+    _wipe_paragraph(p, index)
     cols = 2
     rows = (len(photos)+cols-1)//cols
     table = doc.add_table(rows=rows, cols=cols)
@@ -351,7 +648,7 @@ def write_foto(doc: Document, photos: List[PhotoItem]):
             item = photos[idx]
             par = cell.paragraphs[0]
             run = par.add_run()
-            run.add_picture(io.BytesIO(item.content), width=Inches(3.2))
+            run.add_picture(io.BytesIO(per_docx(item.content, Inches(3.2), dpi)), width=Inches(3.2))
             if item.caption.strip():
                 cap = cell.add_paragraph(item.caption.strip())
                 try:
@@ -359,28 +656,153 @@ def write_foto(doc: Document, photos: List[PhotoItem]):
                 except Exception:
                     pass
             idx += 1
+    # le celle della griglia (immagini e didascalie) non vengono indicizzate:
+    # nessun marker può trovarsi lì
     p._p.addnext(table._tbl)
 
-def write_diagramma(doc: Document, diagram_bytes: Optional[bytes]):
+def write_diagramma(doc: Document, diagram_bytes: Optional[bytes], index: Optional[DocIndex] = None, dpi: Optional[int] = DPI):
+    index = index or DocIndex(doc)
     marker = ANCHORS["DIAGRAMMA"]
-    p = _find_first_paragraph_containing(doc, [marker], prefer_body=True)
+    p = index.trova([marker], prefer_body=True)
     if not p or not diagram_bytes:
         return
-    _wipe_paragraph(p)
-    p.add_run().add_picture(io.BytesIO(diagram_bytes), width=Inches(6.5))
+    _wipe_paragraph(p, index)
+    p.add_run().add_picture(io.BytesIO(per_docx(diagram_bytes, Inches(6.5), dpi)), width=Inches(6.5))
 
-def write_allegati(doc: Document, allegati: List[AllegatoItem]):
+def write_allegati(doc: Document, allegati: List[AllegatoItem], index: Optional[DocIndex] = None):
+    index = index or DocIndex(doc)
     marker = ANCHORS["ALLEGATI"]
-    p = _find_first_paragraph_containing(doc, [marker], prefer_body=True)
+    p = index.trova([marker], prefer_body=True)
     if not p or not allegati:
         return
-    _wipe_paragraph(p)
+    _wipe_paragraph(p, index)
     lines = [a.filename for a in allegati]
-    _insert_bullets_after(p, doc, lines)
+    _insert_bullets_after(p, doc, lines, index)
+
+
+# -------------------- Tabelle quadri / linee --------------------
+# Le righe sono quelle del payload PDF (relazione.costruisci_payload: "quadri"
+# e "linee"). La tabella è costruita direttamente in XML copiando per ogni
+# record una riga modello già pronta, invece di add_row()/cell() per cella
+# (che riscorrono la tabella a ogni chiamata: quadratico su migliaia di righe).
+# Le colonne (documento.QUADRI_COLONNE / LINEE_COLONNE) sono le stesse del PDF.
+TABLE_ANCHORS = {
+    "QUADRI": "{{TABELLA_QUADRI}}",
+    "LINEE": "{{TABELLA_LINEE}}",
+}
+
+TABLE_HEADING_HINTS = {
+    "QUADRI": ["QUADRI ELETTRICI"],
+    "LINEE": ["ELENCO CIRCUITI", "CIRCUITI, CAVI E PROTEZIONI", "QUADRI ELETTRICI"],
+}
+
+_XML_NON_VALIDI = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+_A_CAPO_TAB = re.compile("([\n\t])")
+
+
+def _imposta_testo(t, v):
+    """Testo del ``w:t``; come Run.text, "\\n" e "\\t" diventano ``w:br`` e ``w:tab`` subito dopo di esso."""
+    testo = _XML_NON_VALIDI.sub("", "" if v is None else str(v))
+    if "\n" not in testo and "\t" not in testo:
+        t.text = testo
+        return
+    parti = _A_CAPO_TAB.split(testo)
+    t.text = parti[0]
+    ultimo = t
+    for separatore, parte in zip(parti[1::2], parti[2::2]):
+        e = t.makeelement(qn("w:br") if separatore == "\n" else qn("w:tab"), {})
+        ultimo.addnext(e)
+        ultimo = e
+        if parte:
+            nuovo = t.makeelement(_W_T, {_XML_SPACE: "preserve"})
+            nuovo.text = parte
+            ultimo.addnext(nuovo)
+            ultimo = nuovo
+
+
+def xml_tabella(colonne, righe: List[Dict], larghezza: int, style_id: Optional[str] = None, dopo=None):
+    """Elemento ``w:tbl`` con intestazione (ripetuta su ogni pagina) e una riga per record.
+
+    ``larghezza`` in EMU (larghezza utile della pagina), ripartita tra le
+    colonne secondo i pesi di ``colonne``. Ogni riga è una copia della riga
+    modello con i soli ``w:t`` da riempire. Con ``dopo`` la tabella vuota
+    viene inserita subito dopo quell'elemento e le righe sono copiate già nel
+    documento: spostarvi poi l'intera tabella costerebbe più che costruirla.
+    """
+    from docx.oxml.ns import nsdecls
+    from docx.oxml.parser import parse_xml
+
+    totale = sum(c[2] for c in colonne)
+    twips = [int(larghezza / 635 * c[2] / totale) for c in colonne]  # 635 EMU = 1 twip
+    stile = f'<w:tblStyle w:val="{style_id}"/>' if style_id else ""
+    griglia = "".join(f'<w:gridCol w:w="{w}"/>' for w in twips)
+
+    def riga(intestazione: bool) -> str:
+        celle = []
+        for w in twips:
+            shd = '<w:shd w:val="clear" w:color="auto" w:fill="F5F5F5"/>' if intestazione else ""
+            grassetto = "<w:b/>" if intestazione else ""
+            celle.append(
+                f'<w:tc><w:tcPr><w:tcW w:w="{w}" w:type="dxa"/>{shd}</w:tcPr>'
+                f'<w:p><w:r><w:rPr>{grassetto}<w:sz w:val="18"/></w:rPr><w:t xml:space="preserve"/></w:r></w:p></w:tc>'
+            )
+        trpr = "<w:trPr><w:tblHeader/></w:trPr>" if intestazione else "<w:trPr><w:cantSplit/></w:trPr>"
+        return f"<w:tr>{trpr}{''.join(celle)}</w:tr>"
+
+    tbl = parse_xml(
+        f"<w:tbl {nsdecls('w')}><w:tblPr>{stile}"
+        '<w:tblW w:w="0" w:type="auto"/><w:tblLayout w:type="fixed"/>'
+        f'<w:tblLook w:val="04A0"/></w:tblPr><w:tblGrid>{griglia}</w:tblGrid>'
+        f"{riga(True)}{riga(False)}</w:tbl>"
+    )
+    intestazione, modello = tbl.findall(qn("w:tr"))
+    for t, c in zip(intestazione.iter(qn("w:t")), colonne):
+        _imposta_testo(t, c[0])
+    tbl.remove(modello)
+    if dopo is not None:
+        dopo.addnext(tbl)
+
+    estrattori = [c[1] if callable(c[1]) else (lambda r, k=c[1]: r.get(k, "")) for c in colonne]
+    tag_t = qn("w:t")
+    for r in righe:
+        tr = copy.deepcopy(modello)
+        for t, f in zip(list(tr.iter(tag_t)), estrattori):
+            _imposta_testo(t, f(r))
+        tbl.append(tr)
+    return tbl
+
+
+def _write_tabella(doc: Document, chiave: str, colonne, righe: List[Dict], index: Optional[DocIndex]):
+    index = index or DocIndex(doc)
+    if not righe:
+        return None
+    p = index.trova([TABLE_ANCHORS[chiave]], prefer_body=True)
+    if p is not None:
+        _wipe_paragraph(p, index)
+    else:
+        p = index.trova(TABLE_HEADING_HINTS[chiave], prefer_body=True)
+        if p is None or not index.nel_body(p):
+            return None
+    try:
+        style_id = doc.styles.get_style_id("Table Grid", WD_STYLE_TYPE.TABLE)
+    except (KeyError, ValueError):
+        style_id = None
+    # come per la griglia foto, le celle non vengono indicizzate
+    return xml_tabella(colonne, righe, doc._block_width, style_id, dopo=p._p)
+
+
+def write_quadri(doc: Document, quadri: List[Dict], index: Optional[DocIndex] = None):
+    """Tabella dei quadri al marker {{TABELLA_QUADRI}} (o dopo il titolo QUADRI ELETTRICI)."""
+    return _write_tabella(doc, "QUADRI", QUADRI_COLONNE, quadri, index)
+
+
+def write_linee(doc: Document, linee: List[Dict], index: Optional[DocIndex] = None):
+    """Tabella dei circuiti al marker {{TABELLA_LINEE}} (o dopo il titolo più vicino)."""
+    return _write_tabella(doc, "LINEE", LINEE_COLONNE, linee, index)
 
 
 # -------------------- Cover writer --------------------
-def insert_cover(doc: Document, data: RelazioneData, progettista: ProgettistaData, esecutrice: Optional[EsecutriceData] = None):
+def insert_cover(doc: Document, data: RelazioneData, progettista: ProgettistaData, esecutrice: Optional[EsecutriceData] = None, index: Optional[DocIndex] = None):
     body = doc._body._element
 
     def add_par(text: str, size: int, bold: bool, align: str):
@@ -439,12 +861,314 @@ def insert_cover(doc: Document, data: RelazioneData, progettista: ProgettistaDat
         body.remove(e)
     for e in reversed(elems):
         body.insert(0, e)
+    if index is not None:
+        index.inserisci_in_testa([Paragraph(e, doc._body) for e in elems])
+
+
+# -------------------- Manifest del template --------------------
+# Cosa generate_document sostituirà nel template: marker, segnaposto {{...}},
+# campi "aggiungere ..." (extra_fields) e frasi campione, con il paragrafo in
+# cui si trovano. Estratto una volta per template e salvato in
+# templates/.manifest/<sha1>.json: TemplateRegistry lo rilegge preparando il
+# template, manifest_template lo restituisce senza aprire il documento a chi
+# deve solo sapere quali campi servono (batch_docx.py --campi). Alzare
+# MANIFEST_VERSIONE se cambia l'estrazione o l'ordine dell'indice.
+MANIFEST_VERSIONE = 1
+MANIFEST_DIR = ".manifest"
+
+_RE_SEGNAPOSTO = re.compile(r"\{\{[A-Z0-9_]+\}\}")
+# il campo prosegue fino a virgolette o punteggiatura: "aggiungere potenza disponibile”"
+_RE_AGGIUNGERE = re.compile(r"aggiungere\b[^“”\"«».;:\n]*", re.IGNORECASE)
+SAMPLE_TEXT_KEYS = tuple(SAMPLE_TEXT_MAPPING(RelazioneData("", "", "", "", "")))
+_RE_CAMPIONE = re.compile("|".join(re.escape(k) for k in sorted(SAMPLE_TEXT_KEYS, key=len, reverse=True)))
+# filtro veloce sul testo indicizzato, prima di leggere i run (anche per docx_stream)
+RE_CANDIDATO = re.compile(f"{_RE_SEGNAPOSTO.pattern}|aggiungere|{_RE_CAMPIONE.pattern}", re.IGNORECASE)
+
+
+@dataclass
+class VoceManifest:
+    tipo: str  # "ancora" | "segnaposto" | "aggiungere" | "campione"
+    testo: str
+    parte: str  # es. "word/document.xml", "word/header1.xml"
+    posizione: str  # BODY | TABLE | HEADER_FOOTER
+    paragrafo: int  # posizione nell'indice (DocIndex.voci()) del template preparato
+    spezzato: bool  # il testo attraversa più run
+
+
+@dataclass
+class TemplateManifest:
+    sha1: str
+    voci: List[VoceManifest] = field(default_factory=list)
+    versione: int = MANIFEST_VERSIONE
+
+    def paragrafi(self) -> List[int]:
+        return sorted({v.paragrafo for v in self.voci})
+
+    def campi(self) -> Dict[str, List[str]]:
+        """Testi distinti per tipo, nell'ordine del documento (es. per mostrare solo i campi usati)."""
+        campi: Dict[str, List[str]] = {}
+        for v in self.voci:
+            elenco = campi.setdefault(v.tipo, [])
+            if v.testo not in elenco:
+                elenco.append(v.testo)
+        return campi
+
+    def campi_relazione(self) -> List[str]:
+        """Campi di RelazioneData richiesti dai segnaposto {{...}} del template."""
+        campi = {v.testo for v in self.voci if v.tipo == "segnaposto"}
+        return [k[2:-2].lower() for k in FIELD_PLACEHOLDERS if k in campi]
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, d: Dict) -> "TemplateManifest":
+        return cls(d["sha1"], [VoceManifest(**v) for v in d["voci"]], d.get("versione", 0))
+
+
+def occorrenze(testi_run: List[str]) -> List[Tuple[str, str, bool]]:
+    """``(tipo, testo, spezzato)`` per ogni segnaposto nel testo dei run ``testi_run``.
+
+    Stesso testo su cui lavora _replace_in_paragraph (solo i run diretti).
+    """
+    testo = "".join(testi_run)
+    if not testo:
+        return []
+    fine_run = []
+    n = 0
+    for t in testi_run:
+        n += len(t)
+        fine_run.append(n)
+    ancore = set(ANCHORS.values()) | set(TABLE_ANCHORS.values())
+    trovate = []
+    for tipo, rx in (("segnaposto", _RE_SEGNAPOSTO), ("aggiungere", _RE_AGGIUNGERE), ("campione", _RE_CAMPIONE)):
+        for m in rx.finditer(testo):
+            s = m.group(0).rstrip()
+            inizio, fine = m.start(), m.start() + len(s)
+            spezzato = bisect.bisect_right(fine_run, inizio) != bisect.bisect_right(fine_run, fine - 1)
+            trovate.append(("ancora" if s in ancore else tipo, s, spezzato))
+    return trovate
+
+
+def estrai_manifest(doc: Document, index: Optional[DocIndex] = None, sha1: str = "") -> TemplateManifest:
+    index = index or DocIndex(doc)
+    voci = []
+    for i, v in enumerate(index.voci()):
+        if not RE_CANDIDATO.search(v.testo_run):
+            continue
+        runs = v.p.runs
+        for tipo, testo, spezzato in occorrenze([r.text for r in runs] if runs else [v.testo_run]):
+            voci.append(VoceManifest(tipo, testo, str(v.p.part.partname).lstrip("/"), v.posizione, i, spezzato))
+    return TemplateManifest(sha1, voci)
+
+
+def _leggi_manifest(cartella: Path, sha1: str) -> Optional[TemplateManifest]:
+    """Manifest salvato per il template ``sha1``; None se manca, è illeggibile o di un'altra versione."""
+    try:
+        d = json.loads((cartella / f"{sha1}.json").read_text(encoding="utf-8"))
+        if d.get("versione") == MANIFEST_VERSIONE and d.get("sha1") == sha1:
+            return TemplateManifest.from_dict(d)
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return None
+
+
+def _scrivi_manifest(cartella: Path, manifest: TemplateManifest) -> None:
+    # errori di scrittura (es. cartella in sola lettura) ignorati: il manifest sarà riestratto
+    f = cartella / f"{manifest.sha1}.json"
+    try:
+        f.parent.mkdir(parents=True, exist_ok=True)
+        tmp = f.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(manifest.to_dict(), ensure_ascii=False, indent=1), encoding="utf-8")
+        os.replace(tmp, f)
+    except OSError:
+        pass
+
+
+def _manifest_valido(manifest: TemplateManifest, index: DocIndex) -> bool:
+    """Ogni voce è ancora nel paragrafo indicato (indice costruito da una versione diversa del codice?)."""
+    voci = index.voci()
+    return all(v.paragrafo < len(voci) and v.testo in voci[v.paragrafo].testo_run for v in manifest.voci)
+
+
+def manifest_template(template: Union[bytes, Path]) -> TemplateManifest:
+    """Manifest del template: dal file salvato se c'è, altrimenti preparando il template (che lo salva)."""
+    raw = TemplateRegistry._contenuto(template)
+    return _leggi_manifest(TEMPLATES.cartella_manifest, hashlib.sha1(raw).hexdigest()) or TEMPLATES.manifest(raw)
+
+
+# -------------------- Template cache --------------------
+_CT_DOTX = b"application/vnd.openxmlformats-officedocument.wordprocessingml.template.main+xml"
+_CT_DOCX = b"application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"
+
+
+def come_documento(raw: bytes) -> bytes:
+    """Un modello Word (.dotx) come .docx: cambia solo il content type della parte principale.
+
+    È quello che fa Word con "Nuovo da modello"; python-docx altrimenti rifiuta
+    il file. Gli altri pacchetti sono restituiti invariati.
+    """
+    with zipfile.ZipFile(io.BytesIO(raw)) as zin:
+        ct = zin.read("[Content_Types].xml")
+        if _CT_DOTX not in ct:
+            return raw
+        out = io.BytesIO()
+        with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as zout:
+            for info in zin.infolist():
+                dati = ct.replace(_CT_DOTX, _CT_DOCX) if info.filename == "[Content_Types].xml" else zin.read(info)
+                zout.writestr(info, dati)
+    return out.getvalue()
+
+
+TEMPLATES_DIR = Path(__file__).resolve().parent / "templates"
+
+
+@dataclass
+class _Istantanea:
+    """Parti, relazioni e indice di un documento preparato, senza zip né XML da rileggere."""
+    parts: List[tuple]  # (partname, content_type, classe, elemento XML | None, blob | None)
+    rels: List[tuple]  # (sorgente | "/", reltype, target partname | URL, rId, esterna)
+    voci: List[tuple]  # (partname, ordinale del w:p nella parte, _Voce)
+    manifest: Optional["TemplateManifest"] = None
+
+
+def _paragrafi_xml(part) -> list:
+    return list(part.element.iter(qn("w:p")))
+
+
+def _istantanea(doc: Document, index: DocIndex) -> _Istantanea:
+    package = doc.part.package
+    parts, rels = [], []
+    for part in package.iter_parts():
+        if isinstance(part, XmlPart):
+            parts.append((part.partname, part.content_type, type(part), part.element, None))
+        else:
+            parts.append((part.partname, part.content_type, type(part), None, part.blob))
+    for sorgente, rs in [("/", package.rels)] + [(part.partname, part.rels) for part in package.iter_parts()]:
+        for rel in rs.values():
+            target = rel.target_ref if rel.is_external else rel.target_part.partname
+            rels.append((sorgente, rel.reltype, target, rel.rId, rel.is_external))
+    # le voci dell'indice sono ritrovate nella copia per posizione del w:p nella parte
+    ordinali: Dict[str, Dict[object, int]] = {}
+    voci = []
+    for v in index.voci():
+        partname = v.p.part.partname
+        if partname not in ordinali:
+            ordinali[partname] = {el: i for i, el in enumerate(_paragrafi_xml(v.p.part))}
+        voci.append((partname, ordinali[partname][v.p._p], v))
+    return _Istantanea(parts, rels, voci)
+
+
+def _da_istantanea(ist: _Istantanea) -> Tuple[Document, DocIndex]:
+    # come docx.opc.package.Unmarshaller, ma gli XML sono copiati (deepcopy lxml)
+    # invece che riletti dallo zip; i blob binari (immagini) sono condivisi
+    package = DocxPackage()
+    parts = {}
+    for partname, content_type, cls, element, blob in ist.parts:
+        if element is not None:
+            parts[partname] = cls(partname, content_type, copy.deepcopy(element), package)
+        else:
+            parts[partname] = cls.load(partname, content_type, blob, package)
+    for sorgente, reltype, target, rId, esterna in ist.rels:
+        src = package if sorgente == "/" else parts[sorgente]
+        src.load_rel(reltype, target if esterna else parts[target], rId, esterna)
+    for part in parts.values():
+        part.after_unmarshal()
+    package.after_unmarshal()
+    doc = package.main_document_part.document
+    # il parent di un Paragraph serve solo a risalire alla parte (immagini, stili):
+    # la parte stessa basta come parent
+    elementi = {}
+    voci = []
+    for partname, i, v in ist.voci:
+        if partname not in elementi:
+            elementi[partname] = _paragrafi_xml(parts[partname])
+        voci.append(v.copia(Paragraph(elementi[partname][i], parts[partname])))
+    index = DocIndex._da_voci(doc, voci)
+    if ist.manifest is not None:
+        index._da_sostituire = [voci[i] for i in ist.manifest.paragrafi()]
+    return doc, index
+
+
+class TemplateRegistry:
+    """Template DOCX già aperti e ancorati, indicizzati per hash del contenuto.
+
+    Ogni template viene scompattato, letto da python-docx e passato a
+    ensure_anchors una volta sola; la cache tiene le parti XML già parse e
+    l'indice dei paragrafi. Ogni generazione riceve un documento nuovo
+    costruito copiando quegli alberi, con il suo indice (clona), che può
+    modificare liberamente. Tiene al massimo ``max_templates`` template (LRU).
+    Il manifest dei segnaposto è letto da ``cartella_manifest`` (per hash del
+    template) ed estratto e salvato lì solo la prima volta.
+    """
+
+    def __init__(self, max_templates: int = 8, cartella_manifest: Union[str, Path] = TEMPLATES_DIR / MANIFEST_DIR):
+        self.max_templates = max_templates
+        self.cartella_manifest = Path(cartella_manifest)
+        self._preparati: "OrderedDict[str, _Istantanea]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _contenuto(template: Union[bytes, Path]) -> bytes:
+        if isinstance(template, (bytes, bytearray)):
+            return bytes(template)
+        return Path(template).read_bytes()
+
+    def _preparato(self, raw: bytes) -> _Istantanea:
+        chiave = hashlib.sha1(raw).hexdigest()
+        with self._lock:
+            ist = self._preparati.get(chiave)
+            if ist is not None:
+                self._preparati.move_to_end(chiave)
+                return ist
+        # immagini del template (es. logo) ridotte una volta alla dimensione mostrata
+        doc = Document(io.BytesIO(riduci_media(come_documento(raw))))
+        index = DocIndex(doc)
+        ensure_anchors(doc, index)
+        ist = _istantanea(doc, index)
+        manifest = _leggi_manifest(self.cartella_manifest, chiave)
+        if manifest is None or not _manifest_valido(manifest, index):
+            manifest = estrai_manifest(doc, index, chiave)
+            _scrivi_manifest(self.cartella_manifest, manifest)
+        ist.manifest = manifest
+        with self._lock:
+            self._preparati[chiave] = ist
+            while len(self._preparati) > self.max_templates:
+                self._preparati.popitem(last=False)
+        return ist
+
+    def clona(self, template: Union[bytes, Path]) -> Tuple[Document, DocIndex]:
+        """Documento nuovo dal template preparato e il suo indice, pronti per generate_document."""
+        return _da_istantanea(self._preparato(self._contenuto(template)))
+
+    def precarica(self, templates: Optional[Iterable[Union[bytes, Path]]] = None) -> int:
+        """Prepara ``templates`` (default: i .docx e .dotx di templates/), es. all'avvio di un worker.
+
+        Restituisce quanti template sono stati preparati.
+        """
+        if templates is None:
+            templates = sorted(f for f in TEMPLATES_DIR.iterdir() if f.suffix.lower() in (".docx", ".dotx"))
+        n = 0
+        for template in templates:
+            self._preparato(self._contenuto(template))
+            n += 1
+        return n
+
+    def manifest(self, template: Union[bytes, Path]) -> "TemplateManifest":
+        """Manifest del template preparato (paragrafi nell'ordine dell'indice di clona)."""
+        return self._preparato(self._contenuto(template)).manifest
+
+    def svuota(self):
+        with self._lock:
+            self._preparati.clear()
+
+
+TEMPLATES = TemplateRegistry()
 
 
 # -------------------- Main API --------------------
 def prepare_template(template: Union[bytes, Path]) -> bytes:
-    doc = Document(io.BytesIO(template) if isinstance(template, (bytes, bytearray)) else str(template))
-    ensure_anchors(doc)
+    doc, _ = TEMPLATES.clona(template)
     out = io.BytesIO()
     doc.save(out)
     return out.getvalue()
@@ -459,40 +1183,48 @@ def generate_document(
     diagram_bytes: Optional[bytes],
     allegati: List[AllegatoItem],
     extra_fields: Optional[Dict[str, str]] = None,
+    dpi_immagini: Optional[int] = DPI,
+    quadri: Optional[List[Dict]] = None,
+    linee: Optional[List[Dict]] = None,
 ) -> bytes:
-    doc = Document(io.BytesIO(template) if isinstance(template, (bytes, bytearray)) else str(template))
-
-    # 1) anchors in body
-    ensure_anchors(doc)
-
-    # 2) replace placeholders if present
-    _replace_everywhere(doc, build_field_mapping(data))
-
-    # 3) also replace common static strings (template originale)
-    _replace_everywhere(doc, SAMPLE_TEXT_MAPPING(data))
-
-    # 4) cover
-    # 2b) sostituzione campi 'aggiungere XXX' (template-driven)
-    if extra_fields:
+    # foto e diagramma sono ricampionati a ``dpi_immagini`` (None: byte originali);
+    # le immagini del template sono ridotte una volta sola, alla preparazione
+    # template già letto, ancorato e indicizzato dalla cache: qui solo una copia;
+    # l'indice dei paragrafi viene poi aggiornato dai writer
+    doc, index = TEMPLATES.clona(template)
+
+    # 1) anchors in body (già presenti nel template preparato)
+    ensure_anchors(doc, index)
+
+    # 2) placeholder {{...}}, 3) frasi campione del template originale e
+    # 2b) campi 'aggiungere XXX' (template-driven): un solo passaggio, in
+    # quest'ordine di priorità
+    extra_mapping = {}
+    for label, value in (extra_fields or {}).items():
         # sostituisci sia 'aggiungere XXX' che eventuali 'AGGIUNGERE XXX'
-        mapping = {}
-        for label, value in extra_fields.items():
-            token = f"aggiungere {label}".strip()
-            mapping[token] = value
-            mapping[token.capitalize()] = value
-            mapping[token.upper()] = value
-        _replace_everywhere(doc, mapping)
+        token = f"aggiungere {label}".strip()
+        extra_mapping[token] = value
+        extra_mapping[token.capitalize()] = value
+        extra_mapping[token.upper()] = value
+    # solo i paragrafi che il manifest del template indica come interessati
+    replacer = Replacer(build_field_mapping(data), SAMPLE_TEXT_MAPPING(data), extra_mapping)
+    _replace_everywhere(doc, replacer, index, index.voci_da_sostituire())
 
-    insert_cover(doc, data, progettista, esecutrice)
+    # 4) cover
+    insert_cover(doc, data, progettista, esecutrice, index)
 
     # 5) sections (in BODY, not TOC)
     if esecutrice:
-        write_ditta_esecutrice(doc, esecutrice)
-    write_layout(doc, data)
-    write_colonnine(doc, colonnine)
-    write_foto(doc, photos)
-    write_diagramma(doc, diagram_bytes)
-    write_allegati(doc, allegati)
+        write_ditta_esecutrice(doc, esecutrice, index)
+    write_layout(doc, data, index)
+    write_colonnine(doc, colonnine, index)
+    write_foto(doc, photos, index, dpi_immagini)
+    write_diagramma(doc, diagram_bytes, index, dpi_immagini)
+    write_allegati(doc, allegati, index)
+    # senza marker entrambe le tabelle possono finire dopo lo stesso titolo:
+    # le linee per prime, così i quadri le precedono
+    write_linee(doc, linee or [], index)
+    write_quadri(doc, quadri or [], index)
 
     out = io.BytesIO()
     doc.save(out)
@@ -0,0 +1,166 @@
+"""Immagini per i DOCX: ricampionamento alla dimensione di stampa.
+
+Le foto caricate arrivano spesso a piena risoluzione (4000 px e più) ma nella
+relazione occupano 3,2 pollici: per_docx le riduce alla larghezza di stampa
+alla risoluzione ``dpi`` e tiene in cache il risultato per hash del contenuto,
+così la stessa foto usata più volte (o in più documenti dello stesso processo)
+viene elaborata una volta sola e produce sempre gli stessi byte: i backend DOCX
+riusano la parte immagine già presente con lo stesso sha1.
+
+riduci_media fa lo stesso per le immagini già contenute nel template (es. il
+logo nell'intestazione), in base alla dimensione con cui vi compaiono.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import posixpath
+import threading
+import zipfile
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+DPI = 200
+EMU_PER_POLLICE = 914400
+QUALITA_JPEG = 85
+
+# formati che possiamo riscrivere; gli altri (EMF, WMF, SVG, ...) restano com'erano
+_FORMATI = {"JPEG", "PNG", "BMP", "TIFF", "GIF"}
+_MAX_CACHE = 128
+
+_cache: "OrderedDict[Tuple[str, int, int, bool], bytes]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def _ricampiona(blob: bytes, larghezza_px: int, dpi: int, stesso_formato: bool) -> bytes:
+    from PIL import Image
+
+    try:
+        im = Image.open(io.BytesIO(blob))
+        formato = im.format
+        if formato not in _FORMATI or getattr(im, "is_animated", False):
+            return blob
+        if im.width <= larghezza_px and (stesso_formato or formato in ("JPEG", "PNG")):
+            return blob
+        if stesso_formato and formato not in ("JPEG", "PNG"):
+            return blob
+        # EXIF e profilo colore restano: l'orientamento mostrato da Word non cambia
+        extra = {k: im.info[k] for k in ("icc_profile", "exif") if im.info.get(k)}
+        if im.width > larghezza_px:
+            altezza_px = max(1, round(im.height * larghezza_px / im.width))
+            im.draft(im.mode, (larghezza_px, altezza_px))  # JPEG: decodifica già ridotta
+            if im.mode == "P":
+                im = im.convert("RGBA" if "transparency" in im.info else "RGB")
+            im = im.resize((larghezza_px, altezza_px), Image.LANCZOS)
+        out = io.BytesIO()
+        if formato == "JPEG":
+            im.save(out, "JPEG", quality=QUALITA_JPEG, optimize=True, dpi=(dpi, dpi), **extra)
+        else:
+            # BMP/TIFF/GIF diventano PNG (le foto nuove prendono l'estensione dal formato)
+            if im.mode not in ("1", "L", "LA", "RGB", "RGBA", "P"):
+                im = im.convert("RGBA" if "A" in im.mode else "RGB")
+            im.save(out, "PNG", dpi=(dpi, dpi), **extra)
+    except Exception:
+        # immagine non leggibile da Pillow: la lasciamo a python-docx così com'è
+        return blob
+    ridotta = out.getvalue()
+    return ridotta if len(ridotta) < len(blob) else blob
+
+
+def per_docx(blob: bytes, larghezza_emu: int, dpi: Optional[int] = DPI, stesso_formato: bool = False) -> bytes:
+    """Immagine pronta per essere inserita larga ``larghezza_emu`` (es. ``Inches(3.2)``).
+
+    Ridotta a ``larghezza_emu / 914400 * dpi`` pixel se più grande (mai
+    ingrandita), altrimenti restituita invariata; ``dpi=None`` disattiva il
+    ricampionamento. Con ``stesso_formato`` il formato non cambia (immagini del
+    template, con nome ed estensione già fissati).
+    """
+    if not dpi or not blob:
+        return blob
+    larghezza_px = max(1, round(int(larghezza_emu) * dpi / EMU_PER_POLLICE))
+    chiave = (hashlib.sha1(blob).hexdigest(), larghezza_px, dpi, stesso_formato)
+    with _lock:
+        hit = _cache.get(chiave)
+        if hit is not None:
+            _cache.move_to_end(chiave)
+            return hit
+    out = _ricampiona(blob, larghezza_px, dpi, stesso_formato)
+    with _lock:
+        _cache[chiave] = out
+        while len(_cache) > _MAX_CACHE:
+            _cache.popitem(last=False)
+    return out
+
+
+# -------------------- Immagini del template --------------------
+_NS = {
+    "a": "http://schemas.openxmlformats.org/drawingml/2006/main",
+    "wp": "http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing",
+    "rel": "http://schemas.openxmlformats.org/package/2006/relationships",
+}
+_R_EMBED = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}embed"
+_RT_IMAGE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/image"
+
+
+def _rels_di(nome: str) -> str:
+    cartella, base = posixpath.split(nome)
+    return posixpath.join(cartella, "_rels", base + ".rels")
+
+
+def _larghezze_media(zin: zipfile.ZipFile) -> Dict[str, int]:
+    """Per ogni immagine del pacchetto, la larghezza massima (EMU) con cui compare."""
+    from lxml import etree
+
+    nomi = set(zin.namelist())
+    larghezze: Dict[str, int] = {}
+    for nome in nomi:
+        if not nome.endswith(".xml") or _rels_di(nome) not in nomi:
+            continue
+        immagini = {}
+        for rel in etree.fromstring(zin.read(_rels_di(nome))).iterfind("rel:Relationship", _NS):
+            if rel.get("Type") == _RT_IMAGE and rel.get("TargetMode") != "External":
+                target = posixpath.normpath(posixpath.join(posixpath.dirname(nome), rel.get("Target")))
+                immagini[rel.get("Id")] = target.lstrip("/")
+        if not immagini:
+            continue
+        root = etree.fromstring(zin.read(nome))
+        for disegno in root.xpath(".//wp:inline | .//wp:anchor", namespaces=_NS):
+            extent = disegno.find("wp:extent", _NS)
+            if extent is None:
+                continue
+            cx = int(extent.get("cx", "0"))
+            for blip in disegno.iterfind(".//a:blip", _NS):
+                target = immagini.get(blip.get(_R_EMBED))
+                if target:
+                    larghezze[target] = max(larghezze.get(target, 0), cx)
+    return larghezze
+
+
+def riduci_media(raw: bytes, dpi: Optional[int] = DPI) -> bytes:
+    """Template .docx con le immagini ridotte alla dimensione con cui sono mostrate.
+
+    Le immagini mai referenziate da un disegno, quelle già abbastanza piccole e
+    i formati diversi da JPEG/PNG restano invariati; se nulla cambia
+    restituisce ``raw`` stesso.
+    """
+    if not dpi:
+        return raw
+    with zipfile.ZipFile(io.BytesIO(raw)) as zin:
+        if not any(n.startswith("word/media/") for n in zin.namelist()):
+            return raw
+        nuove = {}
+        for nome, cx in _larghezze_media(zin).items():
+            if cx <= 0 or nome not in zin.NameToInfo:
+                continue
+            blob = zin.read(nome)
+            ridotta = per_docx(blob, cx, dpi, stesso_formato=True)
+            if ridotta != blob:
+                nuove[nome] = ridotta
+        if not nuove:
+            return raw
+        out = io.BytesIO()
+        with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as zout:
+            for info in zin.infolist():
+                zout.writestr(info, nuove.get(info.filename) or zin.read(info.filename))
+    return out.getvalue()
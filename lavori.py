@@ -0,0 +1,426 @@
+"""Generazione della relazione in background, con avanzamento e annullamento.
+
+GestoreLavori riceve i dati di progetto (relazione.DEFAULTS) e restituisce
+subito un Lavoro con un id; l'app ne legge lo stato a intervalli (fragment
+con ``run_every``) senza bloccare il proprio thread. Payload, documento e
+file vengono costruiti dal worker. L'avanzamento arriva dalle callback dei
+renderer (blocchi impaginati e pagine chiuse, vedi documento.Avanzamento);
+la stessa callback controlla la richiesta di annullamento e interrompe il
+build sollevando LavoroAnnullato.
+
+Un gestore serve tutte le sessioni del processo (nell'app è una
+``st.cache_resource``). I lavori non vanno direttamente al pool: ogni utente
+ha la sua coda (al più ``max_in_coda`` lavori in attesa) e un posto libero
+nel pool va all'utente successivo a turno, così chi accoda molte relazioni
+non fa aspettare gli altri.
+
+Con ``processi=True`` i worker sono processi avviati subito e già caldi
+(documento.riscalda: renderer, stili, font e decoder immagini già esercitati):
+il rendering, che è Python puro sotto GIL, non rallenta i rerun delle altre
+sessioni. Progetto e immagini arrivano al worker come file in una cartella
+temporanea per lavoro (le immagini già nel deposito allegati solo come
+riferimento), dove il worker scrive anche PDF/DOCX; l'annullamento
+è un file nella stessa cartella, l'avanzamento torna su una coda condivisa.
+Se un worker muore (SIGKILL, memoria esaurita) il pool è rotto: i lavori
+che vi giravano finiscono in errore, il pool viene ricreato e i lavori in
+coda partono sul nuovo.
+Senza ``processi`` i worker sono thread dello stesso processo.
+
+I lavori finiti restano disponibili per il download fino a ``rimuovi`` o
+fino a ``scadenza_s`` secondi dalla fine.
+"""
+
+from __future__ import annotations
+
+import importlib
+import itertools
+import multiprocessing
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from documento import FORMATI, riscalda
+
+IN_CODA = "in coda"
+IN_CORSO = "in corso"
+COMPLETATO = "completato"
+ANNULLATO = "annullato"
+ERRORE = "errore"
+FINITI = (COMPLETATO, ANNULLATO, ERRORE)
+
+MAX_IN_CODA = 3
+# niceness dei processi renderer (POSIX)
+PRIORITA_WORKER = 10
+# nella cartella di un lavoro (processi)
+PROGETTO = "progetto.pickle"
+ANNULLA = "ANNULLA"
+
+
+class LavoroAnnullato(Exception):
+    pass
+
+
+class CodaPiena(RuntimeError):
+    pass
+
+
+@dataclass
+class Lavoro:
+    id: str
+    nome: str
+    utente: str
+    formati: Tuple[str, ...]
+    stato: str = IN_CODA
+    # fase corrente: "documento" (payload, contenuti e foto) o un formato
+    fase: str = ""
+    fatti: int = 0
+    totale: int = 0
+    pagine: int = 0
+    risultato: Dict[str, bytes] = field(default_factory=dict)
+    errore: str = ""
+    creato: float = field(default_factory=time.time)
+    finito: Optional[float] = None
+    _annulla: threading.Event = field(default_factory=threading.Event, repr=False)
+    _cartella: Optional[str] = field(default=None, repr=False)
+
+    @property
+    def frazione(self) -> float:
+        """Avanzamento complessivo in [0, 1]: la preparazione e ogni formato pesano uguale."""
+        if self.stato == COMPLETATO:
+            return 1.0
+        fasi = ("documento",) + self.formati
+        if self.fase not in fasi:
+            return 0.0
+        parziale = self.fatti / self.totale if self.totale else 0.0
+        return (fasi.index(self.fase) + min(parziale, 1.0)) / len(fasi)
+
+    def descrizione(self) -> str:
+        if self.stato != IN_CORSO:
+            return self.stato
+        if not self.fase:
+            return "avvio"
+        if self.fase == "documento":
+            return "preparazione contenuti e foto"
+        testo = f"{self.fase.upper()}: {self.fatti}/{self.totale} blocchi"
+        return f"{testo}, {self.pagine} pagine" if self.pagine else testo
+
+    def annulla(self) -> None:
+        """Chiede l'annullamento: il worker si ferma al blocco successivo."""
+        self._annulla.set()
+        if self._cartella:
+            try:
+                open(os.path.join(self._cartella, ANNULLA), "w").close()
+            except OSError:
+                pass  # cartella già rimossa: il lavoro è finito
+
+    def _notifica(self, evento: str, valore: Any) -> None:
+        if evento == "FASE":
+            self.fase, self.fatti, self.totale, self.pagine = valore, 0, 0, 0
+        elif evento == "SIZE_EST":
+            self.totale, self.fatti = valore, 0
+        elif evento == "PROGRESS":
+            self.fatti = valore
+        elif evento == "PAGE":
+            self.pagine = valore
+
+    def _avanzamento(self, evento: str, valore: Any) -> None:
+        if self._annulla.is_set():
+            raise LavoroAnnullato(self.id)
+        self._notifica(evento, valore)
+
+    def _fine(self, stato: str, errore: str = "") -> None:
+        if stato != COMPLETATO:
+            self.risultato.clear()
+        self.errore = errore
+        self.stato = stato
+        self.finito = time.time()
+
+
+def _genera(
+    progetto: Dict[str, Any], formati: Sequence[str], avanzamento: Callable[[str, Any], None]
+) -> Iterator[Tuple[str, bytes]]:
+    """``(formato, bytes)`` per ogni formato; ``avanzamento`` riceve anche gli eventi "FASE"."""
+    from documento import da_payload, genera
+    from relazione import costruisci_payload
+
+    avanzamento("FASE", "documento")
+    doc = da_payload(costruisci_payload(progetto))
+    for formato in formati:
+        avanzamento("FASE", formato)
+        yield formato, genera(doc, (formato,), avanzamento)[formato]
+
+
+# -------------------- Worker di processo --------------------
+_coda_avanzamento = None
+
+
+def _prepara_worker(coda) -> None:
+    """Initializer dei processi: percorso di rendering già esercitato prima del primo lavoro."""
+    global _coda_avanzamento
+    _coda_avanzamento = coda
+    if hasattr(os, "nice"):
+        # a parità di core il sistema preferisce il server: i rerun restano pronti anche a pool pieno
+        os.nice(PRIORITA_WORKER)
+
+    importlib.import_module("relazione")
+    riscalda()
+
+
+def _pronto() -> int:
+    return os.getpid()
+
+
+def _scrivi_progetto(cartella: str, progetto: Dict[str, Any]) -> None:
+    """Progetto nella cartella del lavoro, con le immagini in file separati."""
+    from relazione import IMAGE_KEYS
+
+    progetto = dict(progetto)
+    for key in IMAGE_KEYS:
+        blob = progetto.get(key)
+        # gli Allegato del deposito passano come riferimento, senza copiare i byte
+        if isinstance(blob, (bytes, bytearray)) and blob:
+            with open(os.path.join(cartella, key), "wb") as f:
+                f.write(blob)
+            progetto[key] = key
+    with open(os.path.join(cartella, PROGETTO), "wb") as f:
+        pickle.dump(progetto, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _leggi_progetto(cartella: str) -> Dict[str, Any]:
+    from relazione import IMAGE_KEYS
+
+    with open(os.path.join(cartella, PROGETTO), "rb") as f:
+        progetto = pickle.load(f)
+    for key in IMAGE_KEYS:
+        if isinstance(progetto.get(key), str):
+            with open(os.path.join(cartella, progetto[key]), "rb") as f:
+                progetto[key] = f.read()
+    return progetto
+
+
+def _esegui_in_processo(id_: str, cartella: str, formati: Sequence[str]) -> Tuple[str, str]:
+    """Genera nella cartella ``relazione.<formato>``; restituisce ``(stato, errore)``."""
+    flag = os.path.join(cartella, ANNULLA)
+
+    def avanzamento(evento: str, valore: Any) -> None:
+        if os.path.exists(flag):
+            raise LavoroAnnullato(id_)
+        _coda_avanzamento.put((id_, evento, valore))
+
+    try:
+        for formato, dati in _genera(_leggi_progetto(cartella), formati, avanzamento):
+            with open(os.path.join(cartella, f"relazione.{formato}"), "wb") as f:
+                f.write(dati)
+    except LavoroAnnullato:
+        return ANNULLATO, ""
+    except Exception:
+        return ERRORE, traceback.format_exc(limit=3)
+    return COMPLETATO, ""
+
+
+def _esegui_in_thread(lavoro: Lavoro, progetto: Dict[str, Any]) -> Tuple[str, str]:
+    try:
+        for formato, dati in _genera(progetto, lavoro.formati, lavoro._avanzamento):
+            lavoro.risultato[formato] = dati
+    except LavoroAnnullato:
+        return ANNULLATO, ""
+    except Exception:
+        return ERRORE, traceback.format_exc(limit=3)
+    return COMPLETATO, ""
+
+
+# -------------------- Gestore --------------------
+class GestoreLavori:
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        processi: bool = False,
+        max_in_coda: int = MAX_IN_CODA,
+        scadenza_s: float = 3600.0,
+    ):
+        self.processi = processi
+        self.max_in_coda = max_in_coda
+        self.scadenza_s = scadenza_s
+        self._lavori: Dict[str, Lavoro] = {}
+        # utente -> lavori in attesa; l'ordine delle chiavi è il turno
+        self._code: "OrderedDict[str, Deque[Tuple[Lavoro, Dict[str, Any]]]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._contatore = itertools.count(1)
+        self._pool: Executor
+        if processi:
+            # un core resta al server Streamlit
+            self._posti = max_workers or max(1, (os.cpu_count() or 2) - 1)
+            self._ctx = multiprocessing.get_context("spawn")
+            self._coda_avanzamento = self._ctx.Queue()
+            self._pool = self._nuovo_pool()
+            wait(self._avviati)
+            threading.Thread(target=self._ricevi_avanzamento, name="relazione-avanzamento", daemon=True).start()
+        else:
+            self._posti = max_workers or 2
+            self._pool = ThreadPoolExecutor(self._posti, thread_name_prefix="relazione")
+            # stesso riscaldamento dei processi, senza bloccare chi crea il gestore
+            self._pool.submit(riscalda)
+        self._liberi = self._posti
+
+    def sottometti(
+        self, progetto: Dict[str, Any], formati: Sequence[str] = FORMATI, nome: str = "", utente: str = ""
+    ) -> Lavoro:
+        """Accoda la generazione del progetto per ``utente`` e restituisce subito il Lavoro.
+
+        Solleva CodaPiena se l'utente ha già ``max_in_coda`` lavori in attesa.
+        """
+        for formato in formati:
+            if formato not in FORMATI:
+                raise ValueError(f"formato non supportato: {formato!r} (ammessi: {', '.join(FORMATI)})")
+        self._pulisci()
+        with self._lock:
+            coda = self._code.setdefault(utente, deque())
+            if len(coda) >= self.max_in_coda:
+                raise CodaPiena(f"già {len(coda)} relazioni in attesa: attendere o annullarne una")
+            n = next(self._contatore)
+            lavoro = Lavoro(uuid.uuid4().hex[:12], nome or f"Relazione {n}", utente, tuple(formati))
+            self._lavori[lavoro.id] = lavoro
+            coda.append((lavoro, progetto))
+            self._avvia()
+        return lavoro
+
+    def lavoro(self, id_: str) -> Optional[Lavoro]:
+        return self._lavori.get(id_)
+
+    def lavori(self, ids: Optional[Sequence[str]] = None) -> List[Lavoro]:
+        """Lavori con gli ``ids`` indicati (tutti se None), nell'ordine di sottomissione."""
+        if ids is None:
+            return list(self._lavori.values())
+        return [self._lavori[i] for i in ids if i in self._lavori]
+
+    def annulla(self, id_: str) -> None:
+        """Un lavoro in attesa esce dalla coda, uno in corso si ferma al blocco successivo."""
+        with self._lock:
+            lavoro = self._lavori.get(id_)
+            if lavoro is None or lavoro.stato in FINITI:
+                return
+            coda = self._code.get(lavoro.utente)
+            if lavoro.stato == IN_CODA and coda:
+                for voce in coda:
+                    if voce[0] is lavoro:
+                        coda.remove(voce)
+                        lavoro._fine(ANNULLATO)
+                        return
+            lavoro.annulla()
+
+    def rimuovi(self, id_: str) -> None:
+        """Annulla il lavoro se non è finito e ne libera il risultato."""
+        self.annulla(id_)
+        with self._lock:
+            self._lavori.pop(id_, None)
+
+    def chiudi(self, attendi: bool = True) -> None:
+        with self._lock:
+            for coda in self._code.values():
+                for lavoro, _ in coda:
+                    lavoro._fine(ANNULLATO)
+            self._code.clear()
+            for lavoro in self._lavori.values():
+                if lavoro.stato not in FINITI:
+                    lavoro.annulla()
+        self._pool.shutdown(wait=attendi)
+
+    # ---- interni ----
+    def _avvia(self) -> None:
+        """Assegna i posti liberi del pool, un lavoro per utente a turno."""
+        with self._lock:
+            while self._liberi and self._code:
+                utente, coda = next(iter(self._code.items()))
+                lavoro, progetto = coda.popleft()
+                # l'utente passa in fondo al turno (o esce se non ha altro in attesa)
+                del self._code[utente]
+                if coda:
+                    self._code[utente] = coda
+                self._liberi -= 1
+                lavoro.stato = IN_CORSO
+                try:
+                    fut = self._sottometti_al_pool(lavoro, progetto)
+                except Exception:
+                    self._liberi += 1
+                    lavoro._fine(ERRORE, traceback.format_exc(limit=3))
+                    continue
+                # self._pool è quello del futuro: la sostituzione avviene sotto lo stesso lock
+                fut.add_done_callback(lambda f, lavoro=lavoro, pool=self._pool: self._concluso(lavoro, f, pool))
+
+    def _sottometti_al_pool(self, lavoro: Lavoro, progetto: Dict[str, Any]) -> Future:
+        if not self.processi:
+            return self._pool.submit(_esegui_in_thread, lavoro, progetto)
+        lavoro._cartella = tempfile.mkdtemp(prefix="relazione-")
+        _scrivi_progetto(lavoro._cartella, progetto)
+        if lavoro._annulla.is_set():
+            lavoro.annulla()
+        pool = self._pool
+        try:
+            return pool.submit(_esegui_in_processo, lavoro.id, lavoro._cartella, lavoro.formati)
+        except BrokenProcessPool:
+            # rotto prima che arrivasse la callback dei lavori che vi giravano
+            self._ricrea_pool(pool)
+            return self._pool.submit(_esegui_in_processo, lavoro.id, lavoro._cartella, lavoro.formati)
+
+    def _nuovo_pool(self) -> ProcessPoolExecutor:
+        pool = ProcessPoolExecutor(
+            self._posti, mp_context=self._ctx, initializer=_prepara_worker, initargs=(self._coda_avanzamento,)
+        )
+        # processi avviati e riscaldati subito: con spawn il pool ne crea uno per compito in attesa
+        self._avviati = [pool.submit(_pronto) for _ in range(self._posti)]
+        return pool
+
+    def _ricrea_pool(self, rotto: Executor) -> None:
+        """Sostituisce il pool ``rotto`` con uno nuovo (se non l'ha già fatto un'altra callback)."""
+        with self._lock:
+            if self._pool is not rotto:
+                return
+            self._pool = self._nuovo_pool()
+        rotto.shutdown(wait=False)
+
+    def _concluso(self, lavoro: Lavoro, fut: Future, pool: Executor) -> None:
+        try:
+            stato, errore = fut.result()
+            if stato == COMPLETATO and lavoro._cartella:
+                for formato in lavoro.formati:
+                    with open(os.path.join(lavoro._cartella, f"relazione.{formato}"), "rb") as f:
+                        lavoro.risultato[formato] = f.read()
+        except BrokenProcessPool:
+            # non si sa quale lavoro l'abbia causato: rimetterli in coda potrebbe rompere di nuovo il pool
+            stato, errore = ERRORE, "il processo di generazione si è interrotto (memoria esaurita?): riprovare"
+            self._ricrea_pool(pool)
+        except Exception:
+            stato, errore = ERRORE, traceback.format_exc(limit=3)
+        if lavoro._cartella:
+            shutil.rmtree(lavoro._cartella, ignore_errors=True)
+            lavoro._cartella = None
+        lavoro._fine(stato, errore)
+        with self._lock:
+            self._liberi += 1
+            self._avvia()
+
+    def _ricevi_avanzamento(self) -> None:
+        while True:
+            try:
+                id_, evento, valore = self._coda_avanzamento.get()
+            except (EOFError, OSError):
+                return
+            lavoro = self._lavori.get(id_)
+            if lavoro is not None and lavoro.stato == IN_CORSO:
+                lavoro._notifica(evento, valore)
+
+    def _pulisci(self) -> None:
+        limite = time.time() - self.scadenza_s
+        with self._lock:
+            for id_ in [i for i, l in self._lavori.items() if l.finito is not None and l.finito < limite]:
+                del self._lavori[id_]
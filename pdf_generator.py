@@ -8,6 +8,7 @@ Obiettivi della versione:
 - Header/Footer e numerazione "Pagina X di Y" su tutte le pagine successive
 - Wording e struttura più legali/rigorosi (capitoli allineati al template: 1..6)
 - Contenuti condizionali: stampa solo sezioni significative
+- Indice con numeri di pagina reali, risolti in un unico build
 
 Nota: la cover riprende l'impostazione a tre riquadri del PDF campione.
 """
@@ -35,36 +36,31 @@ from reportlab.platypus import (
 )
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 
+from documento import (
+    LARGHEZZA_UTILE_MM,
+    Avanzamento,
+    ChiaveValore,
+    Copertina,
+    Documento,
+    Foto,
+    GrigliaFoto,
+    Indice,
+    NuovaPagina,
+    Spazio,
+    Tabella,
+    Testo,
+    Titolo,
+    _meaningful,
+    da_payload,
+    valore,
+)
+
 
 def _p(text: str, style):
     safe = escape(text or "").replace("\n", "<br/>")
     return Paragraph(safe, style)
 
 
-def _meaningful(value: Any) -> bool:
-    if value is None:
-        return False
-    s = str(value).strip()
-    if not s:
-        return False
-    low = s.lower()
-    bad = {
-        "non pertinente",
-        "non applicabile",
-        "n/a",
-        "na",
-        "—",
-        "-",
-        "nessuna",
-        "nessuna / non applicabile",
-    }
-    if low in bad:
-        return False
-    if "xxxx" in low:
-        return False
-    return True
-
-
 def _kv_table(rows: List[list], col_widths):
     tbl = Table(rows, colWidths=col_widths, hAlign="LEFT")
     tbl.setStyle(
@@ -93,13 +89,15 @@ def _first_nonempty_line(text: str) -> str:
     return ""
 
 
-def _img_flowable(img_bytes: Optional[bytes], max_w_pt: float, max_h_pt: float):
-    """Crea un Flowable Image scalato (mantiene aspect ratio) per stare nel riquadro."""
+def _img_flowable(img_bytes: Optional[bytes], max_w_pt: float, max_h_pt: float, px=None):
+    """Crea un Flowable Image scalato (mantiene aspect ratio) per stare nel riquadro.
+
+    ``px``: dimensioni già note (documento.Foto), evita di decodificare l'immagine.
+    """
     if not img_bytes:
         return None
     try:
-        reader = ImageReader(BytesIO(img_bytes))
-        iw, ih = reader.getSize()
+        iw, ih = px or ImageReader(BytesIO(img_bytes)).getSize()
         if iw <= 0 or ih <= 0:
             return None
         scale = min(max_w_pt / float(iw), max_h_pt / float(ih))
@@ -110,15 +108,8 @@ def _img_flowable(img_bytes: Optional[bytes], max_w_pt: float, max_h_pt: float):
         return None
 
 
-def _photo_grid_table(data: Dict[str, Any], styles):
+def _photo_grid_table(foto: List[Foto], styles):
     """Tabella 2x2 con 4 foto in un'unica pagina."""
-    items = [
-        ("Foto 1 – Posizione Pulsante Antincendio (se presente)", data.get("foto1_bytes")),
-        ("Foto 2 – Quadro realizzato", data.get("foto2_bytes")),
-        ("Foto 3 – Percorso realizzato", data.get("foto3_bytes")),
-        ("Foto 4 – Apparecchiatura di ricarica (se installata)", data.get("foto4_bytes")),
-    ]
-
     # Area utile A4 con margini 18mm (come nel doc): ~174mm x 261mm
     # Griglia 2x2 con spazio didascalia.
     cell_w = 86 * mm
@@ -143,8 +134,9 @@ def _photo_grid_table(data: Dict[str, Any], styles):
     )
 
     cells = []
-    for caption, b in items:
-        img = _img_flowable(b, img_max_w, img_max_h)
+    for f in foto:
+        img = _img_flowable(f.blob, img_max_w, img_max_h, f.px)
+        caption = f.didascalia
         if img is None:
             content = [
                 Paragraph(escape(caption), cap_style),
@@ -176,11 +168,23 @@ def _photo_grid_table(data: Dict[str, Any], styles):
 
 
 class _NumberedCanvas(canvas.Canvas):
-    """Canvas che consente 'Pagina X di Y'."""
+    """Canvas che consente 'Pagina X di Y' e l'indice con numeri di pagina reali.
+
+    Le pagine vengono emesse solo in save(): a quel punto sono note sia il totale
+    delle pagine sia la pagina di ogni titolo registrato da
+    _RelazioneDocTemplate.afterFlowable, quindi l'indice viene disegnato sulla
+    pagina riservata senza un secondo build (niente multiBuild).
+    """
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self._saved_page_states: List[dict] = []
+        # voci indice: (livello, testo, pagina, chiave segnalibro)
+        self._indice_voci: List[tuple] = []
+        # area riservata all'indice: (pagina, x, y_top, larghezza, altezza)
+        self._indice_area: Optional[tuple] = None
+        # riquadro indice della cover legacy: (pagina, x, y_top, larghezza, altezza)
+        self._indice_cover: Optional[tuple] = None
 
     def showPage(self):
         # IMPORTANT:
@@ -196,12 +200,73 @@ class _NumberedCanvas(canvas.Canvas):
     def save(self):
         # _saved_page_states contains one state per page.
         page_count = len(self._saved_page_states)
+        # Lette prima del replay: gli stati salvati prima della registrazione
+        # non contengono i valori definitivi.
+        voci = list(self._indice_voci)
+        area = self._indice_area
+        cover = self._indice_cover
         for state in self._saved_page_states:
             self.__dict__.update(state)
+            # I segnalibri vanno creati ora: solo in save() la pagina corrente
+            # corrisponde alla pagina reale del PDF.
+            for _, _, pagina, chiave in voci:
+                if pagina == self._pageNumber:
+                    self.bookmarkPage(chiave)
+            if area and area[0] == self._pageNumber:
+                self._draw_indice(voci, *area[1:])
+            if cover and cover[0] == self._pageNumber:
+                self._draw_indice_cover(voci, *cover[1:])
             self._draw_page_number(page_count)
             canvas.Canvas.showPage(self)
         canvas.Canvas.save(self)
 
+    def _draw_indice(self, voci: List[tuple], x: float, y_top: float, width: float, height: float):
+        """Indice completo (capitoli e paragrafi) con puntini di guida e link."""
+        if not voci:
+            return
+        leading = min(7 * mm, height / len(voci))
+        size = min(10.5, leading / mm * 1.6)
+        y = y_top - leading
+        self.saveState()
+        for livello, testo, pagina, chiave in voci:
+            if y < y_top - height:
+                break
+            font = "Helvetica-Bold" if livello == 0 else "Helvetica"
+            indent = 8 * mm * livello
+            num = str(pagina)
+            self.setFont(font, size)
+            self.drawString(x + indent, y, testo)
+            self.drawRightString(x + width, y, num)
+            # puntini di guida tra titolo e numero di pagina
+            x_dots = x + indent + self.stringWidth(testo, font, size) + 2 * mm
+            x_end = x + width - self.stringWidth(num, font, size) - 2 * mm
+            if x_end > x_dots:
+                self.setFont("Helvetica", size)
+                dot_w = self.stringWidth(". ", "Helvetica", size)
+                self.drawRightString(x_end, y, ". " * int((x_end - x_dots) / dot_w))
+            self.linkRect("", chiave, (x, y - 1.5 * mm, x + width, y + leading - 1.5 * mm), relative=0, thickness=0, name=f"link_{chiave}")
+            y -= leading
+        self.restoreState()
+
+    def _draw_indice_cover(self, voci: List[tuple], x: float, y_top: float, width: float, height: float):
+        """Indice a checkbox della cover legacy: solo capitoli, con pagina."""
+        capitoli = [v for v in voci if v[0] == 0]
+        self.saveState()
+        self.setFont("Times-Roman", 13)
+        y = y_top
+        if not capitoli:
+            capitoli = [(0, it, None, None) for it in _build_indice_items({})]
+        for _, testo, pagina, chiave in capitoli:
+            if y - 3 * mm < y_top - height:
+                break
+            self.rect(x, y - 3 * mm, 3.5 * mm, 3.5 * mm)
+            self.drawString(x + 7 * mm, y - 2 * mm, testo)
+            if pagina is not None:
+                self.drawRightString(x + width, y - 2 * mm, f"pag. {pagina}")
+                self.linkRect("", chiave, (x, y - 4 * mm, x + width, y + 2 * mm), relative=0, thickness=0, name=f"link_cover_{chiave}")
+            y -= 7.5 * mm
+        self.restoreState()
+
     def _draw_page_number(self, page_count: int):
         self.saveState()
         self.setFont("Helvetica", 9)
@@ -223,6 +288,45 @@ def _build_indice_items(_: Dict[str, Any]) -> List[str]:
     ]
 
 
+def _titolo(text: str, style, livello: int) -> Paragraph:
+    """Titolo di capitolo/paragrafo che compare nell'indice (livello 0 = capitolo)."""
+    par = _p(text, style)
+    par._indice_livello = livello
+    return par
+
+
+class _IndiceSegnaposto(Flowable):
+    """Riserva il resto della pagina per l'indice.
+
+    Non disegna nulla: registra sul canvas pagina e area, che _NumberedCanvas
+    riempie in save() con le voci raccolte durante l'unico build.
+    """
+
+    def wrap(self, availWidth, availHeight):
+        self.width, self.height = availWidth, availHeight
+        return availWidth, availHeight
+
+    def draw(self):
+        c = self.canv
+        x, y_top = c.absolutePosition(0, self.height)
+        if hasattr(c, "_indice_area"):
+            c._indice_area = (c.getPageNumber(), x, y_top, self.width, self.height)
+
+
+class _RelazioneDocTemplate(SimpleDocTemplate):
+    """SimpleDocTemplate che registra pagina e segnalibro dei titoli marcati con _titolo()."""
+
+    def afterFlowable(self, flowable):
+        livello = getattr(flowable, "_indice_livello", None)
+        voci = getattr(self.canv, "_indice_voci", None)
+        if livello is None or voci is None:
+            return
+        testo = flowable.getPlainText()
+        chiave = f"indice_{len(voci)}"
+        voci.append((livello, testo, self.canv.getPageNumber(), chiave))
+        self.canv.addOutlineEntry(testo, chiave, level=livello)
+
+
 
 class EngineeringCoverPage(Flowable):
     """Cover page tipica per documenti di ingegneria con title-block e spazio timbro.
@@ -461,15 +565,18 @@ class LegacyCoverPage(Flowable):
                 c.drawCentredString(left + w / 2, y, ll)
                 y -= 6 * mm
 
-        # Indice con checkbox
-        c.setFont("Times-Roman", 13)
-        idx = _build_indice_items(self.data)
-        x0 = left + 10 * mm
-        y = y2_top - 10 * mm
-        for it in idx:
-            c.rect(x0, y - 3 * mm, 3.5 * mm, 3.5 * mm)
-            c.drawString(x0 + 7 * mm, y - 2 * mm, it)
-            y -= 7.5 * mm
+        # Indice con checkbox: disegnato da _NumberedCanvas.save(), quando le
+        # pagine dei capitoli sono note. Qui si registra solo il riquadro.
+        x0, y0 = c.absolutePosition(left + 10 * mm, y2_top - 10 * mm)
+        if hasattr(c, "_indice_cover"):
+            c._indice_cover = (c.getPageNumber(), x0, y0, w - 20 * mm, box2_h - 4 * mm)
+        else:
+            c.setFont("Times-Roman", 13)
+            y = y2_top - 10 * mm
+            for it in _build_indice_items(self.data):
+                c.rect(left + 10 * mm, y - 3 * mm, 3.5 * mm, 3.5 * mm)
+                c.drawString(left + 17 * mm, y - 2 * mm, it)
+                y -= 7.5 * mm
 
         # Firma
         progettista = (
@@ -559,54 +666,52 @@ def _draw_header_footer(c: canvas.Canvas, doc, data: Dict[str, Any]):
     c.restoreState()
 
 
-def _revision_table(data: Dict[str, Any], styles) -> Optional[Table]:
-    revs = data.get("revisioni") or []
-    if not revs:
-        # default minimo
-        rev = data.get("rev", "00")
-        dt = data.get("data", "")
-        revs = [{"Rev": str(rev), "Data": str(dt), "Descrizione": "Emissione documento"}]
-
-    th = ParagraphStyle("rth", parent=styles["Normal"], fontName="Helvetica-Bold", fontSize=9, leading=10)
-    tc = ParagraphStyle("rtc", parent=styles["Normal"], fontName="Helvetica", fontSize=9, leading=10)
+def _tabella(t: Tabella, styles) -> Table:
+    """Tabella con intestazione ripetuta; larghezze dai pesi delle colonne."""
+    corpo = 8 if t.compatta else 9
+    th = ParagraphStyle("th", parent=styles["Normal"], fontName="Helvetica-Bold", fontSize=corpo, leading=corpo + 1)
+    tc = ParagraphStyle("tc", parent=styles["Normal"], fontName="Helvetica", fontSize=corpo, leading=corpo + 1)
 
-    tdata = [[_p("Rev.", th), _p("Data", th), _p("Descrizione", th)]]
-    for r in revs:
-        tdata.append([
-            _p(str(r.get("Rev", "")), tc),
-            _p(str(r.get("Data", "")), tc),
-            _p(str(r.get("Descrizione", "")), tc),
-        ])
+    tdata = [[_p(c[0], th) for c in t.colonne]]
+    for r in t.righe:
+        tdata.append([_p(valore(c, r), tc) for c in t.colonne])
+    totale = sum(c[2] for c in t.colonne)
+    colw = [c[2] * LARGHEZZA_UTILE_MM / totale * mm for c in t.colonne]
 
-    tbl = Table(tdata, colWidths=[18 * mm, 30 * mm, 126 * mm], hAlign="LEFT", repeatRows=1)
+    pad_x, pad_y = (3, 2) if t.compatta else (4, 3)
+    tbl = Table(tdata, colWidths=colw, repeatRows=1, hAlign="LEFT")
     tbl.setStyle(
         TableStyle(
             [
                 ("BACKGROUND", (0, 0), (-1, 0), colors.whitesmoke),
                 ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
                 ("VALIGN", (0, 0), (-1, -1), "TOP"),
-                ("LEFTPADDING", (0, 0), (-1, -1), 4),
-                ("RIGHTPADDING", (0, 0), (-1, -1), 4),
-                ("TOPPADDING", (0, 0), (-1, -1), 3),
-                ("BOTTOMPADDING", (0, 0), (-1, -1), 3),
+                ("LEFTPADDING", (0, 0), (-1, -1), pad_x),
+                ("RIGHTPADDING", (0, 0), (-1, -1), pad_x),
+                ("TOPPADDING", (0, 0), (-1, -1), pad_y),
+                ("BOTTOMPADDING", (0, 0), (-1, -1), pad_y),
             ]
         )
     )
     return tbl
 
 
-def genera_pdf_relazione_bytes(data: Dict[str, Any]) -> bytes:
+def rendi_pdf(documento: Documento, avanzamento: Optional[Avanzamento] = None) -> bytes:
+    """PDF del documento intermedio (documento.da_payload).
+
+    ``avanzamento`` riceve le notifiche di ReportLab (flowable impaginati e
+    pagine chiuse); un'eccezione sollevata dalla callback interrompe il build.
+    """
+    data = documento.meta
     buf = BytesIO()
     styles = getSampleStyleSheet()
 
-    th = ParagraphStyle("th", parent=styles["Normal"], fontName="Helvetica-Bold", fontSize=8, leading=9)
-    tc = ParagraphStyle("tc", parent=styles["Normal"], fontName="Helvetica", fontSize=8, leading=9)
-
     h1 = ParagraphStyle("H1", parent=styles["Heading1"], spaceBefore=6, spaceAfter=8)
     h2 = ParagraphStyle("H2", parent=styles["Heading2"], spaceBefore=8, spaceAfter=6)
     h3 = ParagraphStyle("H3", parent=styles["Heading3"], spaceBefore=6, spaceAfter=4)
+    titoli = (h1, h2, h3)
 
-    doc = SimpleDocTemplate(
+    doc = _RelazioneDocTemplate(
         buf,
         pagesize=A4,
         leftMargin=18 * mm,
@@ -615,213 +720,32 @@ def genera_pdf_relazione_bytes(data: Dict[str, Any]) -> bytes:
         bottomMargin=18 * mm,
         title="Relazione Tecnico-Specialistica",
     )
+    if avanzamento:
+        doc.setProgressCallBack(avanzamento)
 
     story: List[Any] = []
-
-    # 1) COVER
-    cover_style = (data.get('cover_style') or 'engineering').lower()
-    story.append(EngineeringCoverPage(data) if cover_style.startswith('eng') else LegacyCoverPage(data))
-    story.append(PageBreak())
-
-    # 2) REVISIONI
-    story.append(_p("ELENCO DELLE REVISIONI", h1))
-    rt = _revision_table(data, styles)
-    if rt:
-        story.append(rt)
-        story.append(Spacer(1, 10))
-
-    # 2.1) Dati identificativi documento
-    ident = [
-        ["DATI IDENTIFICATIVI DOCUMENTO", ""],
-        ["Committente", data.get("committente_nome", "")],
-        ["Luogo di installazione", data.get("impianto_indirizzo", "")],
-        ["Oggetto intervento", data.get("oggetto_intervento", "")],
-        ["Tipologia impianto", data.get("tipologia", "")],
-        ["Sistema di distribuzione", data.get("sistema", "")],
-        ["Tensione/Frequenza", data.get("tensione", "")],
-        ["Potenza impegnata / disponibile", data.get("potenza_disp", "")],
-        ["Cod. progetto", data.get("cod_progetto", "")],
-        ["N. documento", data.get("n_doc", "")],
-        ["Revisione", data.get("rev", "")],
-        ["Data", data.get("data", "")],
-    ]
-    story.append(_kv_table(ident, [55 * mm, 119 * mm]))
-    story.append(Spacer(1, 10))
-
-    # 2.2) Dati progettista (se forniti)
-    progettista_blocco = data.get("progettista_blocco", "")
-    if _meaningful(progettista_blocco):
-        story.append(_p("TECNICO PROGETTISTA / REDATTORE", h2))
-        story.append(_p(progettista_blocco, styles["BodyText"]))
-        story.append(Spacer(1, 10))
-
-    # Nota calcoli
-    disclaimer = data.get(
-        "disclaimer_calcoli",
-        "I calcoli e le verifiche riportate sono di sintesi e in linea con le normative applicabili"
-        "Le raccomandazioni non sostituiscono le verifiche prescrittive previste dalle norme applicabili.",
-    )
-    if _meaningful(disclaimer):
-        story.append(_p("NOTA", h2))
-        story.append(_p(disclaimer, styles["BodyText"]))
-
-    story.append(PageBreak())
-
-    # === CAPITOLI 1..6 ===
-    story.append(_p("CAPITOLO 1 - PREMESSA", h2))
-    story.append(_p(data.get("premessa", ""), styles["BodyText"]))
-    story.append(Spacer(1, 10))
-
-    story.append(_p("CAPITOLO 2 - RIFERIMENTI LEGISLATIVI E NORMATIVI", h2))
-    story.append(_p(data.get("norme", ""), styles["BodyText"]))
-    story.append(Spacer(1, 10))
-
-    criterio = data.get("criterio_progetto", "")
-    if _meaningful(criterio):
-        story.append(_p("CAPITOLO 3 - CRITERI DI PROGETTO DEGLI IMPIANTI", h2))
-        story.append(_p(criterio, styles["BodyText"]))
-        story.append(Spacer(1, 10))
-
-    story.append(_p("CAPITOLO 4 - SOLUZIONE PROGETTUALE ADOTTATA", h2))
-
-    dati_tecnici = data.get("dati_tecnici", "")
-    if _meaningful(dati_tecnici):
-        story.append(_p("4.1 Dati tecnici di base", h3))
-        story.append(_p(dati_tecnici, styles["BodyText"]))
-        story.append(Spacer(1, 8))
-
-    descr = data.get("descrizione_impianto", "")
-    if _meaningful(descr):
-        story.append(_p("4.2 Descrizione impianto e opere", h3))
-        story.append(_p(descr, styles["BodyText"]))
-        story.append(Spacer(1, 8))
-
-    conf = data.get("confini", "")
-    if _meaningful(conf):
-        story.append(_p("4.3 Confini dell’intervento e interfacce", h3))
-        story.append(_p(conf, styles["BodyText"]))
-        story.append(Spacer(1, 10))
-
-    quadri = data.get("quadri", [])
-    if quadri:
-        story.append(_p("4.4 Quadri elettrici e distribuzione (sintesi)", h3))
-        tdata = [[
-            _p("Quadro", th),
-            _p("Ubicazione", th),
-            _p("IP", th),
-            _p("Interruttore generale<br/>(tipo/In)", th),
-            _p("Differenziale generale<br/>(tipo/Idn)", th),
-        ]]
-        for q in quadri:
-            tdata.append([
-                _p(str(q.get("Quadro", "")), tc),
-                _p(str(q.get("Ubicazione", "")), tc),
-                _p(str(q.get("IP", "")), tc),
-                _p(str(q.get("Generale", "")), tc),
-                _p(str(q.get("Diff", "")), tc),
-            ])
-        tbl = Table(tdata, colWidths=[16 * mm, 40 * mm, 12 * mm, 52 * mm, 54 * mm], repeatRows=1, hAlign="LEFT")
-        tbl.setStyle(TableStyle([
-            ("BACKGROUND", (0, 0), (-1, 0), colors.whitesmoke),
-            ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
-            ("VALIGN", (0, 0), (-1, -1), "TOP"),
-            ("LEFTPADDING", (0, 0), (-1, -1), 3),
-            ("RIGHTPADDING", (0, 0), (-1, -1), 3),
-            ("TOPPADDING", (0, 0), (-1, -1), 2),
-            ("BOTTOMPADDING", (0, 0), (-1, -1), 2),
-        ]))
-        story.append(tbl)
-        story.append(Spacer(1, 10))
-
-    linee = data.get("linee", [])
-    if linee:
-        story.append(_p("4.5 Elenco circuiti, cavi e protezioni (sintesi)", h3))
-        tdata = [[
-            _p("Circuito<br/>/Linea", th),
-            _p("Destinazione<br/>/Utilizzo", th),
-            _p("Posa<br/>L (m)", th),
-            _p("Cavo<br/>(tipo/sezione)", th),
-            _p("Protezione<br/>(MT/MTD)", th),
-            _p("Differenziale<br/>(tipo/Idn)", th),
-            _p("ΔV %", th),
-            _p("Esito", th),
-        ]]
-        for ln in linee:
-            posa = (ln.get("Posa", "") or "").strip()
-            ll = ln.get("L_m", "")
-            posa_len = f"{posa}\n{ll}" if _meaningful(posa) else f"{ll}"
-            tdata.append([
-                _p(str(ln.get("Linea", "")), tc),
-                _p(str(ln.get("Uso", "")), tc),
-                _p(str(posa_len), tc),
-                _p(str(ln.get("Cavo", "")), tc),
-                _p(str(ln.get("Protezione", "")), tc),
-                _p(str(ln.get("Diff", "")), tc),
-                _p(str(ln.get("DV_perc", "")), tc),
-                _p(str(ln.get("Esito", "")), tc),
-            ])
-        colw = [16 * mm, 30 * mm, 24 * mm, 32 * mm, 26 * mm, 26 * mm, 10 * mm, 10 * mm]
-        tbl = Table(tdata, colWidths=colw, repeatRows=1, hAlign="LEFT")
-        tbl.setStyle(TableStyle([
-            ("BACKGROUND", (0, 0), (-1, 0), colors.whitesmoke),
-            ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
-            ("VALIGN", (0, 0), (-1, -1), "TOP"),
-            ("LEFTPADDING", (0, 0), (-1, -1), 3),
-            ("RIGHTPADDING", (0, 0), (-1, -1), 3),
-            ("TOPPADDING", (0, 0), (-1, -1), 2),
-            ("BOTTOMPADDING", (0, 0), (-1, -1), 2),
-        ]))
-        story.append(tbl)
-        story.append(Spacer(1, 10))
-
-    story.append(_p("CAPITOLO 5 - ULTERIORI INDICAZIONI", h2))
-
-    sic = data.get("sicurezza", "")
-    if _meaningful(sic):
-        story.append(_p("5.1 Protezione contro i contatti diretti e indiretti", h3))
-        story.append(_p(sic, styles["BodyText"]))
-        story.append(Spacer(1, 8))
-
-    ver = data.get("verifiche", "")
-    if _meaningful(ver):
-        story.append(_p("5.2 Verifiche, prove e collaudi", h3))
-        story.append(_p(ver, styles["BodyText"]))
-        story.append(Spacer(1, 8))
-
-    man = data.get("manutenzione", "")
-    if _meaningful(man):
-        story.append(_p("5.3 Esercizio, manutenzione e avvertenze", h3))
-        story.append(_p(man, styles["BodyText"]))
-        story.append(Spacer(1, 8))
-
-    allg = data.get("allegati", "")
-    has_photos = any(
-        data.get(k)
-        for k in ("foto1_bytes", "foto2_bytes", "foto3_bytes", "foto4_bytes")
-    )
-    if _meaningful(allg) or has_photos:
-        story.append(_p("CAPITOLO 6 - ALLEGATI", h2))
-        if _meaningful(allg):
-            story.append(_p(allg, styles["BodyText"]))
-
-        # Allegato fotografico: 1 pagina con griglia 2x2 (4 foto)
-        if has_photos:
-            story.append(Spacer(1, 10))
-            story.append(_p("Allegato fotografico", h3))
-            story.append(Spacer(1, 6))
-            story.append(_photo_grid_table(data, styles))
-
-    # Firma finale (facoltativa)
-    luogo_f = data.get("luogo_firma", "")
-    data_f = data.get("data_firma", "")
-    firma = data.get("firma", "")
-    if _meaningful(luogo_f) or _meaningful(data_f) or _meaningful(firma):
-        story.append(Spacer(1, 14))
-        if _meaningful(luogo_f) or _meaningful(data_f):
-            story.append(_p(f"Luogo e data: {luogo_f} – {data_f}".strip(" –"), styles["BodyText"]))
-            story.append(Spacer(1, 8))
-        if _meaningful(firma):
-            story.append(_p(f"Firma e timbro: {firma}", styles["BodyText"]))
+    for b in documento.blocchi:
+        if isinstance(b, Testo):
+            story.append(_p(b.testo, styles["BodyText"]))
+        elif isinstance(b, Spazio):
+            story.append(Spacer(1, b.punti))
+        elif isinstance(b, Titolo):
+            style = titoli[b.livello]
+            # nell'indice: capitoli al livello 0, paragrafi al livello 1
+            story.append(_titolo(b.testo, style, b.livello - 1) if b.in_indice else _p(b.testo, style))
+        elif isinstance(b, Tabella):
+            story.append(_tabella(b, styles))
+        elif isinstance(b, ChiaveValore):
+            story.append(_kv_table([list(r) for r in b.righe], [55 * mm, 119 * mm]))
+        elif isinstance(b, GrigliaFoto):
+            story.append(_photo_grid_table(b.foto, styles))
+        elif isinstance(b, Copertina):
+            story.append(EngineeringCoverPage(data) if b.stile == "engineering" else LegacyCoverPage(data))
+        elif isinstance(b, NuovaPagina):
+            story.append(PageBreak())
+        elif isinstance(b, Indice):
+            # pagina riservata, compilata a fine build con le pagine reali
+            story.append(_IndiceSegnaposto())
 
     doc.build(
         story,
@@ -830,3 +754,7 @@ def genera_pdf_relazione_bytes(data: Dict[str, Any]) -> bytes:
         canvasmaker=_NumberedCanvas,
     )
     return buf.getvalue()
+
+
+def genera_pdf_relazione_bytes(data: Dict[str, Any]) -> bytes:
+    return rendi_pdf(da_payload(data))
@@ -1,480 +1,154 @@
-# Auto-generated from relazione progetto elettrico.docx
-TEMPLATE_SECTIONS = {9: {'title': 'AREA DI INTERVENTO E TIPO DI ATTIVITÀ.',
-     'text': 'L’area di intervento consiste nell’installazione di tipo Outdoor (esterno) di punto di ricarica.'},
- 10: {'title': 'TIPO DI IMPIANTO.',
-      'text': 'Trattasi di impianto elettrico, utilizzatore di Ia categoria (50 V < Vn <1000 V), con alimentazione da rete privata di '
-              'bassa tensione tramite un unico punto di consegna (POD) dell’Ente Distributore.'},
- 11: {'title': 'PUNTO DI ORIGINE.',
-      'text': 'Il punto di origine dell’impianto dista circa 60 metri con il punto di consegna da parte dell’Ente Distributore.\n'
-              'Per maggiori dettagli si rimanda ai disegni e agli elaborati tecnici allegati a questa relazione.'},
- 12: {'title': 'SISTEMA DI FORNITURA.',
-      'text': 'La fornitura sarà di tipo a corrente alternata monofase in bassa tensione 230 V, a frequenza nominale 50 Hz.'},
- 13: {'title': 'TENSIONE NOMINALE.',
-      'text': 'Gli impianti elettrici presenti avranno le seguenti tensioni:\nCircuiti elettrici di tipo monofase a 230 V;'},
- 14: {'title': 'SISTEMA DI DISTRIBUZIONE.',
-      'text': 'Si tratta di un impianto di tipo TT, con impianto di terra comune a tutte le sezioni dell’impianto.'},
- 15: {'title': 'CORRENTE DI CORTO CIRCUITO.',
-      'text': 'Per la fornitura delle parti comuni, la corrente di corto circuito presunta per guasto trifase nel punto di fornitura è '
-              'pari a 10 kA. (salvo diversa indicazione del Distributore), mentre per la corrente di corto circuito presunta per guasto '
-              'monofase nel punto di fornitura è pari a 6 kA.\n'
-              'In ogni caso il dispositivo generale avrà un potere d’interruzione nominale monofase 230V maggiore della corrente di corto '
-              'circuito monofase presunta nel punto di installazione.'},
- 16: {'title': 'POTENZA IMPEGNATA.',
-      'text': 'La potenza impegnata tiene conto di tutti i fattori di contemporaneità e di utilizzazione delle varie utenze presenti '
-              'nell’area d’intervento ed è pari a quella contrattualmente richiesta all’Ente Fornitore, più precisamente: 4 kW.'},
- 17: {'title': 'CADUTA DI TENSIONE.',
-      'text': 'Per gli impianti di 1ª categoria la tensione misurata tra il quadro principale immediatamente a valle del punto di consegna '
-              "dell’energia elettrica ed un qualsiasi punto dell'impianto utilizzatore (ivi compresi apparecchi d’illuminazione, prese a "
-              'spina, ecc.), quando sono inseriti e funzionanti al rispettivo carico nominale non deve superare il 4% (a fondo linea).'},
- 18: {'title': 'CORRENTI DI IMPIEGO E PORTATE DEI CAVI.',
-      'text': 'Ai fini della determinazione delle correnti d’impiego sono state fatte le seguenti considerazioni: le linee asservite alle '
-              'utenze (WallBox) sono state dimensionate per il massimo carico previsto: per il dimensionamento della linea tra punto di '
-              'consegna e il quadro di distribuzione si ipotizzato un fattore di contemporaneità ed utilizzazione dei carichi pari al 100% '
-              'della somma dei carichi (c.a. 7,4 kW).\n'
-              'La portata delle condutture è ricavata dalle tabelle CEI-UNEL vigenti ed applicando i coefficienti di riduzione relativi '
-              'alle condizioni di posa ed alle temperature ambiente. La portata delle singole condutture (o lz) è valutata secondo le '
-              'tabelle CEI UNEL 35024 e CEI UNEL 35026 con fattore di correzione in funzione del tipo posa e presenza di più circuiti '
-              'elettrici.'},
- 19: {'title': 'SEZIONE MINIMA DEI CONDUTTORI DI FASE.',
-      'text': 'Le sezioni dovranno essere tali da soddisfare le più restrittive prescrizioni in proposito dettate dalle norme CEI e delle '
-              'disposizioni di legge vigenti in materia antinfortunistica.\n'
-              'La sezione dei cavi sarà determinata anche in funzione dei seguenti parametri:\n'
-              'carico installato;\n'
-              "temperatura ambiente di 30°C per installazione all'interno, 40°C per posa nei percorsi\n"
-              "all'esterno su canaletta;\n"
-              'coefficiente di riduzione relativo alle condizioni di posa nella situazione più restrittiva nello sviluppo della linea;\n'
-              'caduta di tensione massima ammissibile come meglio precisato nel paragrafo 12.'},
- 20: {'title': 'SEZIONE MINIMA DEI CONDUTTORI DI NEUTRO.',
-      'text': 'Per i conduttori di neutro la sezione dovrà essere la stessa del conduttore di fase nei circuiti:\n'
-              'monofase a due fili;\n'
-              'polifase, quando la sezione del conduttore di fase sia inferiore o uguale a 16 mm2 se in rame e 25 mm2 se in alluminio.\n'
-              'per i circuiti nei quali la dimensione del conduttore di fase è maggiore di quelle sopra citate, è ammesso l’uso di un '
-              'conduttore di neutro avente sezione inferiore a quella di fase se la corrente che percorre il neutro, durante il servizio '
-              'ordinario, non sia maggiore della corrente sopportabile dal cavo e che la sezione del neutro sia almeno uguale a 16 mm2 se '
-              'in rame e 25 mm2 se in alluminio.'},
- 21: {'title': 'SEZIONE MINIMA DEI CONDUTTORI DI PROTEZIONE (PE).',
-      'text': 'Si dovranno rispettare le sezioni precisate dalla tabella 54F della norma CEI 64-8 art. 543.1.2\n'
-              'La sezione del conduttore di protezione dovrà essere scelta fra le seguenti possibilità (CEI 64-8 art. 543.1):\n'
-              '•\tnon inferiore al valore determinato dalla formula seguente:\n'
-              'Sp = \uf0d6\uf020I2 t / K\n'
-              'dove\n'
-              'Sp è la sezione del conduttore di protezione in mm2\n'
-              'I è la corrente di guasto che può percorrere il conduttore di protezione\n'
-              't è il tempo di intervento delle protezioni in secondi\n'
-              'K è il fattore che dipende dal materiale del conduttore di protezione (PVC = 115);\n'
-              'secondo la seguente tabella (Tab. 54 F della norma CEI 64-8):\n'
-              'La sezione del conduttore di protezione non facente parte della conduttura di alimentazione non dovrà essere inferiore a:\n'
-              '•\t2,5 mm2 se protetto meccanicamente;\n'
-              '•\t4 mm2 se non protetto meccanicamente.\n'
-              'Quando un conduttore di protezione è comune a più circuiti, dovrà essere proporzionato alla sezione del conduttore di fase '
-              'avente sezione maggiore.'},
- 22: {'title': 'SEZIONE MINIMA DEL CONDUTTORE DI TERRA.',
-      'text': 'Con riferimento all’art. 542.3 ed alla tabella 54A della norma CEI 64-8 le sezioni minime dei conduttori di terra si '
-              'distinguono in relazione alla loro protezione meccanica e alla loro protezione contro la corrosione. Si avranno quindi:\n'
-              'conduttori privi di protezione contro la corrosione: sezione 25 mm2 se in rame e 50 mm2 se in ferro zincato;\n'
-              'conduttori protetti contro la corrosione e protetti meccanicamente: sezione in accordo con l’art. 543.1;\n'
-              'conduttori protetti contro la corrosione, ma non protetti meccanicamente: sezione 16 mm2 se in rame e 16 mm2 se ferro '
-              'zincato.'},
- 23: {'title': 'COLORI DI IDENTIFICAZIONE.',
-      'text': "In accordo con art. 514.31 della CEI 64-8/5 e della CEI 16-4 i colori da utilizzare per l'identificazione dei vari "
-              'conduttori saranno unicamente i seguenti:\n'
-              '•\tconduttori di fase: marrone, grigio e nero;\n'
-              '•\tconduttore di neutro: blu chiaro;\n'
-              '•\tconduttori di protezione: giallo verde;\n'
-              '•\tritorni ed interrotte: rosso;\n'
-              '•\tbassissima tensione: bianco, arancione, violetto.'},
- 24: {'title': 'SEZIONAMENTO E COMANDO.',
-      'text': 'Di seguito si riportano le caratteristiche delle apparecchiature per il comando ed il sezionamento dei circuiti elettrici.'},
- 25: {'title': 'SEZIONAMENTO.',
-      'text': 'Ogni circuito dovrà poter essere sezionato dall’alimentazione, in particolare il sezionamento dovrà avvenire su tutti i '
-              'conduttori attivi.\n'
-              'Dovrà in ogni modo essere possibile sezionare diversi circuiti con un solo dispositivo purché le condizioni di esercizio lo '
-              'consentano.\n'
-              'Quando un componente elettrico, oppure un involucro, contenga parti attive collegate a più di un’alimentazione, una scritta '
-              'od una segnalazione dovrà essere posta in posizione tale che qualsiasi persona che acceda alle parti attive sia avvertita '
-              'della necessità di sezionare dette parti dalle proprie alimentazioni nel caso non sia presente un interblocco tale da '
-              'assicurare che tutti i conduttori attivi siano sezionati.'},
- 26: {'title': 'INTERRUZIONE PER MANUTENZIONE NON ELETTRICA.',
-      'text': 'Quando la manutenzione non elettrica può comportare rischi per le persone, si dovranno provvedere dispositivi di '
-              'interruzione dell’alimentazione.\n'
-              'Dovranno essere presi adatti provvedimenti per evitare che le apparecchiature meccaniche alimentate elettricamente siano '
-              'riattivate accidentalmente durante la manutenzione non elettrica, salvo che i dispositivi di interruzione non siano '
-              'continuamente sotto il controllo dell’operatore.\n'
-              'Dovranno quindi utilizzare dispositivi di sezionamento in grado di interrompere la corrente di pieno carico.'},
- 27: {'title': 'COMANDO FUNZIONALE.',
-      'text': 'Gli apparecchi di comando funzionale non dovranno necessariamente interrompere tutti i conduttori attivi di un circuito. In '
-              'ogni caso un dispositivo di comando unipolare non dovrà essere inserito sul conduttore di neutro.\n'
-              'Le prese a spina possono essere utilizzate come comando funzionale se la loro portata non è superiore a 16 A.\n'
-              'Il comando funzionale potrà essere realizzato mediante:\n'
-              'interruttori di manovra;\n'
-              'interruttori automatici;\n'
-              'contattori;\n'
-              'relè ausiliari;\n'
-              'prese a spina fino a 16 A compresi.'},
- 28: {'title': 'PROTEZIONE CONTRO I CONTATTI DIRETTI.',
-      'text': 'Le parti attive risultano ricoperte tramite un isolamento che può essere rimosso solo mediante distruzione, Art. 412.1 CEI '
-              '64-8/4.\n'
-              'Ne consegue che i componenti in tensione e le parti attive dovranno essere segregati, mediante posa entro involucri o '
-              'dietro barriere, in modo da assicurare un grado di protezione IPXXB (CEI 64-8 art. 412.2.1).\n'
-              'Per le superfici superiori orizzontali degli involucri e delle barriere a portata di mano si dovrà garantire un grado di '
-              'protezione IPXXD (CEI 64-8 art. 412.2.2).\n'
-              'Nei luoghi soggetti a normativa specifica o con ambienti ed applicazioni particolari, il grado di protezione dovrà essere '
-              'adeguato ai singoli casi, considerati in dettaglio nei capitoli specifici.\n'
-              'Le barriere e/o gli involucri di protezione dovranno essere fissati saldamente in modo da garantire stabilità e durata nel '
-              'tempo e dovranno poter essere rimossi esclusivamente:\n'
-              "mediante l'uso di chiave o attrezzo;\n"
-              "se l'alimentazione, dopo l'interruzione a seguito della rimozione degli involucri di protezione, sia ripristinabile solo "
-              'con la richiusura degli stessi;\n'
-              "se esiste una barriera intermedia, con grado di protezione minimo IPXXB, rimovibile solo con l'uso di chiave od attrezzo.\n"
-              'Sono possibili altri sistemi di protezione dai contatti diretti (ostacoli, distanziamento ecc.) che dovranno in ogni modo '
-              'essere analizzati ed applicati solo in casi particolari e specifici (CEI 64-8 art. 412.2.4).'},
- 29: {'title': 'PROTEZIONE CONTRO I CONTATTI INDIRETTI – SISTEMA TT.',
-      'text': 'Per la protezione dai contatti indiretti dovrà essere garantito il coordinamento dell’impianto di terra con i dispositivi '
-              "di protezione (CEI 64-8/4 art. 413.1.4.2) in modo da assicurare l'interruzione automatica dell'alimentazione nei tempi "
-              'richiesti.\n'
-              'Il coordinamento sarà soddisfatto dalla relazione:\n'
-              'Ra * Ia < 50\n'
-              'dove:\n'
-              'Ra = somma della resistenza del dispersore e dei conduttori di protezione\n'
-              'Ia = corrente che provoca il funzionamento automatico del dispositivo di protezione (Idn se il dispositivo è '
-              'differenziale).\n'
-              'Nel caso di dispositivo con caratteristica di funzionamento a tempo inverso (interruttore magnetotermico) si dovrà '
-              'garantire che tra una parte attiva e una massa (o un conduttore di protezione) non possa permanere una tensione di contatto '
-              'superiore a 50 V (in corrente alternata) per un tempo superiore a 5s (CEI 64-8 art. 413.1.4.2).\n'
-              "Nell'utilizzo di dispositivi differenziali, che dovranno rispettare le prescrizioni della Norma CEI 23-18, l'intervento "
-              'dovrà essere istantaneo.\n'
-              'Se si usano dispositivi differenziali di tipo selettivo (S) o ritardati, posti in serie a dispositivi differenziali di tipo '
-              'generale, il tempo di intervento non dovrà essere superiore a 1s.'},
- 30: {'title': 'PROTEZIONE DA PARTI IN TENSIONE POSTE ALL’INTERNO DELL’INVOLUCRO.',
-      'text': 'Le parti attive poste entro involucri o barriere devono assicurare almeno il grado di protezione IP XXB (IP 20) Art. '
-              '412.2.1 CEI 64-8/4.\n'
-              'Le superfici orizzontali degli involucri o barriere poste a portata di mano (sotto i m. 2,5 dal calpestio) devono '
-              'assicurare almeno il grado di protezione IP XXD (IP 40) Art. 412.2.2 CEI 64-8/4.\n'
-              'Per un più esplicito riferimento si rimanda a quanto segue:\n'
-              'XXA\t\tXXB\t\tXXC\t\tXXD\n'
-              'dove la lettera addizionale significa:\n'
-              "“A” - protetto contro l'accesso con il dorso della mano;\n"
-              "“B” - protetto contro l'accesso con il dito (il dito di prova non tocca parti in tensione);\n"
-              "“C” - protetto contro l'accesso con un attrezzo;\n"
-              "“D” - protetto contro l'accesso con un filo (il filo di prova da 1mm non tocca parti in tensione)."},
- 31: {'title': 'COMPONENTI ELETTRICI IN CLASSE II O CON ISOLAMENTO EQUIVALENTE.',
-      'text': "La protezione da contatti indiretti può essere realizzata anche con l'utilizzo di componenti in classe II. Sono da "
-              'considerare tali le condutture elettriche costituite da:\n'
-              'cavi con guaina non metallica aventi tensione nominale maggiore di un gradino rispetto a quella necessaria per il sistema '
-              'elettrico servito e che non comprendano un rivestimento metallico;\n'
-              'cavi unipolari senza guaina installati in tubo protettivo o canale isolante e rispondente alle rispettive Norme;\n'
-              'cavi con guaina metallica aventi isolamento idoneo per la tensione nominale del sistema elettrico servito, tra la parte '
-              "attiva e la guaina metallica e tra questa e l'esterno."},
- 32: {'title': 'PROTEZIONE DELLE CONDUTTURE CONTRO LE SOVRACORRENTI.',
-      'text': 'Di seguito si riportano quanto previsto dalle Norme e Leggi relativamente alle protezioni delle condutture.'},
- 33: {'title': 'PROTEZIONE CONTRO I SOVRACCARICHI.',
-      'text': 'Tutte le condutture saranno protette dai sovraccarichi, con la sola esclusione dei circuiti la cui interruzione potrebbe '
-              'dar luogo a pericolo per le persone. Le protezioni dai sovraccarichi saranno realizzate con interruttori automatici, '
-              'rispondenti alle norme CEI 17-5 e CEI 23-3.\n'
-              'Per proteggere le linee contro i sovraccarichi saranno soddisfatte le seguenti condizioni:\n'
-              'Ib \uf0a3\uf020In \uf0a3\uf020Iz\n'
-              'e\n'
-              'If \uf0a3\uf0201,45 Iz\n'
-              'dove:\n'
-              'In è la corrente nominale dell’interruttore o la sua taratura termica;\n'
-              'If è la corrente convenzionale di funzionamento dell’interruttore;\n'
-              'Ib è la corrente d’impiego;\n'
-              'Iz è la portata della linea.\n'
-              'Per quanto riguarda il soddisfacimento della seconda condizione, si terrà presente che:\n'
-              'gli interruttori per uso domestico o similare (norma CEI 23-3 e 23-18) hanno una corrente di funzionamento If \uf0a3 1,45 x '
-              'In;\n'
-              'gli interruttori conformi alla norma CEI 17-5 hanno una corrente di funzionamento If = 1,35 x In, per correnti nominali '
-              'fino a 63 A e If = 1,25 x In, per valori della corrente nominale superiori a 63 A.\n'
-              'Quando la protezione dalle sovracorrenti sarà effettuata con fusibili si terranno presenti le seguenti relazioni:\n'
-              'a)\t4 A \uf0a3 In \uf0a3 10 A\t\tIf =1,9\te quindi\tIb \uf0a3 In \uf0a3 0,763 IZ\n'
-              'b)\t10 A \uf0a3 In \uf0a3 25 A    \tIf =1,75\te quindi\tIb \uf0a3 In \uf0a3 0,828 Iz\n'
-              'c)\t25 A \uf0a3 In\t\tIf =1,6\te quindi\tIb \uf0a3 In \uf0a3 0,6 Iz'},
- 34: {'title': 'PROTEZIONE CONTRO I CORTO CIRCUITI.',
-      'text': 'Per la protezione da corto circuito (CEI 64-8 art. 434.3), affinché la temperatura dei conduttori non superi il valore '
-              'massimo ammissibile, si dovrà tener conto della relazione seguente:\n'
-              '(I²* t) \uf0a3 K²* S²\n'
-              'dove:\n'
-              'I = corrente di corto circuito in Ampere;\n'
-              't = durata del corto circuito in secondi;\n'
-              "K = fattore relativo alla natura dell'isolante\n"
-              '115 per cavo in rame con guaina esterna in PVC;\n'
-              '135 per cavi in rame isolati con gomma ordinaria o gomma butilica;\n'
-              '143 per cavi in rame isolati con gomma etilenpropilenica e propilene reticolato.\n'
-              'S = sezione del conduttore in mm.'},
- 35: {'title': 'SELETTIVITÀ.',
-      'text': 'Gli impianti saranno realizzati in modo tale da assicurare la massima selettività possibile onde evitare che, in caso di '
-              'guasto su un circuito a valle, intervengano anche le protezioni generali installate a monte.'},
- 36: {'title': 'SCHEMI E DOCUMENTAZIONE.',
-      'text': 'Saranno forniti al manutentore i documenti di disposizione topografica dell’impianto elettrico, unitamente a rapporti di '
-              'verifica, disegni, schemi e relative modifiche, così come istruzioni per l’esercizio e la manutenzione.'},
- 37: {'title': 'DESCRIZIONE DEGLI IMPIANTI',
-      'text': 'Relativamente a quanto descritto in questo capitolo, si precisa che per maggiori dettagli si rimanda a tutta la '
-              'documentazione allegata alla presente.'},
- 38: {'title': 'QUADRI ELETTRICI.',
-      'text': 'Tutti i quadri e i dispositivi di protezione scelti (fusibili, interruttori) saranno di primaria marca: e dovranno essere '
-              'del tipo in materiale termoplastico salvo diversa indicazione.\n'
-              'I quadri saranno completi di telai e pannellature idonee per il montaggio di apparecchi modulari e scatolati, e dovranno '
-              'essere corredati di appositi cartellini fissati in modo imperdibile che indicheranno chiaramente le funzioni svolte dalle '
-              'varie apparecchiature installate.\n'
-              'Sui quadri troveranno posto le protezioni magnetotermiche differenziali necessarie per attuare la protezione, il '
-              'sezionamento e la suddivisione dei circuiti previsti con riferimento alla vigente normativa e in considerazione delle '
-              'esigenze di sicurezza, continuità del servizio e praticità di manutenzione.\n'
-              "L'ingresso delle condutture (cavi provenienti dal contatore) sarà realizzato nella parte inferiore dello stesso; "
-              'analogamente l’uscita delle condutture (cavi verso le utenze) sarà realizzata nella parte inferiore dello stesso.\n'
-              'Si raccomanda, nell’ingresso delle condutture al quadro, il mantenimento del grado di protezione iniziale dello stesso, '
-              'mediante l’utilizzo di appositi pressa-cavi o guarnizioni. Le dimensioni dei quadri e le caratteristiche tecniche delle '
-              'apparecchiature in essi installate sono specificate negli schemi elettrici allegati.'},
- 39: {'title': 'DISTRIBUZIONE PRINCIPALE.',
-      'text': 'Quanto segue è valido solo nel caso in cui il POD, e quindi il contatore fiscale ed il DG.\n'
-              'Gli ingressi delle condutture dall’Ente Distributore e delle condutture del fornitore dei servizi sono convogliati alla '
-              'conchiglia dei quadri a mezzo di tubazione interrata all’interno della proprietà.\n'
-              'Le condutture della distribuzione saranno unicamente cavi unipolari tipo FG16R16/FG16M16, che saranno usati per sezioni di '
-              'conduttore superiore a 25 mm2, mentre per sezioni inferiore sarà ammesso uso di cavi multipolare del tipo FG16(O)R16 o '
-              'FRG17, che saranno utilizzati anche per le alimentazioni di utenze o i collegamenti di segnale nei locali tecnologici.'},
- 40: {'title': 'COLONNINA.',
-      'text': 'La stazione di ricarica è classificabile come “Ambienti ed applicazioni particolari, Alimentazione di veicoli elettrici” '
-              'della Norma CEI 64-8:2012:06, variante V1:2013:07, Sezione 722.\n'
-              'Il modo di ricarica sarà tipo 3 e 4, mentre il modo di connessione sarà di tipo B e C (Norma CEI EN 61851-1:2012-05).\n'
-              'Attualmente la norma, che riporta le prescrizioni necessarie per la ricarica dei veicoli elettrici, è la Norma CEI EN '
-              '61851-1:2012-05 “Sistema di ricarica conduttiva dei veicoli elettrici – Parte 1: Prescrizioni generali\n'
-              '“…con riferimento ai modi di carica in corrente alternata adottati in Italia, al fine di garantire la necessaria sicurezza '
-              'durante la carica conduttiva dei veicoli elettrici, quando questa viene eseguita in ambienti aperti a terzi deve essere '
-              'adottato il Modo di carica 3”.\n'
-              'Sulla base delle classificazioni realizzate da Cives ed Eurelectric, il Piano Nazionale individua le seguenti classi di '
-              'infrastrutture di ricarica sulla base della capacità di erogazione dell’energia:\n'
-              'Normal power (Slow charging) - fino a 3,7 kW\n'
-              'Medium power (Quick charging) - da 3,7 fino a 22 kW\n'
-              'High power (Fast charging) - superiore a 22 kW\n'
-              'Lo specifico progetto prevede la posa di Medium power.\n'
-              'Architettura EVC.\n'
-              'punto di ricarica prevedrà:\n'
-              '•\tuna WallBox del tipo a ricarica fino a 7,4kW dotata, nel caso in oggetto, di una presa di ricarica opportunamente '
-              'modulata con apposito softwere;'},
- 41: {'title': 'VERIFICHE.',
-      'text': 'Per la valutazione delle verifiche da eseguire sui quadri elettrici bisogna distinguerli per categoria in base alle loro '
-              'caratteristiche.'},
- 42: {'title': 'APPARECCHIATURE MODULARI.',
-      'text': 'Le apparecchiature installate nei quadri di comando e negli armadi dovranno essere del tipo modulare e componibile con '
-              'fissaggio a scatto su profilato normalizzato EN 50022, ad eccezione di eventuali interruttori automatici superiori a 125 A '
-              "che si fisseranno a mezzo di bulloni sulla piastra di cablaggio, mentre per il fissaggio di relè contattori all'interno del "
-              'quadro si adotterà il sistema di fissaggio e cablaggio su piastra.\n'
-              'Gli interruttori di tipo magnetotermico, magnetotermico differenziale e differenziale puro dovranno avere potere di '
-              'interruzione adeguato alla corrente di corto circuito calcolato nel punto di installazione. La corrente di soglia di '
-              'intervento differenziale potrà essere da 0,5 A - 0,3 A - 0,03 A, a seconda della selettività che si vuole conseguire.'},
- 43: {'title': 'INTERRUTTORE GENERALE.',
-      'text': 'Ogni quadro sarà dotato di un interruttore generale provvisto di comando manuale che consenta di interrompere '
-              'simultaneamente la continuità metallica di tutti i conduttori.\n'
-              "Esso dovrà portare una chiara indicazione della posizione di aperto o chiuso in corrispondenza dell'organo di manovra."},
- 44: {'title': 'INTERRUTTORI MAGNETOTERMICI MODULARI.',
-      'text': 'Si è fatto uso di interruttori automatici magnetotermici aventi meccanica di tipo autoportante svincolata dall’involucro '
-              'isolante, di comando a leva nera piombabile in posizione ON-OFF.\n'
-              'I morsetti di collegamento saranno predisposti per il collegamento di cavi e barrette di collegamento e l’alimentazione '
-              'sarà possibile sia dai morsetti superiori che inferiori.\n'
-              'Si riportano di seguito le caratteristiche generali:\n'
-              'Tensione nominale di funzionamento in corrente alternata: 230/400 V;\n'
-              'Frequenza di esercizio: 50-60 Hz;\n'
-              'Nr. poli: (1+N; 1; 2; 3; 4);\n'
-              'Potere di inter. (CEI 23.3): 15 kA o inferiore se è previsto protezione di back up a monte;\n'
-              'Corrente nominale ininterrotta:\n'
-              '(caratteristica B): (6…63) A;\n'
-              '(caratteristiche C, D, K): (0.5…63) A;\n'
-              'Caratteristica di intervento: B-C-D-K;\n'
-              'Tenuta alla tensione a frequenza industriale: 3 kV;\n'
-              'Numero di manovre meccaniche: 20.000;\n'
-              'Numero di manovre elettriche a Ue e In: 10.000;\n'
-              'Tensione di isolamento 500 V;\n'
-              'Grado di inquinamento 2;\n'
-              'Gruppo materiale II, idoneo al sezionamento.\n'
-              'Il potere di interruzione dovrà essere adeguato alla corrente di corto circuito simmetrica trifase presunta nel punto di '
-              'installazione o in alternativa dovrà essere previsto un interruttore generale con opportuno coordinamento avente potere di '
-              'interruzione comunque non inferiore a 15 kA.'},
- 45: {'title': 'INTERRUTTORI DIFFERENZIALI MODULARI.',
-      'text': 'I blocchi differenziali avranno meccanica di tipo autoportante svincolata dall’involucro isolante, di comando a leva '
-              'piombabile in posizione ON-OFF.\n'
-              'Il dispositivo differenziale sarà idoneo al funzionamento in presenza di correnti alternate sinusoidali e  immune agli '
-              'scatti intempestivi dovuti alle sovratensioni pari a 250A di picco con onda 8/20 µs.\n'
-              'Tensione nominale di funzionamento in corrente alternata: 230/400 V;\n'
-              'Frequenza di esercizio: 50-60 Hz;\n'
-              'Potere di interruzione in corto circuito pari a quello dell’interruttore automatico a cui è accoppiato (se non già un '
-              'differenziale puro);\n'
-              'Taglia: 25, 40, 63, 100 A;\n'
-              'Nr. poli: (2-3-4);\n'
-              'Sensibilità nominale differenziale: 0.03 – 0,1 – 0,3 – 0,5 – 1 – 2;\n'
-              'Numero di manovre meccaniche: 20.000;\n'
-              'Numero di manovre elettriche a Ue e In: 10.000; 20.000 (taglia 100 A).'},
- 46: {'title': 'CONTATTORI DI POTENZA E AUSILIARI.',
-      'text': 'Se necessari si farà uso di contattori accessoriabili, rispondenti alle normative EN60947-1 e 947-4-1 e saranno idonei per '
-              'montaggio su barra DIN o piastra di fondo, in versioni a 3 o 4 poli con morsetti a vite e grado di protezione IP20 ed '
-              'avranno circuito magnetico (bobina) in corrente alternata e contatto ausiliario (n° 1 normalmente aperto NA o n° 1 '
-              'normalmente chiuso NC) integrato nelle versioni tripolari.\n'
-              'In generale avranno le seguenti caratteristiche tecniche:\n'
-              'Tensione nominale d’isolamento Ui: 1.000 V;\n'
-              'Tensione nominale di impulso Uimp: 8 kV;\n'
-              'Tensione nominale di impiego Ue: 690 Vca;\n'
-              'Temperatura ambiente:\n'
-              'immagazzinaggio: da –60 °C a +80 °C;\n'
-              'in funzionamento da –40 °C a +55 °C;\n'
-              'in funzionamento con relè termico da –25 °C a +55 °C\n'
-              'Durata meccanica: 10 milioni di manovre;\n'
-              'Durata elettrica (AC3 - 400 V - 16 A): 2.000.000 manovre.'},
- 47: {'title': 'ACCESSORI.',
-      'text': 'Qualora previsti, la grandezza per i contattori di potenza dovrà essere scelta tenendo conto di una corrente minima di 9 A '
-              'in classe di funzionamento AC3, inoltre dovranno avere almeno due contatti ausiliari (n° 1 NA e n° 1 NC) in più di quelli '
-              'previsti dallo schema di quadro.\n'
-              'Si riportano di seguito le caratteristiche minime generali a cui devono rispondere:\n'
-              'Contatti ausiliari frontali e/o laterali;\n'
-              'Interblocchi meccanici ed elettro-meccanici;\n'
-              'Temporizzatori pneumatici ed elettronici;\n'
-              'Limitatori di sovratensioni;\n'
-              'Barrette di collegamento;\n'
-              'Bobine di ricambio;\n'
-              'Relè termici.'},
- 48: {'title': 'CAVI.',
-      'text': 'Quanto segue è valido solo nel caso in cui il POD, e quindi il contatore fiscale ed il DG non sia all’interno di EVC, come '
-              'nel caso oggetto della presente relazione tecnica.\n'
-              "Tutti i cavi impiegati nella realizzazione degli impianti descritti nel presente progetto risponderanno all'unificazione "
-              'UNEL ed alle Norme costruttive stabilite dal Comitato Elettrotecnico Italiano.\n'
-              'In particolare, tutti i cavi citati nel presente documento si intendono del tipo non propagante l’incendio ed a bassissima '
-              'emissione di fumi e gas tossici, secondo le norme vigenti quali CEI 20-22 III, CEI 20-35, CEI 20-37 e CEI 20-38 o s.m.i.\n'
-              'Per la distribuzione dell’energia dovranno essere utilizzati i cavi unipolari isolati in XLPE, qualità R2 non propaganti '
-              'l’incendio, con corde flessibili in rame, rispondenti alla norma CEI 20-22, ed avranno una tensione di isolamento minimo, '
-              'superiore di un gradino alla tensione di impiego (Uo/U = 0,6/1 kV).\n'
-              'I cavi saranno contrassegnati in modo da individuare prontamente il servizio a cui appartengono; il transito di cavi '
-              "attraverso la struttura di canali portacavi, cassette di derivazione etc., sarà effettuato con l'ausilio di pressacavi del "
-              'tipo con bullone a stringere.\n'
-              'I conduttori previsti saranno dimensionati secondo i dati della tabella CEI-UNEL 35024/1 e 35024/2 tenendo conto di una '
-              'temperatura iniziale di 30°C, di una temperatura massima di esercizio e di una temperatura massima di corto circuito '
-              "adeguati al tipo dell'isolante (CEI 64-8 tabella 52 D); per la posa interrata si farà riferimento alle tabelle CEI-UNEL "
-              '35026.\n'
-              'Nel caso siano posati nella stessa conduttura conduttori di sistemi a tensione diversa (cavi per energia, impianto '
-              'rivelazione incendio, impianti trasmissione dati, ecc.), tutti i conduttori dovranno essere isolati per la tensione più '
-              'elevata (CEI 64-8 art. 521.6).'},
- 49: {'title': 'COLORI DEI CAVI.',
-      'text': 'I conduttori impiegati nell’esecuzione degli impianti dovranno essere contraddistinti dalla colorazione prevista dalle '
-              'vigenti tabelle di unificazione CEI - UNEL 00722 e 00712.\n'
-              "Per quanto riguarda i conduttori di fase dovranno essere contraddistinti in modo univoco per tutto l'impianto dai colori: "
-              'nero, grigio e marrone. Nella scelta del colore dei conduttori, il bicolore giallo-verde sarà tassativamente riservato ai '
-              'conduttori di protezione ed equipotenziali ed il colore blu chiaro sarà destinato esclusivamente al conduttore di neutro '
-              '(CEI 64-8 art. 514.3.1).'},
- 50: {'title': 'CAVI PER LA DISTRIBUZIONE DELL’ENERGIA.',
-      'text': 'In accordo con la Tabella 52A della Norma CEI 64-8, si potranno utilizzare, ad esempio, i seguenti tipi di cavo:\n'
-              'posa all’interno e all’esterno non interrata: H07V-K, FS17, FG17 – 450/750 V;\n'
-              'posa all’interno e all’esterno anche interrata: FG16OR16-0,6/1 kV, FG16R16-0,6/1 kV, N1VV-K.\n'
-              'Per gli ambienti trattati nella Sezione 751 della Norma CEI 64-8:\n'
-              'FM9 450/750 V\n'
-              'FG10(O)M1-0,6/1 kV.\n'
-              'Più in dettaglio, nel presente progetto si potranno usare i seguenti:\n'
-              'cavi unipolari o multipolari isolati in gomma CPR ad alto modulo, non propaganti l’incendio e a bassissima emissione di gas '
-              'alogenidrici, con conduttori in rame ricotto, tensione nominale di 0,6/1 kV sigla di riferimento FG16(O)M16;\n'
-              'cavi unipolari o multipolari isolati in gomma CPR ad alto modulo, non propaganti l’incendio con conduttori in rame ricotto, '
-              'tensione nominale di 0,6/1 kV sigla di riferimento FG16R16;\n'
-              'cavi multipolari isolati in PVC, qualità TI2, non propaganti l’incendio con conduttori in rame ricotto, tensione nominale '
-              '450/750 V sigla di riferimento FG17;\n'
-              'cavi unipolari isolati in PVC, qualità R2 non propaganti l’incendio, con corde flessibili in rame, per tensioni nominali '
-              '450/750 V sigla di riferimento FS17.'},
- 51: {'title': 'CONDUTTURE.',
-      'text': 'Quanto segue è valido solo nel caso in cui il POD, e quindi il contatore fiscale ed il DG non sia all’interno di EVC, come '
-              'nel caso oggetto della presente relazione tecnica.\n'
-              'Le condutture dovranno essere realizzate in modo da ridurre al minimo la probabilità di innesco e propagazione '
-              'dell’incendio nelle condizioni di posa. Per soddisfare questi requisiti le condutture dovranno rispondere alle prescrizioni '
-              'della Sezione 751 della Norma CEI 64-8/7.\n'
-              "Per conduttura si dovrà intendere l'insieme costituito da uno o più conduttori elettrici e dagli elementi che assicurano il "
-              'loro isolamento, il loro supporto, il loro fissaggio e la loro eventuale protezione meccanica (CEI 64-8/2 art. 26.1).\n'
-              'I conduttori dovranno essere sempre protetti meccanicamente. Dette protezioni saranno realizzate mediante tubazioni anche '
-              'interrate, canalette portacavi, passerelle, condotti o cunicoli, eventualmente ricavati nella struttura edile ecc.\n'
-              "I tubi protettivi, le cassette e le scatole per l'impianto di energia, per trasmissione dati, di allarme, di controllo e di "
-              'segnalazione, dovranno essere dedicate e distinte fra loro (CEI 64-8/5 art. 528.1.1).\n'
-              'Le condutture elettriche dovranno essere opportunamente distanziate da tubazioni che producano calore, fumi o vapori. Se '
-              'ciò non fosse possibile si dovranno utilizzare opportuni accorgimenti onde evitare eventuali effetti dannosi.'},
- 52: {'title': 'TUBI E GUAINE.',
-      'text': 'In considerazione delle diverse tipologie impiantistiche si potranno utilizzare, oltre a quelli già esistenti, i tubi e le '
-              'guaine di seguito descritte:\n'
-              'tubo rigido autoestinguente in PVC serie pesante conforme alla Norma CEI 23-8 e varianti ed alle relative tabelle UNEL '
-              '37118-37119-37120 e s.m.i.;\n'
-              'tubo flessibile autoestinguente in PVC serie pesante conforme alla Norma CEI 23-14 e varianti;\n'
-              'guaine in PVC flessibile autoestinguente, serie pesante, complete di accessori di giunzione e derivazione, conformi alle '
-              'relative tabelle UNEL 37118-37119-37120 e s.m.i.\n'
-              'Il diametro dei tubi non dovrà essere inferiore a 16 mm. Tutte le curve eseguite senza l’impiego di pezzi speciali dovranno '
-              'essere di raggio proporzionato al diametro del tubo e tale da non diminuirne in corrispondenza delle stesse la sezione '
-              'libera di passaggio.\n'
-              'I tubi di nuova installazione dovranno essere dimensionati in modo che il loro diametro sia pari ad almeno 1,3 volte il '
-              'diametro del cerchio circoscritto al fascio dei conduttori in essi contenuti.\n'
-              "Tale accorgimento renderà possibile un'eventuale aggiunta di conduttori senza arrecare deterioramento all'isolamento degli "
-              'esistenti e permetterà di non apportare pregiudizio alla sfilabilità dei cavi.\n'
-              'Tutte le tubazioni, qualunque sia il tipo di posa, dovranno avere andamento prevalentemente rettilineo, si potranno seguire '
-              'percorsi non rigorosamente rettilinei solamente in corrispondenza di eventuali ostacoli (canali, tubazioni di altri '
-              'impianti).'},
- 53: {'title': 'TIPI DI POSA.',
-      'text': 'Le condutture elettriche dovranno essere opportunamente distanziate da tubazioni che producano calore, fumi o vapori. Se '
-              'ciò non fosse possibile si dovranno utilizzare opportuni accorgimenti onde evitare eventuali effetti dannosi.\n'
-              'I tubi protettivi installati sotto traccia dovranno avere un percorso orizzontale, verticale o parallelo allo spigolo della '
-              'parete, ad esclusione dei percorsi nei soffitti e nei pavimenti ove il percorso potrà essere omnidirezionale.\n'
-              'I tipi di posa delle condutture in funzione dei tipi di cavi utilizzati dovranno essere in accordo con la Tabella 52A della '
-              'norma CEI 64-8 sotto riportata.\n'
-              'Nei cavi con guaina sono compresi i cavi provvisti di armatura e quelli con isolamento minerale.\n'
-              'Legenda:\n'
-              '+ permesso\n'
-              '- non permesso\n'
-              '0 non applicabile o non usato in generale nella pratica.\n'
-              'I tipi di posa delle condutture in funzione delle varie condizioni di utilizzo dovranno essere in accordo con la Tabella '
-              '52B della norma CEI 64-8 di seguito riportata.'},
- 54: {'title': 'IMPIANTO TRASMISSIONE DATI.',
-      'text': 'La rete di distribuzione per questa tipologia di impianto, qualora previsto, si svilupperà all’interno di canalizzazioni '
-              'predisposte allo scopo, separata dagli impianti di energia. La tipologia di cavo utilizzata sarà conforme alle specifiche '
-              'del fornitore/costruttore dell’EVC o, più in generale, del fornitore del sistema di trasmissione dati adottato. I cavi '
-              'impiegati saranno adeguati alla modalità di posa prevista.'},
- 55: {'title': 'VERIFICHE',
-      'text': 'Ad impianto ultimato si dovrà provvedere alle seguenti verifiche di collaudo.\n'
-              'Rispondenza alle disposizioni di legge.\n'
-              'Rispondenza alle prescrizioni particolari concordate in progetto e in sede di offerta.\n'
-              'Rispondenza alle norme CEI relative al tipo di impianto, come meglio descritto sulla Norma CEI 64-8 Cap.61 "Verifiche '
-              'iniziali" e s.m.i.\n'
-              'Entrando più in dettaglio, l’esame dell’impianto elettrico consiste in un controllo di rispondenza dell’opera realizzata ai '
-              'dati di progetto e a regola d’arte e dovrà essere effettuata prendendo tutte le precauzioni possibili per la sicurezza del '
-              'personale e per evitare danni ai beni ed ai componenti elettrici.\n'
-              'I tipi di verifica si distinguono in iniziale, periodica o straordinaria:\n'
-              'iniziale: effettuata prima della messa in servizio dell’impianto elettrico;\n'
-              'periodica: effettuata ad intervalli di tempo solitamente stabiliti;\n'
-              'straordinaria: effettuata dopo aver modificato o ampliato l’impianto elettrico.\n'
-              'Dovranno essere registrate le date ed i risultati delle prove e delle misure di ciascuna verifica, la quale dovrà essere '
-              'effettuata da un tecnico qualificato.'},
- 56: {'title': 'VERIFICHE INIZIALI.',
-      'text': 'Durante la realizzazione e prima della messa in servizio, l’impianto elettrico dovrà essere esaminato a vista e provato per '
-              'verificare che le prescrizioni richiamate dalla Guida CEI 64-52 siano state rispettate.\n'
-              'A tale scopo dovranno essere eseguite tutte le verifiche prescritte dalle norme impiantistiche ed in particolare quelle del '
-              'Capitolo 61 della Norma CEI 64-8.\n'
-              'Le verifiche dovranno essere effettuate prima della messa in servizio iniziale e, dopo modifiche o riparazioni, prima della '
-              'nuova messa in servizio.'},
- 57: {'title': 'ESAME A VISTA.',
-      'text': 'In questo caso la verifica di un impianto elettrico è:\n'
-              'di tipo ordinario accertando tutti quei difetti evidenti allo sguardo ad esempio: involucri rotti, connessioni interrotte, '
-              'mancanza di ancoraggi, ecc.\n'
-              'di tipo approfondito ispezionando, per mezzo di attrezzi ed utensili, i componenti elettrici per identificarne i difetti di '
-              'installazione ad esempio connessioni lente, ecc.'},
- 58: {'title': 'PROVE.',
-      'text': 'Si intende l’effettuazione di misure o di altre operazioni sull’impianto elettrico per mezzo di strumenti appropriati al '
-              'fine di accertare che i valori risultanti siano in accordo con le Norme CEI.\n'
-              'Le prove da effettuare, ovviamente in funzione di quanto effettivamente installato, sono:\n'
-              'prove della protezione contro i contatti diretti:\n'
-              'prova del grado di protezione;\n'
-              'prove della protezione contro i contatti indiretti:\n'
-              'prova della continuità dei conduttori di terra, di protezione ed equipotenziali (se previsti);\n'
-              'prova del funzionamento dei dispositivi differenziali;\n'
-              'misura della resistenza di terra;\n'
-              'misura dell’impedenza dell’anello di guasto.\n'
-              'prove per la verifica della corretta scelta dei componenti elettrici e loro corretta installazione:\n'
-              'prova di tensione applicata;\n'
-              'prova di funzionamento.\n'
-              'prove delle condutture e connessioni:\n'
-              'misura della resistenza di isolamento dell’impianto elettrico.\n'
-              'Per l’effettuazione delle sopracitate prove dovranno essere utilizzati i seguenti strumenti:\n'
-              'apparecchio per la prova di continuità dei conduttori di protezione ed equipotenziali (se previsti);\n'
-              'misuratore della resistenza di isolamento;\n'
-              'misuratori della resistenza di terra con metodo volt-amperometrico;\n'
-              'apparecchio per il controllo di funzionalità degli interruttori differenziali;\n'
-              'dito e filo di prova.\n'
-              'Le verifiche ed i loro risultati dovranno essere riportati su di un registro corredato da timbro e firma del tecnico '
-              'esecutore e dalla data di verifica.\n'
-              'Busnago, 06/02/2024\n'
-              'Il Progettista\n'
-              '………………………………………………'}}
+"""Testi delle sezioni del template DOCX (relazione progetto elettrico.docx).
+
+Le sezioni stanno in template_sections.sqlite: una riga per sezione con
+numero, titolo, flag ``include`` e testo compresso (zlib). Il file è aperto
+in sola lettura e mappato in memoria solo al primo accesso; ogni sezione viene
+letta e decompressa solo quando serve, per numero (``sezione``) o per titolo
+(``cerca_titolo``), così un processo che usa poche sezioni non paga le altre.
+
+TEMPLATE_SECTIONS resta disponibile come mapping ``{numero: {"title",
+"text", "include"}}`` che legge dallo store a ogni chiave richiesta.
+
+Per modificare i testi: ``--esporta sezioni.json``, modificare il JSON (lista
+di ``{"num", "title", "text", "include"}``) e ``--importa sezioni.json``.
+"""
+
+from __future__ import annotations
+
+import threading
+import zlib
+from collections.abc import Mapping
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+STORE = Path(__file__).resolve().parent / "template_sections.sqlite"
+MMAP_BYTES = 1 << 20
+
+_conn = None
+_lock = threading.RLock()
+
+
+def _connessione():
+    global _conn
+    if _conn is None:
+        import sqlite3
+
+        with _lock:
+            if _conn is None:
+                # immutable: nessun lock su file, lo store non cambia mentre gira l'app
+                conn = sqlite3.connect(f"{STORE.as_uri()}?mode=ro&immutable=1", uri=True, check_same_thread=False)
+                conn.execute(f"PRAGMA mmap_size={MMAP_BYTES}")
+                _conn = conn
+    return _conn
+
+
+def _query(sql: str, *args) -> list:
+    with _lock:
+        return _connessione().execute(sql, args).fetchall()
+
+
+def _norm(titolo: str) -> str:
+    return " ".join(titolo.replace("’", "'").split()).rstrip(".").casefold()
+
+
+@lru_cache(maxsize=None)
+def indice() -> Dict[int, str]:
+    """Numero -> titolo di tutte le sezioni (senza leggere i testi)."""
+    return dict(_query("SELECT num, titolo FROM sezioni ORDER BY num"))
+
+
+def numeri() -> List[int]:
+    return list(indice())
+
+
+@lru_cache(maxsize=None)
+def sezione(num: int) -> Optional[Dict[str, object]]:
+    """``{"title", "text", "include"}`` della sezione ``num``, None se non esiste."""
+    righe = _query("SELECT titolo, testo, include FROM sezioni WHERE num = ?", int(num))
+    if not righe:
+        return None
+    titolo, testo, include = righe[0]
+    return {"title": titolo, "text": zlib.decompress(testo).decode("utf-8"), "include": bool(include)}
+
+
+def cerca_titolo(titolo: str) -> Optional[Dict[str, object]]:
+    """Sezione per titolo (senza distinguere maiuscole, spazi e punto finale)."""
+    righe = _query("SELECT num FROM sezioni WHERE titolo_norm = ?", _norm(titolo))
+    return sezione(righe[0][0]) if righe else None
+
+
+class _Sezioni(Mapping):
+    """Vista a dizionario dello store, come il vecchio TEMPLATE_SECTIONS."""
+
+    def __getitem__(self, num: int) -> Dict[str, object]:
+        s = sezione(num)
+        if s is None:
+            raise KeyError(num)
+        return s
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(indice())
+
+    def __len__(self) -> int:
+        return len(indice())
+
+    def __contains__(self, num: object) -> bool:
+        return num in indice()
+
+
+TEMPLATE_SECTIONS = _Sezioni()
+
+
+# -------------------- Manutenzione dello store --------------------
+def costruisci(sezioni: Iterable[Dict[str, object]], path: Union[str, Path] = STORE) -> int:
+    """Riscrive lo store da ``{"num", "title", "text", "include"}``; restituisce il numero di sezioni."""
+    import sqlite3
+
+    path = Path(path)
+    tmp = path.with_suffix(".tmp")
+    tmp.unlink(missing_ok=True)
+    conn = sqlite3.connect(tmp)
+    try:
+        conn.executescript(
+            "PRAGMA page_size=1024;"
+            "CREATE TABLE sezioni (num INTEGER PRIMARY KEY, titolo TEXT NOT NULL,"
+            " titolo_norm TEXT NOT NULL, include INTEGER NOT NULL, testo BLOB NOT NULL);"
+            "CREATE INDEX sezioni_titolo ON sezioni (titolo_norm);"
+        )
+        righe = [
+            (int(s["num"]), str(s["title"]), _norm(str(s["title"])), int(bool(s.get("include", True))),
+             zlib.compress(str(s["text"]).encode("utf-8"), 9))
+            for s in sezioni
+        ]
+        conn.executemany("INSERT INTO sezioni VALUES (?, ?, ?, ?, ?)", righe)
+        conn.commit()
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+    tmp.replace(path)
+    return len(righe)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Store delle sezioni del template.")
+    gruppo = parser.add_mutually_exclusive_group(required=True)
+    gruppo.add_argument("--esporta", metavar="JSON", help="scrive le sezioni in un file JSON")
+    gruppo.add_argument("--importa", metavar="JSON", help="ricostruisce lo store da un file JSON")
+    args = parser.parse_args(argv)
+
+    if args.esporta:
+        dati = [{"num": n, **sezione(n)} for n in numeri()]
+        Path(args.esporta).write_text(json.dumps(dati, ensure_ascii=False, indent=1), encoding="utf-8")
+        print(f"{len(dati)} sezioni esportate in {args.esporta}")
+    else:
+        n = costruisci(json.loads(Path(args.importa).read_text(encoding="utf-8")))
+        print(f"{n} sezioni scritte in {STORE}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
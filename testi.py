@@ -0,0 +1,51 @@
+"""Modelli di testo con campi nominati per i capitoli lunghi della relazione.
+
+Un modello è un testo con campi nominati nella sintassi di str.format
+(``{committente}``, ``{dv_lim:.1f}``). compila lo analizza una volta per
+processo (cache sul testo sorgente) e ne verifica i campi; rendi lo compone
+con str.format_map e segnala, come una funzione con un argomento per campo,
+i valori mancanti o in più. Il testo resta uno solo, separato dal codice
+che raccoglie i valori.
+
+I testi dei capitoli sono in relazione.py; app, CLI, batch e i renderer
+PDF/DOCX li ottengono tutti da costruisci_payload.
+"""
+
+from __future__ import annotations
+
+import string
+from functools import lru_cache
+from typing import Any, FrozenSet, List
+
+
+class ModelloTesto:
+    __slots__ = ("sorgente", "campi")
+
+    def __init__(self, sorgente: str):
+        campi: List[str] = []
+        for _, campo, formato, conversione in string.Formatter().parse(sorgente):
+            if campo is None:
+                continue
+            if not campo.isidentifier() or campo.startswith("_") or conversione or "{" in (formato or ""):
+                raise ValueError(f"campo non supportato nel modello: {{{campo}}}")
+            if campo not in campi:
+                campi.append(campo)
+        self.sorgente = sorgente
+        self.campi: FrozenSet[str] = frozenset(campi)
+
+    def rendi(self, **valori: Any) -> str:
+        if valori.keys() != self.campi:
+            mancanti = ", ".join(sorted(self.campi - valori.keys()))
+            in_piu = ", ".join(sorted(valori.keys() - self.campi))
+            raise TypeError(f"valori del modello non validi (mancanti: {mancanti or '-'}; in più: {in_piu or '-'})")
+        return self.sorgente.format_map(valori)
+
+
+@lru_cache(maxsize=None)
+def compila(sorgente: str) -> ModelloTesto:
+    """Modello analizzato per ``sorgente`` (una volta per processo)."""
+    return ModelloTesto(sorgente)
+
+
+def rendi(sorgente: str, **valori: Any) -> str:
+    return compila(sorgente).rendi(**valori)